@@ -0,0 +1,43 @@
+"""
+ASGI entry point for the optional async serving mode
+
+    ASYNC_DB=True uvicorn asgi:app --workers 2
+
+Each request runs the Flask app on a thread of a per-process pool of
+ASGI_THREADS threads, so a slow Atlas round trip or ImgBB upload holds one
+pool thread rather than the whole worker. asgiref's WsgiToAsgi on its own
+runs every request of a process on one shared thread (sync_to_async's
+thread_sensitive default). With ASYNC_DB=True the dashboard's independent
+queries also run concurrently on an async client, and ImgBB uploads are sent
+from its event loop. The WSGI entry point (`gunicorn main:app`) is unchanged.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from backend.app import create_app
+from backend.app.config import Config
+
+_executor = ThreadPoolExecutor(max_workers=Config.ASGI_THREADS, thread_name_prefix='asgi-request')
+
+
+class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """One request, with the WSGI app run on the shared request pool"""
+
+    run_wsgi_app = sync_to_async(
+        WsgiToAsgiInstance.run_wsgi_app.__wrapped__, thread_sensitive=False, executor=_executor
+    )
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi serving concurrent requests on separate threads"""
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(
+            scope, receive, send
+        )
+
+
+app = PooledWsgiToAsgi(create_app())
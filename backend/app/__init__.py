@@ -1,11 +1,20 @@
+import os
+import time
+
+_import_started = time.perf_counter()
+
 from flask import Flask
 from flask_cors import CORS
 from backend.app.config import Config
 from backend.app.database import DatabaseConnection
+from backend.app import assets, compression, indexes, instrumentation, invalidation, render_cache, startup, uploads
+
+startup.profile.imports = time.perf_counter() - _import_started
 
 
 def create_app():
     """Application factory for creating Flask app"""
+    startup.profile.begin()
     app = Flask(__name__)
     app.secret_key = Config.SECRET_KEY
 
@@ -19,6 +28,7 @@ def create_app():
         print(f"Configuration error: {e}")
         print("Please check your .env file and ensure all required variables are set.")
         raise
+    startup.profile.mark('config')
 
     # Enable CORS for API endpoints only
     CORS(app, resources={
@@ -29,15 +39,55 @@ def create_app():
         }
     })
 
-    # Initialize database connection
+    # Response compression; registered first so it runs after the other
+    # after_request hooks (e.g. the debug toolbar) have finished the body
+    compression.init_app(app)
+
+    # Request timing, Mongo command listener, /metrics and Server-Timing
+    DatabaseConnection.add_listener(instrumentation.command_listener)
+    instrumentation.init_app(app)
+    if Config.QUERY_PROFILER:
+        from backend.app import profiler
+        profiler.init_app(app)
+    if Config.CPU_PROFILER:
+        from backend.app import cpu_profiler
+        cpu_profiler.init_app(app)
+    if Config.DATABASE_BACKEND == 'sqlite':
+        # The embedded store emits no command events; record its calls directly
+        from backend.app import profiler
+        from backend.app.sqlite_store import SQLiteCollection
+        profiler.patch_collection_class(SQLiteCollection)
+    startup.profile.mark('middleware')
+
+    # Initialize database connection (lazy; sockets open on first use in
+    # each worker process)
     DatabaseConnection.initialize()
 
+    # Ensure indexes once per worker
+    indexes.init_app(app)
+
+    # Background change watcher keeping in-process caches coherent
+    invalidation.init_app(app)
+
+    # Rendered page and card fragment caching
+    render_cache.init_app(app)
+
+    # Fingerprinted, pre-compressed static assets
+    assets.init_app(app)
+
+    # Request body limit and upload admission control
+    uploads.init_app(app)
+    startup.profile.mark('database_and_caches')
+
     # Register blueprints
     from backend.app.routes import (
         card_definitions_bp,
         inventory_items_bp,
         dashboard_bp,
-        upload_bp
+        upload_bp,
+        grading_bp,
+        sync_bp,
+        prices_bp
     )
     from backend.app.routes.web import web_bp
     from backend.app.routes.filters import filters_bp
@@ -50,11 +100,38 @@ def create_app():
     app.register_blueprint(inventory_items_bp)
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(upload_bp)
+    app.register_blueprint(grading_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(prices_bp)
     app.register_blueprint(filters_bp)
 
-    # Health check endpoint
+    startup.profile.mark('blueprints')
+
+    # Health check endpoint (liveness; /ready reports when warm-up is done)
     @app.route('/health')
     def health():
         return {'status': 'ok'}, 200
 
+    # Connection pool statistics for this worker process
+    @app.route('/api/db/pool-stats')
+    def pool_stats():
+        options = DatabaseConnection.client_options()
+        return {
+            'pid': os.getpid(),
+            'options': {
+                key: options[key]
+                for key in ('maxPoolSize', 'minPoolSize', 'maxIdleTimeMS', 'serverSelectionTimeoutMS',
+                            'connectTimeoutMS', 'socketTimeoutMS', 'retryWrites', 'compressors')
+                if key in options
+            },
+            'reporting_read_preference': Config.MONGO_REPORTING_READ_PREFERENCE,
+            'pool': DatabaseConnection.pool_stats.snapshot(),
+        }, 200
+
+    # Template bytecode cache, /ready and background warm-up
+    startup.init_app(app)
+    startup.profile.mark('warmup_start')
+    if Config.STARTUP_PROFILE:
+        startup.profile.log()
+
     return app
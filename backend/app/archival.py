@@ -0,0 +1,196 @@
+"""
+Archive tiering: move cold documents out of the hot collections
+
+Archived definitions and items, and optionally items sold more than N
+months ago, are moved in `_id`-ordered batches to CardDefinitionsArchive and
+InventoryItemsArchive. The hot collections (and their indexes) then only
+hold what the dashboard and card pages actually show, as years of history
+accumulate. Reads that need history pass include_archived and go through
+`find_all_tiers` / `page_all_tiers` / `find_one_any_tier`.
+
+Each batch is copied before it is deleted, and only documents whose
+`updated_at` still matches the copied version are deleted: one edited in
+between stays in the hot collection, its stale copy is removed, and a later
+run moves it again. Copies left in the cold collection by an interrupted run
+are replaced with the current version, so a run can simply be restarted.
+Items moved for being sold still count on the dashboard (`sold_counts`).
+Run with `python -m backend.app.archival` (e.g. from cron).
+"""
+
+import argparse
+import copy
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from backend.app.config import Config
+from backend.app.database import (
+    get_card_definitions_collection,
+    get_inventory_items_collection,
+    get_card_definitions_archive_collection,
+    get_inventory_items_archive_collection,
+    get_collection_versions_collection,
+)
+from backend.app.models import InventoryItemModel
+from backend.app.queries import Query
+from backend.app.versioning import bump_version, CARD_DEFINITIONS, INVENTORY_ITEMS
+
+DUPLICATE_KEY = 11000
+
+
+def move_batches(source, target, filter_query: dict, batch_size: int = None,
+                 pause: float = 0, dry_run: bool = False) -> int:
+    """
+    Move documents matching filter_query from source to target, batch_size at a time
+    Returns the number of documents moved (or that would be moved on dry_run).
+    """
+    batch_size = batch_size or Config.ARCHIVE_BATCH_SIZE
+    if dry_run:
+        return source.count_documents(filter_query)
+
+    moved = 0
+    last_id = None
+    while True:
+        query = dict(filter_query)
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(source.find(query).sort('_id', 1).limit(batch_size))
+        if not batch:
+            return moved
+
+        try:
+            target.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            if any(error['code'] != DUPLICATE_KEY for error in e.details['writeErrors']):
+                raise
+            # Copied by an earlier, interrupted run, possibly before later edits
+            stale = [batch[error['index']] for error in e.details['writeErrors']]
+            target.bulk_write([ReplaceOne({'_id': doc['_id']}, doc) for doc in stale])
+
+        # Only delete the versions that were copied
+        ids = [doc['_id'] for doc in batch]
+        moved += source.delete_many(
+            {'$or': [{'_id': doc['_id'], 'updated_at': doc.get('updated_at')} for doc in batch]}
+        ).deleted_count
+        edited = [doc['_id'] for doc in source.find({'_id': {'$in': ids}}, {'_id': 1})]
+        if edited:
+            target.delete_many({'_id': {'$in': edited}})
+        last_id = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+
+def sold_filter(months: int, now: datetime = None) -> dict:
+    """Items sold (disposition.date, YYYY-MM-DD) more than `months` months ago"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=30 * months)
+    return {'status': 'sold', 'disposition.date': {'$lt': cutoff.strftime('%Y-%m-%d')}}
+
+
+def run(sold_after_months: int = None, batch_size: int = None, pause: float = 0,
+        dry_run: bool = False) -> dict:
+    """
+    Move archived definitions/items, and items sold over sold_after_months
+    ago (Config.ARCHIVE_SOLD_AFTER_MONTHS by default; 0 disables), to the cold tier
+    Returns the number of documents moved per category.
+    """
+    if sold_after_months is None:
+        sold_after_months = Config.ARCHIVE_SOLD_AFTER_MONTHS
+
+    items = get_inventory_items_collection()
+    items_archive = get_inventory_items_archive_collection()
+    moved = {
+        'definitions': move_batches(
+            get_card_definitions_collection(), get_card_definitions_archive_collection(),
+            {'archived': True}, batch_size, pause, dry_run
+        ),
+        'items': move_batches(items, items_archive, {'archived': True}, batch_size, pause, dry_run),
+        'sold_items': 0,
+    }
+    if sold_after_months:
+        moved['sold_items'] = move_batches(
+            items, items_archive, sold_filter(sold_after_months), batch_size, pause, dry_run
+        )
+
+    if not dry_run:
+        changed = [CARD_DEFINITIONS] if moved['definitions'] else []
+        if moved['items'] or moved['sold_items']:
+            changed.append(INVENTORY_ITEMS)
+        if changed:
+            # Offline clients synced before this run must resync from scratch
+            # (see routes/sync.py), since moved documents leave no tombstone
+            get_collection_versions_collection().update_one(
+                {'_id': 'Archival'}, {'$set': {'last_run': datetime.utcnow()}}, upsert=True
+            )
+            bump_version(*changed)
+    return moved
+
+
+def sold_counts(include_archived: bool = False, reporting: bool = False, definition_ids: list = None) -> dict:
+    """
+    Map definition id -> number of sold items in the cold tier (of
+    definition_ids only, if given)
+    Added to the hot collection's counts wherever sold totals are shown.
+    """
+    collection = get_inventory_items_archive_collection(reporting)
+    pipeline = InventoryItemModel.sold_counts_pipeline(include_archived, definition_ids)
+    return {row['_id']: row['count'] for row in collection.aggregate(pipeline)}
+
+
+def find_all_tiers(hot, cold, query, include_archived: bool = False) -> list:
+    """Documents matching query (a Query or filter dict) in the hot collection, plus the cold one if include_archived"""
+    if not isinstance(query, Query):
+        query = Query(query)
+    documents = query.find(hot)
+    if include_archived:
+        documents.extend(query.find(cold))
+    return documents
+
+
+def page_all_tiers(hot, cold, query: Query, page: int, per_page: int, include_archived: bool = False) -> tuple:
+    """
+    One page of the documents matching query (in its sort order, hot
+    collection before cold) and their total count
+    """
+    hot_total = query.count(hot)
+    total = hot_total + (query.count(cold) if include_archived else 0)
+    offset = max(page - 1, 0) * per_page
+
+    documents = []
+    if offset < hot_total:
+        documents = _window(query, offset, per_page).find(hot)
+    if include_archived and len(documents) < per_page:
+        documents.extend(_window(query, max(offset - hot_total, 0), per_page - len(documents)).find(cold))
+    return documents, total
+
+
+def _window(query: Query, skip: int, limit: int) -> Query:
+    window = copy.copy(query)
+    window.skip_count, window.limit_count = skip, limit
+    return window
+
+
+def find_one_any_tier(hot, cold, filter_query: dict):
+    """A single document from the hot collection, falling back to the cold one"""
+    doc = hot.find_one(filter_query)
+    return doc if doc is not None else cold.find_one(filter_query)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move archived and long-sold documents to the archive collections')
+    parser.add_argument('--sold-after-months', type=int, default=None,
+                        help='Also move items sold more than N months ago (default ARCHIVE_SOLD_AFTER_MONTHS)')
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Only count what would be moved')
+    args = parser.parse_args()
+
+    moved = run(args.sold_after_months, args.batch_size, args.pause, args.dry_run)
+    verb = 'Would move' if args.dry_run else 'Moved'
+    print(f"{verb} {moved['definitions']} definitions, {moved['items']} archived items "
+          f"and {moved['sold_items']} sold items")
+
+
+if __name__ == '__main__':
+    main()
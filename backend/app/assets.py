@@ -0,0 +1,139 @@
+"""
+Fingerprinted static assets
+
+`npm run build:css` compiles static/src/app.css with Tailwind into
+static/css/app.css, keeping only the classes the templates and scripts use.
+`python -m backend.app.assets` then copies each bundle in ASSETS to
+static/dist/<name>.<hash>.<ext> with pre-compressed .gz (and .br, when the
+brotli package is installed) siblings, and writes static/dist/manifest.json.
+build.sh runs both.
+
+Templates link assets with asset_url('js/dashboard.js'). With a manifest
+that resolves to the hashed copy, served with a far-future immutable
+Cache-Control and as the .br/.gz variant the client accepts. Without one
+(development) it falls back to the plain static file, and base.html to the
+Tailwind CDN.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import request, send_from_directory, url_for
+
+from backend.app.config import Config
+
+try:
+    import brotli
+except ImportError:  # .br variants are optional
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Bundles to fingerprint, relative to static/
+ASSETS = ['css/app.css', 'js/dashboard.js', 'js/offline.js']
+
+# Pre-compressed variants, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_manifest = {}
+
+
+def build(static_dir: str = STATIC_DIR) -> dict:
+    """Write hashed, pre-compressed copies of ASSETS and the manifest; returns the manifest"""
+    dist_dir = os.path.join(static_dir, 'dist')
+    os.makedirs(dist_dir, exist_ok=True)
+
+    manifest = {}
+    for path in ASSETS:
+        source = os.path.join(static_dir, path)
+        if not os.path.exists(source):
+            print(f"Skipping missing asset {path}")
+            continue
+        with open(source, 'rb') as f:
+            content = f.read()
+
+        name, ext = os.path.splitext(os.path.basename(path))
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        filename = f'{name}.{digest}{ext}'
+        target = os.path.join(dist_dir, filename)
+
+        with open(target, 'wb') as f:
+            f.write(content)
+        with open(target + '.gz', 'wb') as f:
+            # mtime=0 keeps the output identical across builds
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(target + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+        manifest[path] = f'dist/{filename}'
+
+    # Drop copies from earlier builds
+    current = {os.path.basename(hashed) for hashed in manifest.values()}
+    for filename in os.listdir(dist_dir):
+        base = filename[:-3] if filename.endswith(('.gz', '.br')) else filename
+        if filename != 'manifest.json' and base not in current:
+            os.remove(os.path.join(dist_dir, filename))
+
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    global _manifest
+    try:
+        with open(path) as f:
+            _manifest = json.load(f)
+    except (OSError, ValueError):
+        _manifest = {}
+    return _manifest
+
+
+def asset_built(path: str) -> bool:
+    """Whether the build produced a fingerprinted copy of path"""
+    return path in _manifest
+
+
+def asset_url(path: str) -> str:
+    """URL of the fingerprinted copy of a static asset, else of the file itself"""
+    return url_for('static', filename=_manifest.get(path, path))
+
+
+def serve_static(app, filename: str):
+    """
+    Static view: fingerprinted files get a far-future Cache-Control and are
+    sent pre-compressed when the client accepts it
+    """
+    if not filename.startswith('dist/'):
+        return app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = None
+    for encoding, suffix in ENCODINGS:
+        if encoding in request.accept_encodings and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(app.static_folder, filename, mimetype=mimetype)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={Config.STATIC_ASSET_MAX_AGE}, immutable'
+    return response
+
+
+def init_app(app):
+    """Load the manifest and serve /static through serve_static"""
+    load_manifest()
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.jinja_env.globals['asset_built'] = asset_built
+    app.view_functions['static'] = lambda filename: serve_static(app, filename)
+
+
+if __name__ == '__main__':
+    for logical, hashed in build().items():
+        print(f'{logical} -> {hashed}')
@@ -0,0 +1,123 @@
+"""
+Async MongoDB data layer for the optional async serving mode (ASYNC_DB=True)
+
+An async client (pymongo's AsyncMongoClient, or Motor on older pymongo) lives
+on a dedicated event loop thread per worker process. Views hand coroutines
+to that loop with `run()`, so independent queries are issued concurrently
+with asyncio.gather instead of one round trip after another, and the client
+is never shared across event loops. imgbb sends uploads from the same loop.
+"""
+
+import asyncio
+import os
+import threading
+
+from backend.app.config import Config
+from backend.app.database import DatabaseConnection
+from backend.app.models import InventoryItemModel
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # pymongo < 4.9
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+    except ImportError:
+        AsyncMongoClient = None
+
+
+class AsyncDatabaseConnection:
+    """Async MongoDB client bound to a background event loop"""
+
+    _loop: asyncio.AbstractEventLoop = None
+    _client = None
+    _pid: int = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def initialize(cls):
+        """Start the event loop thread and create the client (once per process)"""
+        if AsyncMongoClient is None:
+            raise RuntimeError("ASYNC_DB requires pymongo>=4.9 or motor")
+
+        with cls._lock:
+            if cls._loop is not None and cls._pid == os.getpid():
+                return
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='async-mongo-loop', daemon=True)
+            thread.start()
+
+            async def create_client():
+                # Same command listeners as the sync client, so these queries show up in
+                # the request's instrumentation (Flask's request context is a contextvar
+                # and run_coroutine_threadsafe carries it into the loop)
+                return AsyncMongoClient(
+                    Config.MONGODB_URI,
+                    event_listeners=list(DatabaseConnection._listeners),
+                    **DatabaseConnection.client_options()
+                )
+
+            cls._client = asyncio.run_coroutine_threadsafe(create_client(), loop).result()
+            cls._loop = loop
+            cls._pid = os.getpid()
+
+    @classmethod
+    def get_db(cls):
+        if cls._loop is None or cls._pid != os.getpid():
+            cls.initialize()
+        return cls._client.get_database()
+
+    @classmethod
+    def run(cls, coro, timeout: float = None):
+        """Run a coroutine on the client's loop and wait for its result"""
+        if cls._loop is None or cls._pid != os.getpid():
+            cls.initialize()
+        return asyncio.run_coroutine_threadsafe(coro, cls._loop).result(timeout)
+
+
+async def load_dashboard(filter_query: dict, selector_projection: dict = None, filtered: bool = False):
+    """
+    Definitions matching the dashboard filter, all definitions for the add
+    inventory modal, per-definition status counts and the archive tier's
+    sold counts, fetched concurrently
+    When filtered, the counts are limited to the matching definitions and
+    run once those are loaded.
+    Returns: (definitions, all_definitions, counts_by_definition_id, archived_sold_by_definition_id)
+    """
+    db = AsyncDatabaseConnection.get_db()
+    definitions_collection = db['CardDefinitions']
+    items_collection = db['InventoryItems']
+    archive_collection = db['InventoryItemsArchive']
+
+    async def aggregate(collection, pipeline):
+        cursor = await collection.aggregate(pipeline) \
+            if asyncio.iscoroutinefunction(collection.aggregate) else collection.aggregate(pipeline)
+        return await cursor.to_list(None)
+
+    async def status_counts(definition_ids=None):
+        counts = {}
+        for row in await aggregate(items_collection, InventoryItemModel.status_counts_pipeline(definition_ids)):
+            counts.setdefault(row['_id']['definition'], {})[row['_id']['status']] = row['count']
+        return counts
+
+    async def archived_sold(definition_ids=None):
+        pipeline = InventoryItemModel.sold_counts_pipeline(definition_ids=definition_ids)
+        rows = await aggregate(archive_collection, pipeline)
+        return {row['_id']: row['count'] for row in rows}
+
+    async def definitions_with_counts():
+        definitions = await definitions_collection.find(filter_query).to_list(None)
+        definition_ids = [definition['_id'] for definition in definitions]
+        return (definitions, *await asyncio.gather(status_counts(definition_ids), archived_sold(definition_ids)))
+
+    all_definitions = definitions_collection.find({'archived': {'$ne': True}}, selector_projection).to_list(None)
+    if filtered:
+        (definitions, counts, sold), all_definitions = await asyncio.gather(definitions_with_counts(), all_definitions)
+        return definitions, all_definitions, counts, sold
+
+    return tuple(await asyncio.gather(
+        definitions_collection.find(filter_query).to_list(None),
+        all_definitions,
+        status_counts(),
+        archived_sold(),
+    ))
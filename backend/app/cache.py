@@ -0,0 +1,104 @@
+"""
+In-process caches kept coherent across workers via invalidation events
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from backend.app import invalidation
+
+
+class LocalCache:
+    """
+    Small thread-safe LRU cache cleared whenever one of its collections changes
+
+    Entries are evicted least-recently-used beyond max_entries (and, when
+    max_bytes is set, beyond that many bytes of string values), and expire
+    after ttl seconds as a safety net if an invalidation event is missed.
+    """
+
+    def __init__(self, name: str, collections, max_entries: int = 256, ttl: float = 300,
+                 max_bytes: int = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        invalidation.subscribe(collections, self.on_change)
+
+    @staticmethod
+    def _sizeof(value) -> int:
+        return len(value) if isinstance(value, (str, bytes)) else 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl and entry[1] < time.monotonic()):
+                self._pop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever the cache is cleared (see set)"""
+        return self._generation
+
+    def set(self, key, value, generation: int = None):
+        """
+        Store value under key; with generation (read before computing value),
+        values computed while an invalidation came in are dropped
+        """
+        size = self._sizeof(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._pop(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl if self.ttl else None, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[2]
+
+    def get_or_set(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            generation = self._generation
+            value = compute()
+            # Don't store a value computed while an invalidation came in
+            self.set(key, value, generation)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+
+    def on_change(self, event):
+        self.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+            used = self._bytes
+        return {'name': self.name, 'entries': size, 'bytes': used, 'hits': self.hits, 'misses': self.misses}
+
+
+_MISSING = object()
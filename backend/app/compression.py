@@ -0,0 +1,158 @@
+"""
+Response compression negotiated by Accept-Encoding
+
+HTML pages and JSON arrays (dashboard, /api/dashboard, /api/inventory)
+grow with the catalog and compress 5-10x. Responses of a compressible type
+and at least COMPRESSION_MIN_SIZE bytes are sent as brotli, zstd or gzip,
+whichever the client prefers among those available (brotli and zstd need
+the brotli / zstandard packages). Streamed responses are compressed chunk by
+chunk, flushing after each so the client still gets them incrementally.
+
+Responses that already carry a Content-Encoding (pre-compressed static
+assets), file responses and views decorated with @no_compression are sent
+as they are.
+"""
+
+import zlib
+
+from flask import current_app, request
+
+from backend.app.config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'text/xml', 'text/csv',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+}
+
+
+def no_compression(view):
+    """Send this view's responses uncompressed (e.g. already-compressed payloads)"""
+    view._no_compression = True
+    return view
+
+
+class _Gzip:
+    def __init__(self):
+        # wbits 16+MAX_WBITS writes the gzip container
+        self._compressor = zlib.compressobj(Config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=Config.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=Config.COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encodings() -> dict:
+    """Encoding -> compressor class, in server preference order"""
+    encodings = {}
+    if brotli is not None:
+        encodings['br'] = _Brotli
+    if zstandard is not None:
+        encodings['zstd'] = _Zstd
+    encodings['gzip'] = _Gzip
+    return encodings
+
+
+def _compressible(response) -> bool:
+    if not 200 <= response.status_code < 300 or response.status_code == 204:
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    return not getattr(view, '_no_compression', False)
+
+
+def _stream(chunks, compressor):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_response(response):
+    """Compress response in place when it's worth it and the client accepts an encoding"""
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    encodings = available_encodings()
+    encoding = request.accept_encodings.best_match(list(encodings))
+    if not encoding:
+        return response
+    compressor = encodings[encoding]()
+
+    if response.is_streamed:
+        response.response = _stream(response.response, compressor)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < Config.COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compressor.compress(data) + compressor.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    # The compressed bytes differ from the identity representation
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """
+    Compress responses after every other after_request hook has run
+    (hooks run in reverse order of registration, so call this first)
+    """
+    if not Config.COMPRESSION_ENABLED:
+        return
+    app.after_request(compress_response)
+
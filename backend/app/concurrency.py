@@ -0,0 +1,59 @@
+"""
+Concurrent fan-out of independent queries within a request
+
+pymongo releases the GIL while waiting on the network, so running
+independent queries on a shared thread pool makes a page's database time
+roughly the slowest query rather than the sum of all of them.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app.config import Config
+from backend.app import instrumentation
+
+_executor: ThreadPoolExecutor = None
+_executor_pid: int = None
+_executor_lock = threading.Lock()
+_worker = threading.local()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared pool for this process (recreated after fork)"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=Config.QUERY_EXECUTOR_WORKERS,
+                    thread_name_prefix='query'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _bind(call, metrics):
+    def run():
+        _worker.active = True
+        try:
+            with instrumentation.attributed_to(metrics):
+                return call()
+        finally:
+            _worker.active = False
+    return run
+
+
+def run_concurrently(*calls, timeout: float = None) -> list:
+    """
+    Run zero-argument callables concurrently and return their results in order
+    The first exception raised by any call is re-raised here.
+    """
+    # Nested fan-out from a pool thread runs inline so the pool can't deadlock
+    if len(calls) <= 1 or Config.QUERY_EXECUTOR_WORKERS <= 1 or getattr(_worker, 'active', False):
+        return [call() for call in calls]
+
+    metrics = instrumentation.current_metrics()
+    executor = get_executor()
+    futures = [executor.submit(_bind(call, metrics)) for call in calls]
+    return [future.result(timeout) for future in futures]
@@ -12,11 +12,147 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
     DEBUG = os.getenv("FLASK_DEBUG", "True") == "True"
 
+    # Storage backend: "mongodb", or "sqlite" for an embedded single-file
+    # store (single-node deployments and local development)
+    DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "mongodb")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "card_inventory.sqlite3")
+
     # MongoDB settings
     MONGODB_URI = os.getenv("MONGODB_URI")
 
+    # MongoDB client tuning
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 20))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 10000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")
+    MONGO_RETRY_WRITES = os.getenv("MONGO_RETRY_WRITES", "True") == "True"
+    # Read preference for dashboard/reporting reads (e.g. secondaryPreferred)
+    MONGO_REPORTING_READ_PREFERENCE = os.getenv("MONGO_REPORTING_READ_PREFERENCE", "primary")
+    # Create the indexes in backend/app/indexes.py on each worker's first request
+    AUTO_CREATE_INDEXES = os.getenv("AUTO_CREATE_INDEXES", "True") == "True"
+
+    # Archive tiering (python -m backend.app.archival): also move items sold
+    # more than N months ago to the archive collections (0 = only archived)
+    ARCHIVE_SOLD_AFTER_MONTHS = int(os.getenv("ARCHIVE_SOLD_AFTER_MONTHS", 0))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+
+    # Data migrations (python -m backend.app.migrations): documents per batch,
+    # and the pause after each batch as a fixed delay plus a multiple of the
+    # time the batch took (1.0 = idle as long as busy)
+    MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 500))
+    MIGRATION_PAUSE = float(os.getenv("MIGRATION_PAUSE", 0))
+    MIGRATION_THROTTLE = float(os.getenv("MIGRATION_THROTTLE", 1.0))
+
+    # Duplicate definition detection (see duplicates.py): minimum similarity
+    # to report or block a definition, and how often each worker rebuilds
+    # its index from scratch (seconds)
+    DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", 0.75))
+    DUPLICATE_INDEX_REBUILD = float(os.getenv("DUPLICATE_INDEX_REBUILD", 3600))
+
+    # Market price import (see valuation.py): rows inserted per batch, and the
+    # request body cap of /api/prices/import (feeds are larger than uploads)
+    PRICE_INGEST_BATCH_SIZE = int(os.getenv("PRICE_INGEST_BATCH_SIZE", 1000))
+    PRICE_IMPORT_MAX_BYTES = int(os.getenv("PRICE_IMPORT_MAX_BYTES", 256 * 1024 * 1024))
+
+    # Scanner lookups (see lookup.py): cached codes per worker, codes per batch request
+    LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", 4096))
+    LOOKUP_MAX_CODES = int(os.getenv("LOOKUP_MAX_CODES", 500))
+
+    # Items per status tab on the card detail page; later pages load on demand
+    CARD_DETAIL_PAGE_SIZE = int(os.getenv("CARD_DETAIL_PAGE_SIZE", 25))
+
+    # Grading submissions out longer than this are flagged overdue
+    GRADING_OVERDUE_DAYS = int(os.getenv("GRADING_OVERDUE_DAYS", 60))
+
+    # Delta sync (routes/sync.py): seconds of changes before the cursor that are
+    # re-read, covering writes whose updated_at was set before they committed
+    # and clock differences between app servers
+    SYNC_CLOCK_SKEW = float(os.getenv("SYNC_CLOCK_SKEW", 30))
+
+    # HTTP caching: Cache-Control sent with ETag-validated API responses.
+    # The default lets browsers/proxies store responses but revalidate
+    # (cheap 304s) on every use.
+    HTTP_CACHE_CONTROL = os.getenv("HTTP_CACHE_CONTROL", "public, no-cache")
+
+    # Response compression (br/zstd need the brotli/zstandard packages)
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True") == "True"
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+
+    # Cache lifetime for fingerprinted static assets (see assets.py)
+    STATIC_ASSET_MAX_AGE = int(os.getenv("STATIC_ASSET_MAX_AGE", 31536000))
+
+    # Cross-worker cache invalidation (change streams, else polling); a failed
+    # change stream is reopened after up to CACHE_WATCH_MAX_BACKOFF seconds
+    CACHE_WATCHER_ENABLED = os.getenv("CACHE_WATCHER_ENABLED", "True") == "True"
+    CACHE_POLL_INTERVAL = float(os.getenv("CACHE_POLL_INTERVAL", 5))
+    CACHE_WATCH_MAX_BACKOFF = float(os.getenv("CACHE_WATCH_MAX_BACKOFF", 30))
+
+    # Rendered page/fragment cache (per worker, LRU with a byte cap)
+    RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "True") == "True"
+    PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 24 * 1024 * 1024))
+    FRAGMENT_CACHE_MAX_BYTES = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+
+    # Threads for running a request's independent queries concurrently
+    # (1 runs them sequentially)
+    QUERY_EXECUTOR_WORKERS = int(os.getenv("QUERY_EXECUTOR_WORKERS", 8))
+
+    # Async serving mode: dashboard queries run concurrently on an async
+    # Mongo client (pymongo AsyncMongoClient or Motor); see asgi.py
+    ASYNC_DB = os.getenv("ASYNC_DB", "False") == "True"
+    # Threads per worker serving requests under asgi.py
+    ASGI_THREADS = int(os.getenv("ASGI_THREADS", 32))
+
+    # Cold start: print the startup time breakdown, warm each worker up in
+    # the background (/ready reports when done) and keep compiled templates
+    # in JINJA_CACHE_DIR (filled at build time by python -m backend.app.startup)
+    STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "False") == "True"
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "False") == "True"
+    # Set by gunicorn.conf.py with preload: workers start warm-up after fork
+    WARMUP_AFTER_FORK = os.getenv("WARMUP_AFTER_FORK", "False") == "True"
+    JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", "")
+
     # ImgBB settings
     IMGBB_API_KEY = os.getenv("IMGBB_API_KEY")
+    IMGBB_UPLOAD_URL = os.getenv("IMGBB_UPLOAD_URL", "https://api.imgbb.com/1/upload")
+    IMGBB_TIMEOUT = float(os.getenv("IMGBB_TIMEOUT", 30))
+
+    # Upload admission control (see uploads.py): request body cap, concurrent
+    # ImgBB uploads per process, how many more may wait and for how long, and
+    # the multipart body size from which a request is treated as an upload
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 16 * 1024 * 1024))
+    UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", 2))
+    UPLOAD_MAX_WAITING = int(os.getenv("UPLOAD_MAX_WAITING", 4))
+    UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", 10))
+    UPLOAD_RETRY_AFTER = int(os.getenv("UPLOAD_RETRY_AFTER", 5))
+    UPLOAD_ADMIT_MIN_BYTES = int(os.getenv("UPLOAD_ADMIT_MIN_BYTES", 8 * 1024))
+
+    # Instrumentation: append a panel listing every query to HTML pages
+    DEBUG_TOOLBAR = os.getenv("DEBUG_TOOLBAR", "False") == "True"
+
+    # Query profiler (N+1, collection scan and query budget checks)
+    QUERY_PROFILER = os.getenv("QUERY_PROFILER", "False") == "True"
+    QUERY_PROFILER_STRICT = os.getenv("QUERY_PROFILER_STRICT", "False") == "True"
+    QUERY_PROFILER_REPEAT_THRESHOLD = int(os.getenv("QUERY_PROFILER_REPEAT_THRESHOLD", 5))
+    QUERY_PROFILER_EXPLAIN_SAMPLE = float(os.getenv("QUERY_PROFILER_EXPLAIN_SAMPLE", 0.1))
+    QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", 0))  # 0 disables the budget
+    SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", 100))
+
+    # Sampling CPU profiler for live requests (see cpu_profiler.py): profile
+    # 1 in CPU_PROFILER_SAMPLE_RATE requests (0 = none) plus any request with
+    # the X-Profile: CPU_PROFILER_SECRET header, which also guards the
+    # /api/admin/profiles endpoints
+    CPU_PROFILER = os.getenv("CPU_PROFILER", "False") == "True"
+    CPU_PROFILER_SAMPLE_RATE = int(os.getenv("CPU_PROFILER_SAMPLE_RATE", 0))
+    CPU_PROFILER_SECRET = os.getenv("CPU_PROFILER_SECRET", "")
+    CPU_PROFILER_INTERVAL_MS = float(os.getenv("CPU_PROFILER_INTERVAL_MS", 5))
+    CPU_PROFILER_DIR = os.getenv("CPU_PROFILER_DIR", "")
+    CPU_PROFILER_MAX_PROFILES = int(os.getenv("CPU_PROFILER_MAX_PROFILES", 200))
 
     # CORS settings
     FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -27,7 +163,13 @@ class Config:
     @staticmethod
     def validate():
         """Validate required configuration"""
-        required = ["MONGODB_URI", "IMGBB_API_KEY"]
+        required = ["IMGBB_API_KEY"]
+        if Config.DATABASE_BACKEND == "mongodb":
+            required.insert(0, "MONGODB_URI")
+        elif Config.DATABASE_BACKEND != "sqlite":
+            raise ValueError(f"Unknown DATABASE_BACKEND: {Config.DATABASE_BACKEND}")
+        elif Config.ASYNC_DB:
+            raise ValueError("ASYNC_DB is not supported with DATABASE_BACKEND=sqlite")
         missing = [key for key in required if not os.getenv(key)]
 
         if missing:
@@ -0,0 +1,237 @@
+"""
+On-demand sampling CPU profiler for live requests
+
+With CPU_PROFILER=True, a request is profiled when it carries the
+`X-Profile` header set to CPU_PROFILER_SECRET, and otherwise with
+probability 1/CPU_PROFILER_SAMPLE_RATE (0 = only on request). While a
+profiled request runs, a background thread takes the request thread's
+Python stack every CPU_PROFILER_INTERVAL_MS (sys._current_frames), so the
+view itself runs uninstrumented. Samples are wall-clock: time spent waiting
+on Mongo or ImgBB shows up as socket frames next to the CPU-bound loops and
+Jinja rendering.
+
+Each profile is written to CPU_PROFILER_DIR as collapsed stacks
+("root;caller;callee count" per line), the input format of flamegraph.pl,
+speedscope and inferno. It is named after the route, e.g.
+`web.card_detail__20260101T120000_1234_0.folded`, and only the newest
+CPU_PROFILER_MAX_PROFILES are kept. The directory is shared by the workers of
+one host. The response names its profile in an X-CPU-Profile header.
+
+Admin endpoints (X-Profile: CPU_PROFILER_SECRET required):
+- GET /api/admin/profiles[?endpoint=web.card_detail] - profiles, newest first
+- GET /api/admin/profiles/<name> - download one profile
+- GET /api/admin/profiles/endpoint/<endpoint> - one route's profiles merged
+
+When CPU_PROFILER is off, init_app isn't called: no hooks, no routes, no cost.
+"""
+
+import functools
+import hmac
+import itertools
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+from flask import Response, abort, g, jsonify, request
+
+from backend.app import instrumentation
+from backend.app.config import Config
+
+PROFILE_HEADER = 'X-Profile'
+SUFFIX = '.folded'
+
+_sequence = itertools.count()
+_NAME = re.compile(r'^(?P<endpoint>[\w.-]+)__(?P<ts>\d{8}T\d{6})_(?P<pid>\d+)_(?P<seq>\d+)\.folded$')
+
+
+class Sampler:
+    """Collects a thread's stack every `interval` seconds from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='cpu-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def folded(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """filename relative to the longest sys.path entry containing it"""
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def collapse(frame) -> str:
+    """A frame's stack as 'root;...;leaf'"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def profile_dir() -> str:
+    return Config.CPU_PROFILER_DIR or os.path.join(tempfile.gettempdir(), 'card_inventory_profiles')
+
+
+def _authorized() -> bool:
+    token = request.headers.get(PROFILE_HEADER, '')
+    return bool(Config.CPU_PROFILER_SECRET) and hmac.compare_digest(token, Config.CPU_PROFILER_SECRET)
+
+
+def _should_profile() -> bool:
+    if request.endpoint is None or request.endpoint == 'static' or request.path.startswith('/api/admin/profiles'):
+        return False
+    if _authorized():
+        return True
+    rate = Config.CPU_PROFILER_SAMPLE_RATE
+    return rate > 0 and random.random() * rate < 1
+
+
+def save(endpoint: str, sampler: Sampler) -> str:
+    """Write a profile and prune old ones; returns its name"""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = f"{endpoint}__{datetime.utcnow():%Y%m%dT%H%M%S}_{os.getpid()}_{next(_sequence)}{SUFFIX}"
+    path = os.path.join(directory, name)
+    with open(path + '.tmp', 'w') as f:
+        f.write(sampler.folded())
+    os.replace(path + '.tmp', path)
+
+    profiles = sorted((entry for entry in os.scandir(directory) if _NAME.match(entry.name)),
+                      key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in profiles[Config.CPU_PROFILER_MAX_PROFILES:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass  # pruned by another worker
+    return name
+
+
+def list_profiles(endpoint: str = None) -> list:
+    """Stored profiles, newest first"""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        match = _NAME.match(entry.name)
+        if not match or (endpoint and match['endpoint'] != endpoint):
+            continue
+        stat = entry.stat()
+        profiles.append({
+            'name': entry.name,
+            'endpoint': match['endpoint'],
+            'created_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+            'pid': int(match['pid']),
+            'bytes': stat.st_size,
+        })
+    return sorted(profiles, key=lambda profile: profile['created_at'], reverse=True)
+
+
+def merged(endpoint: str) -> str:
+    """All stored profiles of one route as a single collapsed-stack file"""
+    stacks = Counter()
+    for profile in list_profiles(endpoint):
+        try:
+            with open(os.path.join(profile_dir(), profile['name'])) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    stacks[stack] += int(count)
+        except FileNotFoundError:
+            continue
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def _folded_response(body: str, filename: str) -> Response:
+    return Response(body, mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+def init_app(app):
+    """Sample selected requests and register the admin endpoints"""
+
+    @app.before_request
+    def start_cpu_profile():
+        if _should_profile():
+            sampler = Sampler(threading.get_ident(), Config.CPU_PROFILER_INTERVAL_MS / 1000)
+            g._cpu_sampler = sampler
+            sampler.start()
+
+    def finish_cpu_profile():
+        sampler = g.pop('_cpu_sampler', None)
+        if sampler is None:
+            return None
+        sampler.stop()
+        if not sampler.stacks:
+            return None
+        instrumentation.registry.inc('cpu_profiles_total', {'endpoint': request.endpoint})
+        return save(request.endpoint, sampler)
+
+    @app.after_request
+    def save_cpu_profile(response):
+        name = finish_cpu_profile()
+        if name:
+            response.headers['X-CPU-Profile'] = name
+        return response
+
+    @app.teardown_request
+    def stop_cpu_profile(exc):
+        # Requests that failed before after_request
+        finish_cpu_profile()
+
+    @app.route('/api/admin/profiles')
+    def cpu_profiles():
+        if not _authorized():
+            abort(403)
+        return jsonify({'directory': profile_dir(), 'profiles': list_profiles(request.args.get('endpoint'))}), 200
+
+    @app.route('/api/admin/profiles/<name>')
+    def cpu_profile(name):
+        if not _authorized():
+            abort(403)
+        if not _NAME.match(name):
+            abort(404)
+        try:
+            with open(os.path.join(profile_dir(), name)) as f:
+                return _folded_response(f.read(), name)
+        except FileNotFoundError:
+            abort(404)
+
+    @app.route('/api/admin/profiles/endpoint/<endpoint>')
+    def cpu_profile_merged(endpoint):
+        if not _authorized():
+            abort(403)
+        body = merged(endpoint)
+        if not body:
+            abort(404)
+        return _folded_response(body, f'{endpoint}{SUFFIX}')
@@ -1,43 +1,223 @@
-from pymongo import MongoClient
+import os
+import threading
+from pymongo import MongoClient, monitoring, read_preferences
 from pymongo.database import Database
 from backend.app.config import Config
+from backend.app.repository import CollectionRepository
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Tracks connection pool activity for the pool-stats endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {
+                'pools_created': 0,
+                'pools_cleared': 0,
+                'connections_created': 0,
+                'connections_closed': 0,
+                'checkouts': 0,
+                'checkout_failures': 0,
+                'checked_out': 0,
+            }
+
+    def _incr(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['open_connections'] = stats['connections_created'] - stats['connections_closed']
+        return stats
+
+    def pool_created(self, event):
+        self._incr('pools_created')
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._incr('pools_cleared')
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._incr('connections_created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._incr('connections_closed')
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._incr('checkout_failures')
+
+    def connection_checked_out(self, event):
+        self._incr('checkouts')
+        self._incr('checked_out')
+
+    def connection_checked_in(self, event):
+        self._incr('checked_out', -1)
 
 
 class DatabaseConnection:
-    """MongoDB database connection manager"""
+    """Database connection manager (MongoDB, or the embedded SQLite store)"""
 
     _client: MongoClient = None
     _db: Database = None
+    _pid: int = None
+    _lock = threading.Lock()
+    _listeners: list = []
+    pool_stats = PoolStatsListener()
+
+    @staticmethod
+    def client_options() -> dict:
+        """MongoClient keyword arguments derived from Config"""
+        options = {
+            'maxPoolSize': Config.MONGO_MAX_POOL_SIZE,
+            'minPoolSize': Config.MONGO_MIN_POOL_SIZE,
+            'maxIdleTimeMS': Config.MONGO_MAX_IDLE_TIME_MS,
+            'serverSelectionTimeoutMS': Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            'connectTimeoutMS': Config.MONGO_CONNECT_TIMEOUT_MS,
+            'socketTimeoutMS': Config.MONGO_SOCKET_TIMEOUT_MS,
+            'retryWrites': Config.MONGO_RETRY_WRITES,
+            # Don't open sockets until first use so the client is safe to
+            # create before gunicorn forks its workers
+            'connect': False,
+        }
+        if Config.MONGO_COMPRESSORS:
+            options['compressors'] = Config.MONGO_COMPRESSORS
+        return options
+
+    @classmethod
+    def add_listener(cls, listener):
+        """Register a pymongo event listener for clients created from now on"""
+        if listener not in cls._listeners:
+            cls._listeners.append(listener)
 
     @classmethod
     def initialize(cls):
-        """Initialize MongoDB connection"""
-        if cls._client is None:
-            cls._client = MongoClient(Config.MONGODB_URI)
-            cls._db = cls._client.get_database()
+        """Initialize MongoDB connection (one client per process)"""
+        with cls._lock:
+            if cls._client is not None and cls._pid != os.getpid():
+                # Inherited from the parent across a fork; sockets and
+                # monitor threads are not shared, so start over.
+                cls._client = None
+                cls._db = None
+                cls.pool_stats.reset()
+
+            if cls._client is None and Config.DATABASE_BACKEND == 'sqlite':
+                from backend.app.sqlite_store import SQLiteClient
+                cls._client = SQLiteClient(Config.SQLITE_PATH)
+                cls._db = cls._client.get_database()
+                cls._pid = os.getpid()
+
+            if cls._client is None:
+                cls._client = MongoClient(
+                    Config.MONGODB_URI,
+                    event_listeners=[cls.pool_stats, *cls._listeners],
+                    **cls.client_options()
+                )
+                cls._db = cls._client.get_database()
+                cls._pid = os.getpid()
+
+    @classmethod
+    def get_client(cls) -> MongoClient:
+        """Get the MongoClient for the current process"""
+        if cls._client is None or cls._pid != os.getpid():
+            cls.initialize()
+        return cls._client
 
     @classmethod
     def get_db(cls) -> Database:
         """Get database instance"""
-        if cls._db is None:
+        if cls._db is None or cls._pid != os.getpid():
             cls.initialize()
         return cls._db
 
+    @classmethod
+    def get_reporting_db(cls) -> Database:
+        """Get database instance using the reporting read preference"""
+        db = cls.get_db()
+        if Config.MONGO_REPORTING_READ_PREFERENCE == 'primary' or Config.DATABASE_BACKEND == 'sqlite':
+            return db
+        return db.with_options(read_preference=_read_preference(Config.MONGO_REPORTING_READ_PREFERENCE))
+
     @classmethod
     def close(cls):
         """Close database connection"""
         if cls._client:
-            cls._client.close()
+            if cls._pid == os.getpid():
+                cls._client.close()
             cls._client = None
             cls._db = None
+            cls._pid = None
+
+
+def _read_preference(name: str):
+    """Map a readPreference name (e.g. secondaryPreferred) to a pymongo object"""
+    lookup = {
+        'primary': read_preferences.Primary(),
+        'primaryPreferred': read_preferences.PrimaryPreferred(),
+        'secondary': read_preferences.Secondary(),
+        'secondaryPreferred': read_preferences.SecondaryPreferred(),
+        'nearest': read_preferences.Nearest(),
+    }
+    if name not in lookup:
+        raise ValueError(f"Invalid read preference: {name}")
+    return lookup[name]
 
 
 # Database collections
-def get_card_definitions_collection():
+def get_card_definitions_collection(reporting: bool = False) -> CollectionRepository:
     """Get CardDefinitions collection"""
-    return DatabaseConnection.get_db()['CardDefinitions']
+    db = DatabaseConnection.get_reporting_db() if reporting else DatabaseConnection.get_db()
+    return db['CardDefinitions']
 
 
-def get_inventory_items_collection():
+def get_inventory_items_collection(reporting: bool = False) -> CollectionRepository:
     """Get InventoryItems collection"""
-    return DatabaseConnection.get_db()['InventoryItems']
+    db = DatabaseConnection.get_reporting_db() if reporting else DatabaseConnection.get_db()
+    return db['InventoryItems']
+
+
+def get_card_definitions_archive_collection() -> CollectionRepository:
+    """Get CardDefinitionsArchive collection (cold tier, see archival.py)"""
+    return DatabaseConnection.get_db()['CardDefinitionsArchive']
+
+
+def get_inventory_items_archive_collection(reporting: bool = False) -> CollectionRepository:
+    """Get InventoryItemsArchive collection (cold tier, see archival.py)"""
+    db = DatabaseConnection.get_reporting_db() if reporting else DatabaseConnection.get_db()
+    return db['InventoryItemsArchive']
+
+
+def get_item_events_collection(reporting: bool = False) -> CollectionRepository:
+    """Get ItemEvents collection (append-only inventory item history)"""
+    db = DatabaseConnection.get_reporting_db() if reporting else DatabaseConnection.get_db()
+    return db['ItemEvents']
+
+
+def get_market_prices_collection() -> CollectionRepository:
+    """Get MarketPrices collection (time series of prices per definition and grade, see valuation.py)"""
+    return DatabaseConnection.get_db()['MarketPrices']
+
+
+def get_migrations_collection() -> CollectionRepository:
+    """Get Migrations collection (applied data migrations and their checkpoints, see migrations.py)"""
+    return DatabaseConnection.get_db()['Migrations']
+
+
+def get_collection_versions_collection() -> CollectionRepository:
+    """Get CollectionVersions collection (write counters used for cache validation)"""
+    return DatabaseConnection.get_db()['CollectionVersions']
@@ -0,0 +1,380 @@
+"""
+Duplicate card definition detection and merging
+
+Definitions are compared on (card_type, year, brand, series, player/pokemon
+name, card_number, insert_parallel) after normalizing case, accents,
+punctuation and spacing, so "Topps Chrome" and "topps  chrome." give the
+same key. Near-misses ("Topps Crome") are scored by the Jaccard similarity
+of the character trigrams of those fields. Definitions of a different type
+or year, or with a different card number, are never duplicates.
+
+Each process keeps an in-memory index of every live definition: its key,
+trigrams and a MinHash signature split into LSH bands, grouped by type and
+year. A lookup only scores the definitions sharing the key or a band, so it
+stays in the millisecond range as the catalog grows. The index is built on
+first use (or during warm-up), picks up changed definitions by `updated_at`
+when an invalidation event arrives, and is rebuilt every
+DUPLICATE_INDEX_REBUILD seconds to forget documents moved to the archive.
+Candidates are re-read from the database before they are reported.
+
+`python -m backend.app.duplicates report` lists groups of likely duplicates;
+`merge` points their inventory items at one definition and archives the rest.
+"""
+
+import argparse
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
+
+from backend.app import invalidation, item_events
+from backend.app.config import Config
+from backend.app.database import (
+    get_card_definitions_collection,
+    get_inventory_items_collection,
+    get_inventory_items_archive_collection,
+)
+from backend.app.queries import Query
+from backend.app.versioning import bump_version, CARD_DEFINITIONS, INVENTORY_ITEMS
+
+# Fields that must match exactly (after normalization) to be compared at all
+BLOCK_FIELDS = ('card_type', 'year')
+
+# Fields whose trigrams are compared
+TEXT_FIELDS = ('brand', 'series', 'name', 'insert_parallel', 'card_number')
+
+PROJECTION = ('card_type', 'year', 'brand', 'series', 'player_name', 'pokemon_name',
+              'card_number', 'insert_parallel', 'updated_at')
+
+# MinHash: NUM_PERM hash functions in BANDS bands of NUM_PERM // BANDS rows.
+# Two definitions share a band with probability 1 - (1 - J^rows)^bands,
+# about 0.95 at Jaccard 0.75 and 0.2 at 0.4.
+NUM_PERM = 32
+BANDS = 8
+_MASK = (1 << 61) - 1
+# Each "permutation" XORs the trigram hashes with a random salt. Python's
+# string hash is randomized per process, which is fine: signatures are only
+# compared within the process that computed them.
+_SALTS = [random.getrandbits(61) for _ in range(NUM_PERM)]
+
+
+def normalize(value) -> str:
+    """Lowercase, accents and punctuation stripped, whitespace collapsed"""
+    text = unicodedata.normalize('NFKD', str(value or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower().replace('&', ' and ')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+
+def normalize_card_number(value) -> str:
+    """'#027' and '27' are the same card number"""
+    return normalize(value).replace(' ', '').lstrip('0')
+
+
+def fields_of(doc: dict) -> dict:
+    """Normalized comparison fields of a definition (or of create-form data)"""
+    name = doc.get('pokemon_name') if doc.get('card_type') == 'pokemon' else doc.get('player_name')
+    return {
+        'card_type': normalize(doc.get('card_type')),
+        'year': normalize(doc.get('year')),
+        'brand': normalize(doc.get('brand')),
+        'series': normalize(doc.get('series')),
+        'name': normalize(name),
+        'insert_parallel': normalize(doc.get('insert_parallel')),
+        'card_number': normalize_card_number(doc.get('card_number')),
+    }
+
+
+def definition_key(fields: dict) -> str:
+    return '|'.join(fields[field] for field in BLOCK_FIELDS + TEXT_FIELDS)
+
+
+def trigrams(fields: dict) -> frozenset:
+    grams = set()
+    for field in TEXT_FIELDS:
+        if fields[field]:
+            padded = f'  {fields[field]} '
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def minhash(grams: frozenset) -> list:
+    hashes = [hash(gram) & _MASK for gram in grams] or [0]
+    return [min(map(salt.__xor__, hashes)) for salt in _SALTS]
+
+
+def similarity(left: dict, right: dict, left_grams: frozenset = None, right_grams: frozenset = None) -> float:
+    """Score in [0, 1] of two definitions' normalized fields; 0 when they can't be the same card"""
+    if any(left[field] != right[field] for field in BLOCK_FIELDS):
+        return 0.0
+    if left['card_number'] and right['card_number'] and left['card_number'] != right['card_number']:
+        return 0.0
+    if definition_key(left) == definition_key(right):
+        return 1.0
+    left_grams = left_grams if left_grams is not None else trigrams(left)
+    right_grams = right_grams if right_grams is not None else trigrams(right)
+    union = len(left_grams | right_grams)
+    return len(left_grams & right_grams) / union if union else 0.0
+
+
+class DuplicateIndex:
+    """Normalized-key and MinHash LSH index over the live card definitions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}               # id -> (fields, trigrams, band keys)
+        self._by_key = defaultdict(set)  # normalized key -> ids
+        self._buckets = defaultdict(set)  # (card_type, year, band, hashes) -> ids
+        self._watermark = None
+        self._built_at = None
+        self._dirty = False
+        self.lookups = 0
+        invalidation.subscribe([CARD_DEFINITIONS], self.on_change)
+
+    def on_change(self, event):
+        self._dirty = True
+
+    def _bands(self, fields: dict, grams: frozenset) -> list:
+        signature = minhash(grams)
+        rows = NUM_PERM // BANDS
+        block = tuple(fields[field] for field in BLOCK_FIELDS)
+        return [block + (band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+
+    def _add(self, doc: dict):
+        self._remove(doc['_id'])
+        fields = fields_of(doc)
+        grams = trigrams(fields)
+        bands = self._bands(fields, grams)
+        self._entries[doc['_id']] = (fields, grams, bands)
+        self._by_key[definition_key(fields)].add(doc['_id'])
+        for band in bands:
+            self._buckets[band].add(doc['_id'])
+        self._advance(doc)
+
+    def _advance(self, doc: dict):
+        if doc.get('updated_at') and (self._watermark is None or doc['updated_at'] > self._watermark):
+            self._watermark = doc['updated_at']
+
+    def _remove(self, definition_id):
+        entry = self._entries.pop(definition_id, None)
+        if entry is None:
+            return
+        fields, _, bands = entry
+        self._by_key[definition_key(fields)].discard(definition_id)
+        for band in bands:
+            self._buckets[band].discard(definition_id)
+
+    def refresh(self):
+        """Build the index on first use or when it's due; otherwise apply changed definitions"""
+        with self._lock:
+            due = self._built_at is None or time.monotonic() - self._built_at > Config.DUPLICATE_INDEX_REBUILD
+            if due:
+                self._dirty = False
+                self._entries.clear()
+                self._by_key.clear()
+                self._buckets.clear()
+                self._watermark = None
+                for doc in Query().not_archived().project(*PROJECTION).cursor(get_card_definitions_collection()):
+                    self._add(doc)
+                self._built_at = time.monotonic()
+            elif self._dirty:
+                self._dirty = False
+                query = Query().project(*PROJECTION, 'archived').sort(('updated_at', 1), ('_id', 1))
+                if self._watermark is not None:
+                    query.match({'updated_at': {'$gte': self._watermark}})
+                for doc in query.cursor(get_card_definitions_collection()):
+                    if doc.get('archived'):
+                        self._remove(doc['_id'])
+                        self._advance(doc)
+                    else:
+                        self._add(doc)
+
+    def candidates(self, data: dict, threshold: float = None) -> list:
+        """(id, score) of indexed definitions scoring at least threshold against data, best first"""
+        threshold = Config.DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.refresh()
+        fields = fields_of(data)
+        grams = trigrams(fields)
+        with self._lock:
+            self.lookups += 1
+            ids = set(self._by_key.get(definition_key(fields), ()))
+            for band in self._bands(fields, grams):
+                ids.update(self._buckets.get(band, ()))
+            scored = []
+            for definition_id in ids:
+                other_fields, other_grams, _ = self._entries[definition_id]
+                score = similarity(fields, other_fields, grams, other_grams)
+                if score >= threshold:
+                    scored.append((definition_id, round(score, 3)))
+        return sorted(scored, key=lambda pair: (-pair[1], pair[0]))
+
+    def ids(self) -> list:
+        self.refresh()
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'definitions': len(self._entries), 'buckets': len(self._buckets), 'lookups': self.lookups}
+
+
+index = DuplicateIndex()
+
+
+def find_duplicates(data: dict, exclude_id=None, limit: int = 5, threshold: float = None) -> list:
+    """
+    Live definitions that data (a definition, or create input) likely duplicates
+    Returns [{'definition': doc, 'score': float}], best first.
+    """
+    scored = [(definition_id, score) for definition_id, score in index.candidates(data, threshold)
+              if definition_id != exclude_id]
+    if not scored:
+        return []
+    scores = dict(scored[:limit])
+    docs = Query({'_id': {'$in': list(scores)}}).not_archived().find(get_card_definitions_collection())
+    matches = [{'definition': doc, 'score': scores[doc['_id']]} for doc in docs]
+    return sorted(matches, key=lambda match: -match['score'])
+
+
+def find_duplicate_groups(threshold: float = None) -> list:
+    """
+    Every group of live definitions that are likely duplicates of each other
+    Returns [{'target': doc, 'duplicates': [doc, ...]}]: the target is the
+    definition with the most inventory items in either tier (the oldest on a tie).
+    """
+    parent = {}
+
+    def root(definition_id):
+        while parent.get(definition_id, definition_id) != definition_id:
+            definition_id = parent[definition_id]
+        return definition_id
+
+    collection = get_card_definitions_collection()
+    entries = {doc['_id']: doc for doc in Query().not_archived().project(*PROJECTION).find(collection)}
+    linked = set()
+    for definition_id, doc in entries.items():
+        for other_id, _ in index.candidates(doc, threshold):
+            if other_id != definition_id and other_id in entries:
+                first, second = sorted((root(definition_id), root(other_id)))
+                if first != second:
+                    parent[second] = first
+                linked.update((definition_id, other_id))
+    if not linked:
+        return []
+
+    groups = defaultdict(list)
+    for definition_id in linked:
+        groups[root(definition_id)].append(definition_id)
+    counts = item_counts(list(linked))
+    docs = {doc['_id']: doc for doc in Query({'_id': {'$in': list(linked)}}).find(collection)}
+    result = []
+    for _, members in sorted(groups.items()):
+        members.sort(key=lambda definition_id: (-counts.get(definition_id, 0), definition_id))
+        result.append({
+            'target': docs[members[0]],
+            'duplicates': [docs[definition_id] for definition_id in members[1:]],
+            'items': {str(definition_id): counts.get(definition_id, 0) for definition_id in members},
+        })
+    return result
+
+
+def item_counts(definition_ids: list) -> dict:
+    """Definition id -> number of inventory items (archived and archive tier included)"""
+    pipeline = [
+        {'$match': {'card_definition_id': {'$in': list(definition_ids)}}},
+        {'$group': {'_id': '$card_definition_id', 'count': {'$sum': 1}}},
+    ]
+    counts = defaultdict(int)
+    for collection in (get_inventory_items_collection(), get_inventory_items_archive_collection()):
+        for row in collection.aggregate(pipeline):
+            counts[row['_id']] += row['count']
+    return dict(counts)
+
+
+def merge(target_id, duplicate_ids: list, dry_run: bool = False) -> dict:
+    """
+    Point every inventory item (both tiers) of duplicate_ids at target_id and
+    archive the duplicates, recording merged_into
+    Returns the merged ids and the number of items moved (or that would be).
+    """
+    # Malformed ids can't match a definition
+    if not ObjectId.is_valid(target_id):
+        raise ValueError(f'Target definition {target_id} not found')
+    malformed = [str(definition_id) for definition_id in duplicate_ids if not ObjectId.is_valid(definition_id)]
+    if malformed:
+        raise ValueError(f"Definitions not found: {', '.join(malformed)}")
+    target_id = ObjectId(target_id)
+    duplicate_ids = [ObjectId(definition_id) for definition_id in duplicate_ids if str(definition_id) != str(target_id)]
+    definitions = get_card_definitions_collection()
+    if not definitions.find_one({'_id': target_id, 'archived': {'$ne': True}}, {'_id': 1}):
+        raise ValueError(f'Target definition {target_id} not found')
+    found = [doc['_id'] for doc in definitions.find({'_id': {'$in': duplicate_ids}}, {'_id': 1})]
+    missing = set(duplicate_ids) - set(found)
+    if missing:
+        raise ValueError(f"Definitions not found: {', '.join(sorted(str(definition_id) for definition_id in missing))}")
+
+    items_archive = get_inventory_items_archive_collection()
+    if dry_run:
+        moved = (get_inventory_items_collection().count_documents({'card_definition_id': {'$in': duplicate_ids}})
+                 + items_archive.count_documents({'card_definition_id': {'$in': duplicate_ids}}))
+        return {'target': str(target_id), 'merged': [str(definition_id) for definition_id in duplicate_ids],
+                'items': moved}
+
+    moved = item_events.repoint_items(duplicate_ids, target_id)
+    moved += item_events.repoint_items(duplicate_ids, target_id, items_collection=items_archive)
+    definitions.update_many(
+        {'_id': {'$in': duplicate_ids}},
+        {'$set': {'archived': True, 'merged_into': target_id, 'updated_at': datetime.utcnow()}}
+    )
+    bump_version(CARD_DEFINITIONS, INVENTORY_ITEMS)
+    return {'target': str(target_id), 'merged': [str(definition_id) for definition_id in duplicate_ids],
+            'items': moved}
+
+
+def describe(doc: dict) -> str:
+    name = doc.get('pokemon_name') if doc.get('card_type') == 'pokemon' else doc.get('player_name')
+    parts = [doc.get('year'), doc.get('brand'), doc.get('series'), name, doc.get('insert_parallel')]
+    number = f" #{doc['card_number']}" if doc.get('card_number') else ''
+    return ' '.join(str(part) for part in parts if part) + number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find and merge duplicate card definitions')
+    commands = parser.add_subparsers(dest='command', required=True)
+    report = commands.add_parser('report', help='List groups of likely duplicates')
+    report.add_argument('--threshold', type=float, default=None, help='Minimum similarity (default DUPLICATE_THRESHOLD)')
+    merge_parser = commands.add_parser('merge', help='Merge definitions into one')
+    merge_parser.add_argument('ids', nargs='*', help='Target id followed by the ids to merge into it')
+    merge_parser.add_argument('--all', action='store_true', help='Merge every reported group into its target')
+    merge_parser.add_argument('--threshold', type=float, default=None)
+    merge_parser.add_argument('--dry-run', action='store_true', help='Only count what would be moved')
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        for group in find_duplicate_groups(args.threshold):
+            target = group['target']
+            print(f"{target['_id']}  {describe(target)}  ({group['items'][str(target['_id'])]} items)")
+            for doc in group['duplicates']:
+                print(f"  {doc['_id']}  {describe(doc)}  ({group['items'][str(doc['_id'])]} items)")
+        return
+
+    if args.all:
+        merges = [(group['target']['_id'], [doc['_id'] for doc in group['duplicates']])
+                  for group in find_duplicate_groups(args.threshold)]
+    elif len(args.ids) >= 2:
+        merges = [(args.ids[0], args.ids[1:])]
+    else:
+        parser.error('merge needs a target and at least one duplicate id, or --all')
+
+    verb = 'Would move' if args.dry_run else 'Moved'
+    for target_id, duplicate_ids in merges:
+        result = merge(target_id, duplicate_ids, args.dry_run)
+        print(f"{verb} {result['items']} items from {', '.join(result['merged'])} to {result['target']}")
+
+
+if __name__ == '__main__':
+    main()
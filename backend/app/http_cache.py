@@ -0,0 +1,47 @@
+"""
+HTTP conditional GET support for read endpoints
+
+Strong ETags are derived from the versions of the collections a response
+depends on, so a matching If-None-Match can be answered with 304 before the
+view runs any of its queries.
+"""
+
+import functools
+import hashlib
+
+from flask import make_response, request
+
+from backend.app.config import Config
+from backend.app.versioning import get_versions
+
+
+def compute_etag(collections: tuple) -> str:
+    versions = get_versions(*collections)
+    key = request.full_path + '|' + '|'.join(f'{name}:{versions[name]}' for name in collections)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional(*collections: str, cache_control: str = None):
+    """
+    Decorator for GET views whose output only changes when the given
+    collections are written
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = compute_etag(collections)
+            header = cache_control or Config.HTTP_CACHE_CONTROL
+
+            # Weak comparison: compression marks the ETag weak (see compression.py)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = header
+            return response
+        return wrapper
+    return decorator
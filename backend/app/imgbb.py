@@ -0,0 +1,70 @@
+import os
+import threading
+from typing import TYPE_CHECKING
+from backend.app.config import Config
+from backend.app import instrumentation, uploads
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+# requests is imported on first use, keeping it off the cold-start path;
+# the session keeps the TLS connection to ImgBB alive between uploads
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> 'requests.Session':
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                _session = requests.Session()
+    return _session
+
+
+# httpx client for ASYNC_DB mode; only touched from the async loop thread,
+# which is recreated after fork
+_async_client = None
+_async_client_pid: int = None
+
+
+async def upload_image_async(image_data: str) -> 'httpx.Response':
+    """Upload a base64-encoded image to ImgBB without blocking the event loop"""
+    global _async_client, _async_client_pid
+    if _async_client is None or _async_client_pid != os.getpid():
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("ASYNC_DB uploads require httpx (the `async` extra)") from None
+        _async_client = httpx.AsyncClient(timeout=Config.IMGBB_TIMEOUT)
+        _async_client_pid = os.getpid()
+    payload = {
+        'key': Config.IMGBB_API_KEY,
+        'image': image_data,
+    }
+    return await _async_client.post(Config.IMGBB_UPLOAD_URL, data=payload)
+
+
+def upload_image(image_data: str):
+    """
+    Upload a base64-encoded image to ImgBB
+    Returns the raw response (requests, or httpx with ASYNC_DB); callers check
+    status and the `success` flag.
+    Raises uploads.UploadRejected when no upload slot frees up in time.
+    """
+    with uploads.get_admission().slot(), instrumentation.timer('imgbb'):
+        if Config.ASYNC_DB:
+            from backend.app.async_db import AsyncDatabaseConnection
+            return AsyncDatabaseConnection.run(upload_image_async(image_data))
+        payload = {
+            'key': Config.IMGBB_API_KEY,
+            'image': image_data,
+        }
+        return get_session().post(Config.IMGBB_UPLOAD_URL, data=payload, timeout=Config.IMGBB_TIMEOUT)
+
+
+def warm_up():
+    """Open the connection to ImgBB ahead of the first upload"""
+    get_session().head(Config.IMGBB_UPLOAD_URL, timeout=Config.IMGBB_TIMEOUT)
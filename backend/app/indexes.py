@@ -0,0 +1,216 @@
+"""
+Index definitions and idempotent index creation
+
+Run `python -m backend.app.indexes` after deploying a change here, or leave
+AUTO_CREATE_INDEXES on to have each worker ensure them on its first request
+(create_index is a no-op when an identical index already exists).
+
+Each index is created on its own: one that fails is logged and left out of
+query hints, and the rest are still built. A unique index is not attempted
+while existing documents share a key; `python -m backend.app.indexes
+--duplicates` lists them so they can be fixed first.
+"""
+
+import argparse
+import logging
+import threading
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from backend.app.config import Config
+from backend.app.database import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+# Collections created as time-series collections (before their indexes,
+# which would otherwise create them as regular collections)
+TIME_SERIES = {
+    'MarketPrices': {'timeField': 'ts', 'metaField': 'meta', 'granularity': 'hours'},
+}
+
+# collection -> [(keys, options)]
+INDEXES = {
+    'CardDefinitions': [
+        # Delta sync (routes/sync.py) and the invalidation poller
+        ([('updated_at', ASCENDING), ('_id', ASCENDING)], {'name': 'updated_at_id'}),
+        # Dashboard and filter-option queries narrowed by type, then brand
+        ([('card_type', ASCENDING), ('brand', ASCENDING)], {'name': 'card_type_brand'}),
+    ],
+    'InventoryItems': [
+        ([('updated_at', ASCENDING), ('_id', ASCENDING)], {'name': 'updated_at_id'}),
+        # A definition's items (card detail page, /api/inventory?definition_id=)
+        ([('card_definition_id', ASCENDING), ('status', ASCENDING)], {'name': 'card_definition_id_status'}),
+        # Scanner lookups (see lookup.py); empty strings saved by the web form
+        # are left out. Serial numbers (e.g. 12/99) repeat across sets, so
+        # only custom_id is unique.
+        ([('custom_id', ASCENDING)],
+         {'name': 'custom_id', 'unique': True, 'partialFilterExpression': {'custom_id': {'$gt': ''}}}),
+        ([('serial_number', ASCENDING)],
+         {'name': 'serial_number', 'partialFilterExpression': {'serial_number': {'$gt': ''}}}),
+        # Multikey index over the grading array: pending/overdue submissions
+        # per grader and turnaround queries (see GradingModel)
+        ([('grading.type', ASCENDING), ('grading.date_submitted', ASCENDING),
+          ('grading.date_returned', ASCENDING)], {'name': 'grading_type_submitted_returned'}),
+    ],
+    'InventoryItemsArchive': [
+        # include_archived reads of a definition's items
+        ([('card_definition_id', ASCENDING)], {'name': 'card_definition_id'}),
+        # Sold counts per definition on the dashboard (archival.sold_counts)
+        ([('status', ASCENDING), ('card_definition_id', ASCENDING)], {'name': 'status_card_definition_id'}),
+    ],
+    'ItemEvents': [
+        # Per-item history in order, and the last event per item for
+        # point-in-time valuation (see ItemEventModel.valuation_pipeline)
+        ([('item_id', ASCENDING), ('ts', ASCENDING)], {'name': 'item_id_ts'}),
+    ],
+    'MarketPrices': [
+        # Latest price per definition and grade (valuation.PriceTable), price history
+        ([('meta.definition_id', ASCENDING), ('meta.grade', ASCENDING), ('ts', DESCENDING)],
+         {'name': 'definition_grade_ts'}),
+    ],
+}
+
+_ensured = False
+_created = False
+# (collection, index name) pairs this process could not create
+_failed = set()
+_lock = threading.Lock()
+
+
+def find_duplicates(db, collection: str, keys: list, options: dict) -> list:
+    """Key values held by more than one document, which block a unique index"""
+    pipeline = [
+        {'$match': options.get('partialFilterExpression', {})},
+        {'$group': {
+            '_id': {field.replace('.', '_'): f'${field}' for field, _ in keys},
+            'ids': {'$push': '$_id'},
+            'count': {'$sum': 1},
+        }},
+        {'$match': {'count': {'$gt': 1}}},
+    ]
+    return list(db[collection].aggregate(pipeline))
+
+
+def _create_index(db, collection: str, keys: list, options: dict) -> bool:
+    """Create one index; False when a unique index is blocked by duplicates"""
+    name = options['name']
+    if options.get('unique') and name not in db[collection].index_information():
+        duplicates = find_duplicates(db, collection, keys, options)
+        if duplicates:
+            logger.warning(
+                "Not creating unique index %s on %s: %d values are duplicated (e.g. %s); "
+                "see `python -m backend.app.indexes --duplicates`",
+                name, collection, len(duplicates), duplicates[0]['_id']
+            )
+            return False
+    db[collection].create_index(keys, **options)
+    return True
+
+
+def ensure_indexes(db=None) -> list:
+    """Create every index in INDEXES independently; returns the created index names"""
+    db = db if db is not None else DatabaseConnection.get_db()
+    ensure_time_series(db)
+    created = []
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            key = (collection, options['name'])
+            try:
+                ok = _create_index(db, collection, keys, options)
+            except PyMongoError as e:
+                logger.warning("Could not create index %s on %s: %s", options['name'], collection, e)
+                ok = False
+            if ok:
+                _failed.discard(key)
+                created.append(options['name'])
+            else:
+                _failed.add(key)
+    return created
+
+
+def ensure_time_series(db):
+    """Create the TIME_SERIES collections that don't exist yet"""
+    if Config.DATABASE_BACKEND == 'sqlite':
+        return  # plain tables; the indexes below still apply
+    existing = set(db.list_collection_names())
+    for collection, options in TIME_SERIES.items():
+        if collection in existing:
+            continue
+        try:
+            db.create_collection(collection, timeseries=options)
+        except CollectionInvalid:
+            pass  # created concurrently by another worker
+        except (PyMongoError, NotImplementedError) as e:
+            # Servers before 5.0 and stand-ins (mongomock) use a regular collection
+            logger.warning("Could not create time-series collection %s: %s", collection, e)
+
+
+def is_ensured() -> bool:
+    """Whether this process has created the indexes (so hints can name them)"""
+    return _created
+
+
+def is_available(collection: str, name: str) -> bool:
+    """False for an index that ensure_indexes could not create"""
+    return (collection, name) not in _failed
+
+
+def duplicates_report(db=None) -> dict:
+    """Duplicated keys per unique index: {'collection.index': [{_id, ids, count}]}"""
+    db = db if db is not None else DatabaseConnection.get_db()
+    report = {}
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            if options.get('unique'):
+                report[f"{collection}.{options['name']}"] = find_duplicates(db, collection, keys, options)
+    return report
+
+
+def ensure_once():
+    """Ensure indexes the first time this is called in the process"""
+    global _ensured, _created
+    if _ensured:
+        return
+    with _lock:
+        if _ensured:
+            return
+        try:
+            ensure_indexes()
+            _created = True
+        except PyMongoError as e:
+            logger.warning("Could not ensure indexes: %s", e)
+        _ensured = True
+
+
+def init_app(app):
+    """Ensure indexes once per process, on the first request (or during warm-up)"""
+    if not Config.AUTO_CREATE_INDEXES:
+        return
+
+    @app.before_request
+    def ensure_indexes_once():
+        ensure_once()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create the indexes in INDEXES')
+    parser.add_argument('--duplicates', action='store_true',
+                        help='Only list documents sharing a key of a unique index')
+    args = parser.parse_args()
+
+    if args.duplicates:
+        for index, duplicates in duplicates_report().items():
+            print(f"{index}: {len(duplicates)} duplicated values")
+            for duplicate in duplicates:
+                print(f"  {duplicate['_id']}: {', '.join(str(_id) for _id in duplicate['ids'])}")
+        return
+
+    for name in ensure_indexes():
+        print(name)
+    for collection, name in sorted(_failed):
+        print(f"FAILED {collection}.{name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Request-level latency and database instrumentation
+
+Each request gets a RequestMetrics object that collects every Mongo command
+(via a pymongo CommandListener), outbound ImgBB calls and Jinja render time.
+Totals are exposed per response as a Server-Timing header and aggregated per
+worker process as Prometheus text on /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request, template_rendered, before_render_template
+from markupsafe import escape
+from pymongo import monitoring
+
+from backend.app.config import Config
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """Timings collected while serving a single request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.timers = {}
+        self._pending = {}
+        self._template_started = []
+        # Set while the profiler issues its own explain commands
+        self.paused = False
+
+    def add_query(self, query: dict):
+        self.queries.append(query)
+
+    def add_time(self, name: str, seconds: float):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    @property
+    def db_time(self) -> float:
+        return sum(q['duration'] for q in self.queries)
+
+    def server_timing(self) -> str:
+        """Format collected timings for the Server-Timing header"""
+        total = time.perf_counter() - self.started
+        parts = [f'db;dur={self.db_time * 1000:.1f};desc="{len(self.queries)} queries"']
+        for name, seconds in self.timers.items():
+            parts.append(f'{name};dur={seconds * 1000:.1f}')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_local = threading.local()
+
+
+def current_metrics():
+    """The RequestMetrics for the request running on this thread, if any"""
+    if has_request_context():
+        return g.get('_metrics')
+    # Set by concurrency.run_concurrently for work done on behalf of a request
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def attributed_to(metrics):
+    """Attribute commands issued on this (non-request) thread to `metrics`"""
+    previous = getattr(_local, 'metrics', None)
+    _local.metrics = metrics
+    try:
+        yield
+    finally:
+        _local.metrics = previous
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def inc(self, name: str, labels: dict = None, amount: float = 1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: dict = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    hist['buckets'][i] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    @staticmethod
+    def _labels(labels, extra=()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f'{name}{self._labels(labels)} {value}')
+            for (name, labels), hist in sorted(self._histograms.items()):
+                for bound, count in zip(LATENCY_BUCKETS, hist['buckets']):
+                    lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {count}')
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {hist["count"]}')
+                lines.append(f'{name}_sum{self._labels(labels)} {hist["sum"]:.6f}')
+                lines.append(f'{name}_count{self._labels(labels)} {hist["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """Records every Mongo command issued on behalf of the current request"""
+
+    def started(self, event):
+        metrics = current_metrics()
+        if metrics is None or metrics.paused:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        metrics._pending[event.request_id] = {
+            'command': event.command_name,
+            'collection': collection if isinstance(collection, str) else None,
+            'database': event.database_name,
+            'filter': command.get('filter', command.get('query', command.get('pipeline'))),
+            'key': command.get('key') if event.command_name == 'distinct' else None,
+            'spec': command,
+        }
+
+    def _finish(self, event, failed: bool):
+        metrics = current_metrics()
+        duration = event.duration_micros / 1_000_000
+        registry.inc('mongo_commands_total', {'command': event.command_name, 'failed': str(failed).lower()})
+        registry.observe('mongo_command_duration_seconds', duration, {'command': event.command_name})
+        if metrics is None or metrics.paused:
+            return
+        query = metrics._pending.pop(event.request_id, None) or {'command': event.command_name}
+        query['duration'] = duration
+        query['failed'] = failed
+        metrics.add_query(query)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+command_listener = CommandTimingListener()
+
+
+@contextmanager
+def timer(name: str):
+    """Time a block (e.g. an ImgBB call) into the request and process metrics"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe(f'{name}_duration_seconds', elapsed)
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.add_time(name, elapsed)
+
+
+def _before_render(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics._template_started.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None and metrics._template_started:
+        elapsed = time.perf_counter() - metrics._template_started.pop()
+        # Nested templates are included in their parent's time
+        if not metrics._template_started:
+            metrics.add_time('tpl', elapsed)
+            registry.observe('template_render_duration_seconds', elapsed, {'template': template.name})
+
+
+def _render_toolbar(metrics: RequestMetrics) -> str:
+    """HTML panel listing every query the page issued"""
+    rows = ''.join(
+        f'<tr><td>{i + 1}</td><td>{escape(q.get("command"))}</td><td>{escape(q.get("collection") or "")}</td>'
+        f'<td>{q["duration"] * 1000:.1f} ms</td><td><code>{escape(str(q.get("filter") or "")[:300])}</code></td></tr>'
+        for i, q in enumerate(metrics.queries)
+    )
+    return (
+        '<div id="query-toolbar" style="position:fixed;bottom:0;left:0;right:0;max-height:40vh;overflow:auto;'
+        'background:#111827;color:#f9fafb;font:12px monospace;z-index:9999;padding:8px">'
+        f'<strong>{len(metrics.queries)} queries, {metrics.db_time * 1000:.1f} ms</strong>'
+        f' &middot; {escape(metrics.server_timing())}'
+        f'<table style="width:100%">{rows}</table></div>'
+    )
+
+
+def init_app(app):
+    """Register request hooks, template signals and the /metrics endpoint"""
+
+    @app.before_request
+    def start_request_metrics():
+        g._metrics = RequestMetrics()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        metrics = g.get('_metrics')
+        if metrics is None:
+            return response
+
+        elapsed = time.perf_counter() - metrics.started
+        endpoint = request.endpoint or 'unknown'
+        registry.inc('http_requests_total', {'endpoint': endpoint, 'status': response.status_code})
+        registry.observe('http_request_duration_seconds', elapsed, {'endpoint': endpoint})
+        registry.inc('http_request_db_queries_total', {'endpoint': endpoint}, amount=len(metrics.queries))
+
+        response.headers['Server-Timing'] = metrics.server_timing()
+
+        if (Config.DEBUG_TOOLBAR and response.mimetype == 'text/html'
+                and not response.direct_passthrough):
+            body = response.get_data(as_text=True)
+            if '</body>' in body:
+                response.set_data(body.replace('</body>', _render_toolbar(metrics) + '</body>', 1))
+        return response
+
+    template_rendered.connect(_after_render, app)
+    before_render_template.connect(_before_render, app)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
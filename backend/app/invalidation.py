@@ -0,0 +1,191 @@
+"""
+Cross-worker cache invalidation
+
+In-process caches subscribe to the collections they depend on. Writes made
+by this worker publish an event immediately (see versioning.bump_version);
+writes made by other workers arrive through a background watcher that
+follows MongoDB change streams on CardDefinitions and InventoryItems, or
+polls CollectionVersions/`updated_at` when change streams are unavailable
+(standalone mongod, SQLite, mongomock). Other stream errors (network
+failures, elections) reopen the stream from its resume token with backoff.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from backend.app.config import Config
+from backend.app.database import DatabaseConnection, get_collection_versions_collection
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ('CardDefinitions', 'InventoryItems')
+
+_subscribers = {}
+_subscribers_lock = threading.Lock()
+
+
+def subscribe(collections, callback):
+    """Call `callback(event)` whenever one of `collections` changes"""
+    with _subscribers_lock:
+        for name in collections:
+            _subscribers.setdefault(name, []).append(callback)
+
+
+def publish(collection: str, operation: str = 'update', document_id=None):
+    """
+    Deliver a change event to every subscriber of `collection`
+    document_id is None when the exact document isn't known
+    """
+    event = {'collection': collection, 'operation': operation, 'document_id': document_id}
+    with _subscribers_lock:
+        callbacks = list(_subscribers.get(collection, []))
+    for callback in callbacks:
+        try:
+            callback(event)
+        except Exception:
+            logger.exception("Cache invalidation callback failed for %s", collection)
+
+
+# $changeStream is only supported on replica sets and sharded clusters
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# The resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+def _change_streams_unsupported(error: Exception) -> bool:
+    """Errors meaning this deployment has no change streams at all"""
+    if isinstance(error, NotImplementedError):
+        return True  # SQLite backend, stand-ins without watch()
+    return isinstance(error, OperationFailure) and error.code == CHANGE_STREAMS_UNSUPPORTED
+
+
+class ChangeWatcher:
+    """Background thread turning database changes into invalidation events"""
+
+    def __init__(self, collections=WATCHED_COLLECTIONS, poll_interval: float = None):
+        self.collections = list(collections)
+        self.poll_interval = poll_interval or Config.CACHE_POLL_INTERVAL
+        self.mode = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._resume_token = None
+        self._missed = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='cache-invalidation-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        delay = 0
+        while not self._stop.is_set():
+            try:
+                self.mode = 'change_stream'
+                self._watch()
+            except Exception as e:
+                if _change_streams_unsupported(e):
+                    logger.info("Change streams unavailable (%s); polling every %ss", e, self.poll_interval)
+                    self.mode = 'polling'
+                    self._poll()
+                    return
+                # Network errors, elections: reopen the stream from the last
+                # resume token, backing off while the server stays unreachable
+                if isinstance(e, OperationFailure) and e.code == CHANGE_STREAM_HISTORY_LOST:
+                    self._resume_token = None
+                if self._resume_token is None:
+                    self._missed = True
+                delay = min(max(delay * 2, 1), Config.CACHE_WATCH_MAX_BACKOFF)
+                logger.warning("Change stream failed (%s); reopening in %ss", e, delay)
+                self.mode = 'reconnecting'
+                self._stop.wait(delay)
+            else:
+                delay = 0
+
+    def _watch(self):
+        pipeline = [{'$match': {'ns.coll': {'$in': self.collections}}}]
+        db = DatabaseConnection.get_db()
+        if not callable(getattr(type(db), 'watch', None)):
+            raise NotImplementedError(f"{type(db).__name__} has no change streams")
+        with db.watch(pipeline, resume_after=self._resume_token, max_await_time_ms=1000) as stream:
+            if self._missed:
+                # Changes since the stream failed can't be replayed
+                for name in self.collections:
+                    publish(name, 'update')
+                self._missed = False
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    continue
+                self._resume_token = stream.resume_token
+                publish(
+                    change['ns']['coll'],
+                    change['operationType'],
+                    change.get('documentKey', {}).get('_id')
+                )
+
+    def _poll(self):
+        db = DatabaseConnection.get_db()
+        try:
+            versions = self._read_versions()
+        except PyMongoError:
+            versions = {}
+        last_poll = datetime.utcnow()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                current = self._read_versions()
+                poll_started = datetime.utcnow()
+                for name in self.collections:
+                    if current.get(name, 0) == versions.get(name, 0):
+                        continue
+                    # Prefer per-document events; documents without updated_at
+                    # (e.g. older definitions) fall back to a collection event
+                    changed = list(db[name].find({'updated_at': {'$gte': last_poll}}, {'_id': 1}))
+                    if changed:
+                        for doc in changed:
+                            publish(name, 'update', doc['_id'])
+                    else:
+                        publish(name, 'update')
+                versions = current
+                last_poll = poll_started
+            except PyMongoError as e:
+                logger.warning("Cache invalidation poll failed: %s", e)
+
+    def _read_versions(self) -> dict:
+        return {
+            doc['_id']: doc.get('version', 0)
+            for doc in get_collection_versions_collection().find({'_id': {'$in': self.collections}})
+        }
+
+
+_watcher = None
+_watcher_pid = None
+_watcher_lock = threading.Lock()
+
+
+def ensure_watcher():
+    """Start the watcher for this process (threads don't survive fork)"""
+    global _watcher, _watcher_pid
+    if _watcher is not None and _watcher_pid == os.getpid():
+        return _watcher
+    with _watcher_lock:
+        if _watcher is None or _watcher_pid != os.getpid():
+            _watcher = ChangeWatcher()
+            _watcher_pid = os.getpid()
+            _watcher.start()
+    return _watcher
+
+
+def init_app(app):
+    """Start the watcher lazily in each worker on its first request"""
+    if not Config.CACHE_WATCHER_ENABLED:
+        return
+
+    @app.before_request
+    def start_invalidation_watcher():
+        ensure_watcher()
@@ -0,0 +1,193 @@
+"""
+Inventory item writes with an append-only event log
+
+InventoryItems documents are the current-state projection; every change to
+one is also recorded in ItemEvents (indexed by item_id, ts). Writes go
+through the functions here so the two stay in step: the projection is
+updated incrementally (only changed fields, grading appends pushed), then
+the events describing the change are appended. The event log is never
+updated in place.
+
+Run `python -m backend.app.item_events backfill` once to give items created
+before the log existed a starting `created` event.
+"""
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from backend.app.database import get_inventory_items_collection, get_item_events_collection
+from backend.app.models import InventoryItemModel, ItemEventModel
+
+
+def create_item(doc: dict) -> ObjectId:
+    """Insert a new item document and its `created` event"""
+    result = get_inventory_items_collection().insert_one(doc)
+    doc['_id'] = result.inserted_id
+    get_item_events_collection().insert_one(
+        ItemEventModel.create_event(doc, 'created', {'fields': _fields_of(doc)}, doc.get('created_at'))
+    )
+    return result.inserted_id
+
+
+def update_item(existing: dict, data: dict) -> dict:
+    """
+    Apply `data` (as prepared by InventoryItemModel.update_document) to the
+    stored item, writing only what changed
+    Returns the changed fields ({} when nothing changed).
+    """
+    update, changes = InventoryItemModel.update_operations(existing, data)
+    if not update:
+        return {}
+
+    after = get_inventory_items_collection().find_one_and_update(
+        {'_id': existing['_id']}, update, return_document=ReturnDocument.AFTER
+    )
+    events = ItemEventModel.events_for_changes(existing, after or {**existing, **changes}, changes,
+                                               changes.get('updated_at'))
+    if events:
+        get_item_events_collection().insert_many(events)
+    return changes
+
+
+def archive_item(item_id) -> bool:
+    """Archive (soft delete) an item; returns False if it doesn't exist"""
+    return _set_fields(item_id, {'$set': {'archived': True}}, {'archived': True})
+
+
+def unset_fields(item_id, *fields: str) -> bool:
+    """Remove fields from an item (e.g. its image); returns False if none were set"""
+    return _set_fields(
+        item_id,
+        {'$unset': {field: '' for field in fields}},
+        {field: None for field in fields},
+        require_change=True
+    )
+
+
+def repoint_items(from_definition_ids: list, to_definition_id: ObjectId, items_collection=None) -> int:
+    """
+    Move every item of from_definition_ids to to_definition_id (merging
+    duplicate definitions); returns the number of items moved
+    items_collection defaults to InventoryItems (pass the archive to move those).
+    """
+    items_collection = items_collection if items_collection is not None else get_inventory_items_collection()
+    items = list(items_collection.find({'card_definition_id': {'$in': list(from_definition_ids)}}))
+    if not items:
+        return 0
+
+    now = datetime.utcnow()
+    items_collection.update_many(
+        {'_id': {'$in': [item['_id'] for item in items]}},
+        {'$set': {'card_definition_id': to_definition_id, 'updated_at': now}}
+    )
+    changes = {'card_definition_id': to_definition_id, 'updated_at': now}
+    get_item_events_collection().insert_many([
+        event
+        for item in items
+        for event in ItemEventModel.events_for_changes(item, {**item, **changes}, changes, now)
+    ])
+    return len(items)
+
+
+def _set_fields(item_id, update: dict, changes: dict, require_change: bool = False) -> bool:
+    now = datetime.utcnow()
+    update.setdefault('$set', {})['updated_at'] = now
+    before = get_inventory_items_collection().find_one_and_update(
+        {'_id': ObjectId(item_id)}, update, return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return False
+    if require_change and not any(before.get(field) is not None for field in changes):
+        return False
+
+    after = {**before, **changes, 'updated_at': now}
+    get_item_events_collection().insert_many(ItemEventModel.events_for_changes(before, after, changes, now))
+    return True
+
+
+def _fields_of(doc: dict) -> dict:
+    """Fields of a new item not already captured by the event state"""
+    skip = {'_id', 'card_definition_id', 'archived', 'created_at', 'updated_at'}
+    return {field: value for field, value in doc.items() if field not in skip}
+
+
+def item_history(item_id) -> list:
+    """Events of one item, oldest first"""
+    return list(get_item_events_collection().find({'item_id': ObjectId(item_id)}).sort('ts', 1))
+
+
+def inventory_value(as_of: datetime) -> dict:
+    """
+    Inventory as it stood at the end of `as_of`'s day, computed from events
+    Returns per-status counts/cost/revenue plus the cost basis still held
+    """
+    end = datetime(as_of.year, as_of.month, as_of.day) + timedelta(days=1)
+    rows = list(get_item_events_collection(reporting=True).aggregate(ItemEventModel.valuation_pipeline(end)))
+
+    by_status = {
+        row['_id']: {'items': row['items'], 'cost': round(row['cost'], 2), 'revenue': round(row['revenue'], 2)}
+        for row in rows
+    }
+    held = [row for row in rows if row['_id'] != 'sold']
+    return {
+        'as_of': as_of.strftime('%Y-%m-%d'),
+        'by_status': by_status,
+        'items_held': sum(row['items'] for row in held),
+        'cost_held': round(sum(row['cost'] for row in held), 2),
+        'realized_revenue': by_status.get('sold', {}).get('revenue', 0),
+    }
+
+
+def _backfill_events(doc: dict) -> list:
+    """
+    Starting events for an item that predates the log: `created` at
+    created_at, and for sold items a `sold` event at the disposition date
+    """
+    ts = doc.get('created_at') or doc['_id'].generation_time.replace(tzinfo=None)
+    sold_at = None
+    if doc.get('status') == 'sold':
+        try:
+            sold_at = datetime.strptime(str((doc.get('disposition') or {}).get('date', ''))[:10], '%Y-%m-%d')
+        except ValueError:
+            pass
+
+    if sold_at is None:
+        return [ItemEventModel.create_event(doc, 'created', {'fields': _fields_of(doc), 'backfill': True}, ts)]
+
+    unsold = {**doc, 'status': 'in_stock'}
+    unsold.pop('disposition', None)
+    return [
+        ItemEventModel.create_event(unsold, 'created', {'fields': _fields_of(unsold), 'backfill': True}, ts),
+        ItemEventModel.create_event(doc, 'sold', {'disposition': doc['disposition'], 'backfill': True},
+                                    max(sold_at, ts)),
+    ]
+
+
+def backfill(batch_size: int = 500) -> int:
+    """Create starting events for every item that has no events yet"""
+    events_collection = get_item_events_collection()
+    with_events = set(events_collection.distinct('item_id'))
+    batch, created = [], 0
+    for doc in get_inventory_items_collection().find():
+        if doc['_id'] in with_events:
+            continue
+        batch.extend(_backfill_events(doc))
+        if len(batch) >= batch_size:
+            events_collection.insert_many(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        events_collection.insert_many(batch)
+        created += len(batch)
+    return created
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:] == ['backfill']:
+        print(f"Created {backfill()} events")
+    else:
+        print("Usage: python -m backend.app.item_events backfill")
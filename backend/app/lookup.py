@@ -0,0 +1,85 @@
+"""
+Item lookup by scanned code
+
+Scanners at shows read an item's sticker (`custom_id`) or the user types its
+`serial_number`. A code is matched against custom_id first, then
+serial_number, through the partial indexes on both fields (custom_id is
+unique; serial numbers such as 12/99 repeat across sets, so a code can
+match several items). Each match comes with the item's definition.
+
+Results, including "not found", are kept in a per-worker LRU cache that is
+cleared whenever items or definitions change, so rescanning the same cards
+doesn't reach the database. Batch lookups resolve all cache misses with one
+query per field plus one for the definitions.
+"""
+
+from backend.app.cache import LocalCache
+from backend.app.config import Config
+from backend.app.database import get_card_definitions_collection, get_inventory_items_collection
+from backend.app.models import CardDefinitionModel, InventoryItemModel
+from backend.app.queries import Query
+from backend.app.versioning import CARD_DEFINITIONS, INVENTORY_ITEMS
+
+LOOKUP_FIELDS = ('custom_id', 'serial_number')
+
+lookup_cache = LocalCache('item_lookup', [INVENTORY_ITEMS, CARD_DEFINITIONS], max_entries=Config.LOOKUP_CACHE_SIZE)
+
+_MISSING = object()
+
+
+def normalize_code(code) -> str:
+    return str(code if code is not None else '').strip()
+
+
+def lookup_codes(codes: list, fields: tuple = LOOKUP_FIELDS) -> dict:
+    """
+    Map each (normalized, non-empty) code to its matches:
+    [{'matched_on': field, 'item': ..., 'definition': ...}], custom_id matches first
+    """
+    codes = list(dict.fromkeys(code for code in map(normalize_code, codes) if code))
+    results = {}
+    misses = []
+    for code in codes:
+        matches = lookup_cache.get((fields, code), _MISSING)
+        if matches is _MISSING:
+            misses.append(code)
+        else:
+            results[code] = matches
+    if not misses:
+        return results
+
+    generation = lookup_cache.generation
+    found = {code: [] for code in misses}
+    items_collection = get_inventory_items_collection()
+    for field in fields:
+        # $gt '' restates the partial index filter, so the index can serve the query
+        query = Query({field: {'$in': misses, '$gt': ''}}).not_archived().sort(('_id', 1))
+        for item in query.find(items_collection):
+            matches = found[item[field]]
+            if all(item['_id'] != other['_id'] for _, other in matches):
+                matches.append((field, item))
+
+    definition_ids = list({item['card_definition_id'] for matches in found.values() for _, item in matches})
+    definitions = {}
+    if definition_ids:
+        for doc in Query({'_id': {'$in': definition_ids}}).find(get_card_definitions_collection()):
+            definitions[doc['_id']] = doc
+
+    for code, matches in found.items():
+        results[code] = []
+        for field, item in matches:
+            definition = definitions.get(item['card_definition_id'])
+            # Copies: an item or definition can match several codes
+            results[code].append({
+                'matched_on': field,
+                'item': InventoryItemModel.serialize(dict(item)),
+                'definition': CardDefinitionModel.serialize(dict(definition)) if definition else None,
+            })
+        lookup_cache.set((fields, code), results[code], generation)
+    return results
+
+
+def lookup_code(code: str, fields: tuple = LOOKUP_FIELDS) -> list:
+    """Matches of a single code (see lookup_codes)"""
+    code = normalize_code(code)
+    return lookup_codes([code], fields).get(code, [])
@@ -0,0 +1,282 @@
+"""
+Versioned, resumable data migrations
+
+Each Migration fixes one kind of document across its collections (hot tier
+first, then the archive): documents matching its filter are passed to
+`transform`, which returns the fields to $set (dotted paths) or {} when the
+document is already fine. MIGRATIONS run in version order and each is
+recorded in the Migrations collection as {_id: version, name, status,
+collection, last_id, scanned, modified, started_at, finished_at}, so a run
+only does what hasn't completed yet.
+
+Documents are read in `_id`-ordered batches and written with one bulk_write
+per batch. Each update only applies if the fields it changes (and
+updated_at) still hold the values that were read, so an edit made meanwhile
+wins over the migration. Updates stamp updated_at like any other write, so
+delta sync delivers them and the archiver's updated_at check sees them, and
+item migrations append an `updated` event per document to ItemEvents.
+Definitions have no event log.
+The position is checkpointed after every batch and an interrupted run
+resumes from it. After each batch the runner sleeps MIGRATION_PAUSE plus
+MIGRATION_THROTTLE times the batch's duration, leaving the database to live
+traffic. --dry-run writes nothing and reports how many documents would change.
+
+Run with `python -m backend.app.migrations` (`--list` shows what has been applied).
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from backend.app.config import Config
+from backend.app.database import (
+    get_card_definitions_collection,
+    get_inventory_items_collection,
+    get_card_definitions_archive_collection,
+    get_inventory_items_archive_collection,
+    get_item_events_collection,
+    get_migrations_collection,
+)
+from backend.app.models import CardDefinitionModel, GradingModel, InventoryItemModel, ItemEventModel
+from backend.app.versioning import bump_version, CARD_DEFINITIONS, INVENTORY_ITEMS
+
+DEFINITION_COLLECTIONS = (get_card_definitions_collection, get_card_definitions_archive_collection)
+ITEM_COLLECTIONS = (get_inventory_items_collection, get_inventory_items_archive_collection)
+
+
+class Migration:
+    """A versioned data fix: documents of `collections` matching filter_query, rewritten by transform"""
+
+    def __init__(self, version: int, name: str, collections: tuple, filter_query: dict, transform,
+                 cache_version: str, record_events: bool = False):
+        self.version = version
+        self.name = name
+        self.collections = collections
+        self.filter = filter_query
+        self.transform = transform
+        self.cache_version = cache_version
+        self.record_events = record_events
+
+
+def _created_time(doc: dict):
+    """When a document was created, from its ObjectId"""
+    return doc['_id'].generation_time.replace(tzinfo=None) if isinstance(doc['_id'], ObjectId) else None
+
+
+def _numeric_years(doc: dict) -> dict:
+    year = CardDefinitionModel.normalize_year(doc.get('year'))
+    return {'year': year} if year != doc.get('year') else {}
+
+
+def _numeric_amounts(doc: dict) -> dict:
+    changes = {}
+    for section, fields in InventoryItemModel.AMOUNT_FIELDS.items():
+        values = doc.get(section)
+        if not isinstance(values, dict):
+            continue
+        for field in fields:
+            value = values.get(field)
+            amount = InventoryItemModel.to_amount(value)
+            if isinstance(value, str) and amount != value:
+                changes[f'{section}.{field}'] = amount
+    return changes
+
+
+def _item_created_at(doc: dict) -> dict:
+    created_at = _created_time(doc)
+    return {'created_at': created_at} if created_at else {}
+
+
+def _definition_updated_at(doc: dict) -> dict:
+    updated_at = doc.get('created_at') or _created_time(doc)
+    return {'updated_at': updated_at} if updated_at else {}
+
+
+def _typed_grading(doc: dict) -> dict:
+    """Grading entries saved from the form (YYYY-MM-DD strings, '' for empty fields) as typed entries"""
+    entries = doc.get('grading')
+    if not isinstance(entries, list):
+        return {}
+    typed = []
+    for entry in entries:
+        try:
+            converted = GradingModel.create_entry(entry) if isinstance(entry, dict) else entry
+        except ValueError:
+            converted = entry  # unparseable; left for a manual fix
+        if converted:
+            typed.append(converted)
+    return {'grading': typed} if typed != entries else {}
+
+
+def _string_grading_filter() -> dict:
+    return {'$or': [
+        {f'grading.{field}': {'$type': 'string'}}
+        for field in ('date_submitted', 'date_returned', 'fee')
+    ]}
+
+
+def _string_amount_filter() -> dict:
+    return {'$or': [
+        {f'{section}.{field}': {'$type': 'string'}}
+        for section, fields in InventoryItemModel.AMOUNT_FIELDS.items()
+        for field in fields
+    ]}
+
+
+MIGRATIONS = [
+    Migration(1, 'Store four-digit definition years as numbers', DEFINITION_COLLECTIONS,
+              {'year': {'$type': 'string'}}, _numeric_years, CARD_DEFINITIONS),
+    Migration(2, 'Store acquisition and disposition amounts as numbers', ITEM_COLLECTIONS,
+              _string_amount_filter(), _numeric_amounts, INVENTORY_ITEMS, record_events=True),
+    Migration(3, 'Set created_at on items saved without one', ITEM_COLLECTIONS,
+              {'created_at': None}, _item_created_at, INVENTORY_ITEMS, record_events=True),
+    # Backdates updated_at to creation: the content is unchanged, so clients needn't fetch it again
+    Migration(4, 'Set updated_at on definitions saved without one', DEFINITION_COLLECTIONS,
+              {'updated_at': None}, _definition_updated_at, CARD_DEFINITIONS),
+    # /api/grading/pending and the turnaround stats only see typed dates
+    Migration(5, 'Store grading dates and fees as typed values', ITEM_COLLECTIONS,
+              _string_grading_filter(), _typed_grading, INVENTORY_ITEMS, record_events=True),
+]
+
+
+def _get_path(doc: dict, field: str):
+    for part in field.split('.'):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+def _record_events(collection, migration: Migration, changed: dict, now: datetime):
+    """An `updated` event for each document of `changed` (_id -> changes) the batch modified"""
+    events = []
+    for doc in collection.find({'_id': {'$in': list(changed)}, 'updated_at': now}):
+        fields = {field.split('.')[0] for field in changed[doc['_id']]}
+        events.append(ItemEventModel.create_event(
+            doc, 'updated', {'fields': {field: doc.get(field) for field in sorted(fields)},
+                             'migration': migration.version}, now
+        ))
+    if events:
+        get_item_events_collection().insert_many(events)
+
+
+def _throttle(elapsed: float):
+    pause = Config.MIGRATION_PAUSE + elapsed * Config.MIGRATION_THROTTLE
+    if pause > 0:
+        time.sleep(pause)
+
+
+def run_migration(migration: Migration, batch_size: int = None, dry_run: bool = False) -> dict:
+    """
+    Run one migration, resuming from its checkpoint
+    Returns the documents scanned and modified by this run (or that would be modified on dry_run).
+    """
+    batch_size = batch_size or Config.MIGRATION_BATCH_SIZE
+    migrations = get_migrations_collection()
+    state = migrations.find_one({'_id': migration.version}) or {}
+    totals = {'scanned': 0, 'modified': 0}
+    if state.get('status') == 'done':
+        return totals
+
+    if not dry_run:
+        migrations.update_one(
+            {'_id': migration.version},
+            {'$set': {'name': migration.name, 'status': 'running'},
+             '$setOnInsert': {'started_at': datetime.utcnow(), 'scanned': 0, 'modified': 0}},
+            upsert=True
+        )
+
+    collections = [getter() for getter in migration.collections]
+    names = [collection.name for collection in collections]
+    start = names.index(state['collection']) if state.get('collection') in names else 0
+    for collection in collections[start:]:
+        last_id = state.get('last_id') if collection.name == state.get('collection') else None
+        while True:
+            started = time.monotonic()
+            query = dict(migration.filter)
+            if last_id is not None:
+                query['_id'] = {'$gt': last_id}
+            batch = list(collection.find(query).sort('_id', 1).limit(batch_size))
+            if not batch:
+                break
+
+            now = datetime.utcnow()
+            requests, changed = [], {}
+            for doc in batch:
+                changes = migration.transform(doc)
+                if changes:
+                    # Only if the fields still hold what was read
+                    unchanged = {field: _get_path(doc, field) for field in changes}
+                    unchanged['updated_at'] = doc.get('updated_at')
+                    requests.append(UpdateOne({'_id': doc['_id'], **unchanged},
+                                              {'$set': {'updated_at': now, **changes}}))
+                    changed[doc['_id']] = changes
+            last_id = batch[-1]['_id']
+            totals['scanned'] += len(batch)
+            if dry_run:
+                totals['modified'] += len(requests)
+            else:
+                modified = collection.bulk_write(requests, ordered=False).modified_count if requests else 0
+                if modified:
+                    if migration.record_events:
+                        _record_events(collection, migration, changed, now)
+                    bump_version(migration.cache_version)
+                totals['modified'] += modified
+                migrations.update_one(
+                    {'_id': migration.version},
+                    {'$set': {'collection': collection.name, 'last_id': last_id},
+                     '$inc': {'scanned': len(batch), 'modified': modified}}
+                )
+            _throttle(time.monotonic() - started)
+
+    if not dry_run:
+        migrations.update_one(
+            {'_id': migration.version},
+            {'$set': {'status': 'done', 'finished_at': datetime.utcnow()}, '$unset': {'last_id': ''}}
+        )
+    return totals
+
+
+def run(batch_size: int = None, dry_run: bool = False, only: int = None) -> dict:
+    """Run pending migrations in version order (only: just that version); returns totals per version"""
+    results = {}
+    for migration in sorted(MIGRATIONS, key=lambda migration: migration.version):
+        if only is None or migration.version == only:
+            results[migration.version] = run_migration(migration, batch_size, dry_run)
+    return results
+
+
+def status() -> list:
+    """Recorded state of every migration (pending ones have status None)"""
+    recorded = {doc['_id']: doc for doc in get_migrations_collection().find()}
+    return [
+        {'version': migration.version, 'name': migration.name, **{
+            field: recorded.get(migration.version, {}).get(field)
+            for field in ('status', 'scanned', 'modified', 'started_at', 'finished_at')
+        }}
+        for migration in sorted(MIGRATIONS, key=lambda migration: migration.version)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending data migrations in resumable batches')
+    parser.add_argument('--list', action='store_true', help='Show migrations and their status')
+    parser.add_argument('--only', type=int, default=None, help='Run just this migration version')
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true', help='Only count the documents that would change')
+    args = parser.parse_args()
+
+    if args.list:
+        for entry in status():
+            print(f"{entry['version']:>3}  {entry['status'] or 'pending':<8}  {entry['name']}"
+                  + (f"  ({entry['modified']} of {entry['scanned']} documents changed)" if entry['status'] else ''))
+        return
+
+    verb = 'would change' if args.dry_run else 'changed'
+    for version, totals in run(args.batch_size, args.dry_run, args.only).items():
+        print(f"Migration {version}: scanned {totals['scanned']}, {verb} {totals['modified']}")
+
+
+if __name__ == '__main__':
+    main()
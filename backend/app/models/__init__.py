@@ -2,5 +2,7 @@
 
 from .card_definition import CardDefinitionModel
 from .inventory_item import InventoryItemModel
+from .grading import GradingModel
+from .item_event import ItemEventModel
 
-__all__ = ['CardDefinitionModel', 'InventoryItemModel']
+__all__ = ['CardDefinitionModel', 'InventoryItemModel', 'GradingModel', 'ItemEventModel']
@@ -1,5 +1,8 @@
+import re
 from typing import Optional
 from bson import ObjectId
+from datetime import datetime
+from backend.app.queries import Query, DEFINITION_SEARCH_FIELDS
 
 
 class CardDefinitionModel:
@@ -39,10 +42,12 @@ class CardDefinitionModel:
         """Create a CardDefinition document from input data"""
         doc = {
             'card_type': data['card_type'],
-            'year': data['year'],
+            'year': CardDefinitionModel.normalize_year(data['year']),
             'brand': data['brand'],
             'imgbb_url': data['imgbb_url'],
             'archived': False,  # Soft delete flag
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
         }
 
         # Optional common fields
@@ -63,11 +68,21 @@ class CardDefinitionModel:
 
         return doc
 
+    @staticmethod
+    def normalize_year(value):
+        """Four-digit years ('2021') are stored as numbers; other values (e.g. '2021-22') as given"""
+        if isinstance(value, str) and re.fullmatch(r'\d{4}', value.strip()):
+            return int(value)
+        return value
+
     @staticmethod
     def serialize(doc: dict) -> dict:
         """Convert MongoDB document to JSON-serializable dict"""
         if '_id' in doc:
             doc['_id'] = str(doc['_id'])
+        for field in ('created_at', 'updated_at'):
+            if isinstance(doc.get(field), datetime):
+                doc[field] = doc[field].isoformat()
         return doc
 
     @staticmethod
@@ -76,11 +91,4 @@ class CardDefinitionModel:
         if not query:
             return {}
 
-        # Search across multiple text fields
-        search_fields = ['player_name', 'pokemon_name', 'brand', 'series', 'insert_parallel', 'card_number', 'rarity']
-        or_conditions = [
-            {field: {'$regex': query, '$options': 'i'}}
-            for field in search_fields
-        ]
-
-        return {'$or': or_conditions}
+        return Query().search(DEFINITION_SEARCH_FIELDS, query).filter
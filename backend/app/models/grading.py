@@ -0,0 +1,121 @@
+from typing import Optional
+from datetime import datetime, timedelta
+
+
+class GradingModel:
+    """Model for entries of an InventoryItem's `grading` array"""
+
+    GRADERS = ['PSA', 'BGS', 'SGC', 'CGC', 'Other']
+    DATE_FIELDS = ['date_submitted', 'date_returned']
+    DATE_FORMAT = '%Y-%m-%d'
+
+    @staticmethod
+    def parse_date(value) -> Optional[datetime]:
+        """Parse a YYYY-MM-DD string (as sent by date inputs) into a datetime"""
+        if not value:
+            return None
+        if isinstance(value, datetime):
+            return value
+        return datetime.strptime(str(value)[:10], GradingModel.DATE_FORMAT)
+
+    @staticmethod
+    def create_entry(data: dict) -> Optional[dict]:
+        """
+        Create a typed grading entry (dates as datetimes, fee as float)
+        Returns None when every field is empty. Raises ValueError on bad values.
+        """
+        entry = {}
+        if data.get('type'):
+            entry['type'] = data['type']
+        if data.get('fee') not in (None, ''):
+            entry['fee'] = float(data['fee'])
+        for field in GradingModel.DATE_FIELDS:
+            parsed = GradingModel.parse_date(data.get(field))
+            if parsed:
+                entry[field] = parsed
+        if data.get('result'):
+            entry['result'] = data['result']
+        return entry or None
+
+    @staticmethod
+    def create_entries(entries: list) -> list:
+        """Typed grading array from a list of raw entries"""
+        result = []
+        for data in entries or []:
+            entry = GradingModel.create_entry(data)
+            if entry:
+                result.append(entry)
+        return result
+
+    @staticmethod
+    def parse_form(form) -> list:
+        """
+        Build the grading array from form fields
+        Form fields come as grading[0][type], grading[0][fee], etc.
+        """
+        grading_indices = set()
+        for key in form.keys():
+            if key.startswith('grading['):
+                # Extract index from grading[0][field]
+                grading_indices.add(key.split('[')[1].split(']')[0])
+
+        entries = []
+        for index in sorted(grading_indices, key=lambda i: int(i) if i.isdigit() else i):
+            entries.append({
+                field: form.get(f'grading[{index}][{field}]', '')
+                for field in ['type', 'fee', 'date_submitted', 'date_returned', 'result']
+            })
+        return GradingModel.create_entries(entries)
+
+    @staticmethod
+    def serialize_entry(entry: dict) -> dict:
+        """Convert dates back to YYYY-MM-DD strings for JSON and date inputs"""
+        entry = dict(entry)
+        for field in GradingModel.DATE_FIELDS:
+            if isinstance(entry.get(field), datetime):
+                entry[field] = entry[field].strftime(GradingModel.DATE_FORMAT)
+        return entry
+
+    @staticmethod
+    def pending_filter(grader: str = None, older_than_days: int = None, now: datetime = None) -> dict:
+        """
+        Filter for items with a submission that hasn't come back yet,
+        optionally for one grader and submitted more than N days ago
+        Served by the grading.type/date_submitted/date_returned multikey index.
+        """
+        condition = {'date_returned': None, 'date_submitted': {'$type': 'date'}}
+        if grader:
+            condition['type'] = grader
+        if older_than_days is not None:
+            cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+            condition['date_submitted'] = {'$lte': cutoff}
+        return {'grading': {'$elemMatch': condition}, 'archived': {'$ne': True}}
+
+    @staticmethod
+    def turnaround_pipeline(grader: str = None, since: datetime = None) -> list:
+        """Aggregation of average/min/max turnaround days per grader for returned entries"""
+        condition = {'date_returned': {'$type': 'date'}, 'date_submitted': {'$type': 'date'}}
+        if grader:
+            condition['type'] = grader
+        if since:
+            condition['date_returned'] = {'$gte': since}
+        return [
+            {'$match': {'grading': {'$elemMatch': condition}, 'archived': {'$ne': True}}},
+            {'$unwind': '$grading'},
+            {'$match': {f'grading.{key}': value for key, value in condition.items()}},
+            {'$project': {
+                'type': '$grading.type',
+                'days': {'$divide': [
+                    {'$subtract': ['$grading.date_returned', '$grading.date_submitted']},
+                    1000 * 60 * 60 * 24
+                ]},
+            }},
+            {'$group': {
+                '_id': '$type',
+                'count': {'$sum': 1},
+                'avg_days': {'$avg': '$days'},
+                'min_days': {'$min': '$days'},
+                'max_days': {'$max': '$days'},
+            }},
+            {'$sort': {'_id': 1}},
+        ]
@@ -1,13 +1,28 @@
+import re
 from typing import Optional
 from bson import ObjectId
 from datetime import datetime
 
+from .grading import GradingModel
+
 
 class InventoryItemModel:
     """Model for InventoryItem documents"""
 
     STATUSES = ['in_stock', 'shipping', 'grading', 'sold']
 
+    # Money fields of acquisition/disposition, stored as numbers
+    AMOUNT_FIELDS = {
+        'acquisition': ('price', 'shipping', 'tax', 'total_cost'),
+        'disposition': ('revenue', 'processing_fee', 'shipping_fee', 'sales_tax_collected'),
+    }
+
+    # Fields an item row on the card detail page renders (grading history,
+    # images and the rest of acquisition/disposition are left out)
+    LIST_FIELDS = ('status', 'serial_number', 'is_graded', 'is_in_taiwan', 'condition', 'personal_grade',
+                   'acquisition.total_cost', 'acquisition.acquiredFrom', 'acquisition.date',
+                   'disposition.revenue', 'defects', 'notes')
+
     @staticmethod
     def validate(data: dict, is_update: bool = False) -> tuple[bool, Optional[str]]:
         """
@@ -27,6 +42,16 @@ class InventoryItemModel:
         if 'disposition' in data and data.get('status') != 'sold':
             return False, "Disposition can only be set when status is 'sold'"
 
+        # Validate grading entries: known graders, parseable fees and dates
+        if 'grading' in data:
+            for entry in data['grading'] or []:
+                if entry.get('type') and entry['type'] not in GradingModel.GRADERS:
+                    return False, f"Invalid grading type. Must be one of: {', '.join(GradingModel.GRADERS)}"
+            try:
+                GradingModel.create_entries(data['grading'])
+            except (TypeError, ValueError):
+                return False, "Invalid grading entry: fee must be a number and dates YYYY-MM-DD"
+
         return True, None
 
     @staticmethod
@@ -51,17 +76,14 @@ class InventoryItemModel:
 
         # Acquisition information
         if 'acquisition' in data:
-            doc['acquisition'] = data['acquisition']
+            doc['acquisition'] = InventoryItemModel.normalize_amounts('acquisition', data['acquisition'])
 
         # Grading information (array)
-        if 'grading' in data:
-            doc['grading'] = data['grading']
-        else:
-            doc['grading'] = []
+        doc['grading'] = GradingModel.create_entries(data.get('grading'))
 
         # Disposition (sale) information
         if 'disposition' in data:
-            doc['disposition'] = data['disposition']
+            doc['disposition'] = InventoryItemModel.normalize_amounts('disposition', data['disposition'])
 
         return doc
 
@@ -73,9 +95,109 @@ class InventoryItemModel:
 
         # Grading array is replaced entirely (not merged)
         # This allows users to add, edit, or remove grading entries
+        if 'grading' in data:
+            data['grading'] = GradingModel.create_entries(data['grading'])
+        for section in InventoryItemModel.AMOUNT_FIELDS:
+            if section in data:
+                data[section] = InventoryItemModel.normalize_amounts(section, data[section])
 
         return data
 
+    @staticmethod
+    def to_amount(value):
+        """Numeric strings ('12', '12.50') as numbers; anything else unchanged"""
+        if isinstance(value, str) and re.fullmatch(r'-?\d+(\.\d+)?', value.strip()):
+            return float(value) if '.' in value else int(value)
+        return value
+
+    @staticmethod
+    def normalize_amounts(section: str, values):
+        """acquisition/disposition dict with its AMOUNT_FIELDS as numbers"""
+        if not isinstance(values, dict):
+            return values
+        return {
+            field: InventoryItemModel.to_amount(value) if field in InventoryItemModel.AMOUNT_FIELDS[section] else value
+            for field, value in values.items()
+        }
+
+    @staticmethod
+    def update_operations(existing: dict, data: dict) -> tuple[dict, dict]:
+        """
+        Incremental update for `data` against the stored document
+        Only fields whose value changed are written; grading entries appended
+        after the existing ones are $push-ed instead of rewriting the array.
+        Returns: (update_operations, changed_fields)
+        """
+        changes = {
+            field: value for field, value in data.items()
+            if field == 'updated_at' or existing.get(field) != value
+        }
+        if not set(changes) - {'updated_at'}:
+            return {}, {}
+
+        update = {}
+        old_grading = existing.get('grading') or []
+        new_grading = changes.get('grading')
+        if new_grading is not None and len(new_grading) > len(old_grading) \
+                and new_grading[:len(old_grading)] == old_grading:
+            update['$push'] = {'grading': {'$each': new_grading[len(old_grading):]}}
+            update['$set'] = {field: value for field, value in changes.items() if field != 'grading'}
+        else:
+            update['$set'] = changes
+        return update, changes
+
+    @staticmethod
+    def status_counts_pipeline(definition_ids: list = None) -> list:
+        """Aggregation counting non-archived items per definition and status (of definition_ids only, if given)"""
+        match = {'archived': {'$ne': True}}
+        if definition_ids is not None:
+            match['card_definition_id'] = {'$in': list(definition_ids)}
+        return [
+            {'$match': match},
+            {'$group': {
+                '_id': {'definition': '$card_definition_id', 'status': '$status'},
+                'count': {'$sum': 1}
+            }}
+        ]
+
+    @staticmethod
+    def sold_counts_pipeline(include_archived: bool = False, definition_ids: list = None) -> list:
+        """Aggregation counting sold items per definition (e.g. in the archive tier)"""
+        match = {'status': 'sold'}
+        if not include_archived:
+            match['archived'] = {'$ne': True}
+        if definition_ids is not None:
+            match['card_definition_id'] = {'$in': list(definition_ids)}
+        return [
+            {'$match': match},
+            {'$group': {'_id': '$card_definition_id', 'count': {'$sum': 1}}}
+        ]
+
+    @staticmethod
+    def status_condition(status: str):
+        """Condition on `status` matching a status tab; items without one are in stock"""
+        return {'$in': [status, None]} if status == 'in_stock' else status
+
+    @staticmethod
+    def status_tabs_pipeline(definition_id: ObjectId, per_page: int) -> list:
+        """
+        Aggregation of a definition's non-archived items into one document:
+        `counts` ({_id: status, count}) plus, per status, its first per_page
+        items in _id order with LIST_FIELDS only
+        """
+        facets = {'counts': [{'$group': {'_id': {'$ifNull': ['$status', 'in_stock']}, 'count': {'$sum': 1}}}]}
+        for status in InventoryItemModel.STATUSES:
+            facets[status] = [
+                {'$match': {'status': InventoryItemModel.status_condition(status)}},
+                {'$limit': per_page}
+            ]
+        return [
+            {'$match': {'card_definition_id': definition_id, 'archived': {'$ne': True}}},
+            {'$project': {field: 1 for field in InventoryItemModel.LIST_FIELDS}},
+            {'$sort': {'_id': 1}},
+            {'$facet': facets}
+        ]
+
     @staticmethod
     def serialize(doc: dict) -> dict:
         """Convert MongoDB document to JSON-serializable dict"""
@@ -87,4 +209,6 @@ class InventoryItemModel:
             doc['created_at'] = doc['created_at'].isoformat()
         if 'updated_at' in doc:
             doc['updated_at'] = doc['updated_at'].isoformat()
+        if doc.get('grading'):
+            doc['grading'] = [GradingModel.serialize_entry(entry) for entry in doc['grading']]
         return doc
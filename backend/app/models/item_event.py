@@ -0,0 +1,174 @@
+from typing import Optional
+from datetime import datetime
+
+from bson import ObjectId
+
+from .grading import GradingModel
+
+
+class ItemEventModel:
+    """
+    Model for ItemEvents documents: the append-only history of an InventoryItem
+
+    Each event records what changed (`type` and `data`) and a compact `state`
+    (status, archived, cost, revenue) as of that event, so point-in-time
+    questions can be answered from the latest event per item alone.
+    """
+
+    TYPES = [
+        'created', 'status_changed', 'grading_submitted', 'grading_returned',
+        'grading_updated', 'grading_removed', 'acquisition_changed', 'sold',
+        'archived', 'updated'
+    ]
+
+    # Fields whose changes get their own event type
+    TRACKED_FIELDS = ['status', 'grading', 'acquisition', 'disposition', 'archived', 'updated_at']
+
+    @staticmethod
+    def _to_float(value) -> Optional[float]:
+        try:
+            return float(value) if value not in (None, '') else None
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def cost_of(item: dict) -> Optional[float]:
+        """Acquisition cost: total_cost, else price + shipping + tax"""
+        acquisition = item.get('acquisition') or {}
+        total = ItemEventModel._to_float(acquisition.get('total_cost'))
+        if total is not None:
+            return total
+        parts = [ItemEventModel._to_float(acquisition.get(field)) for field in ('price', 'shipping', 'tax')]
+        if all(part is None for part in parts):
+            return None
+        return sum(part for part in parts if part is not None)
+
+    @staticmethod
+    def state_of(item: dict) -> dict:
+        """Compact snapshot stored on every event"""
+        return {
+            'status': item.get('status', 'in_stock'),
+            'archived': bool(item.get('archived')),
+            'cost': ItemEventModel.cost_of(item),
+            'revenue': ItemEventModel._to_float((item.get('disposition') or {}).get('revenue')),
+        }
+
+    @staticmethod
+    def create_event(item: dict, event_type: str, data: dict = None, ts: datetime = None) -> dict:
+        """Create an ItemEvents document for `item` (the state after the change)"""
+        return {
+            'item_id': item['_id'],
+            'card_definition_id': item.get('card_definition_id'),
+            'ts': ts or datetime.utcnow(),
+            'type': event_type,
+            'data': data or {},
+            'state': ItemEventModel.state_of(item),
+        }
+
+    @staticmethod
+    def events_for_changes(before: dict, after: dict, changes: dict, ts: datetime = None) -> list:
+        """
+        Events describing `changes` (field -> new value) applied to `before`
+        `after` is the resulting document, used for the state snapshot.
+        """
+        ts = ts or datetime.utcnow()
+        events = []
+
+        def add(event_type, data=None):
+            events.append(ItemEventModel.create_event(after, event_type, data, ts))
+
+        if 'status' in changes:
+            add('status_changed', {'from': before.get('status'), 'to': changes['status']})
+
+        if 'grading' in changes:
+            old, new = before.get('grading') or [], changes['grading'] or []
+            for index, entry in enumerate(new):
+                if index >= len(old):
+                    add('grading_submitted', {'index': index, 'entry': entry})
+                elif entry != old[index]:
+                    if entry.get('date_returned') and not old[index].get('date_returned'):
+                        add('grading_returned', {
+                            'index': index,
+                            'date_returned': entry['date_returned'],
+                            'result': entry.get('result'),
+                        })
+                    else:
+                        add('grading_updated', {'index': index, 'entry': entry})
+            for index in range(len(new), len(old)):
+                add('grading_removed', {'index': index})
+
+        if 'acquisition' in changes:
+            add('acquisition_changed', {'acquisition': changes['acquisition']})
+
+        if 'disposition' in changes:
+            add('sold', {'disposition': changes['disposition']})
+
+        if changes.get('archived'):
+            add('archived')
+
+        other = {
+            field: value for field, value in changes.items()
+            if field not in ItemEventModel.TRACKED_FIELDS
+        }
+        if other:
+            add('updated', {'fields': other})
+
+        return events
+
+    @staticmethod
+    def valuation_pipeline(as_of: datetime) -> list:
+        """
+        Aggregation of item counts, cost basis and revenue per status as of
+        `as_of` (exclusive), from the last event of each item before then
+        Uses the (item_id, ts) index for the sort.
+        """
+        return [
+            {'$match': {'ts': {'$lt': as_of}}},
+            {'$sort': {'item_id': 1, 'ts': 1}},
+            {'$group': {
+                '_id': '$item_id',
+                'status': {'$last': '$state.status'},
+                'archived': {'$last': '$state.archived'},
+                'cost': {'$last': '$state.cost'},
+                'revenue': {'$last': '$state.revenue'},
+            }},
+            {'$match': {'archived': {'$ne': True}}},
+            {'$group': {
+                '_id': '$status',
+                'items': {'$sum': 1},
+                'cost': {'$sum': {'$ifNull': ['$cost', 0]}},
+                'revenue': {'$sum': {'$ifNull': ['$revenue', 0]}},
+            }},
+            {'$sort': {'_id': 1}},
+        ]
+
+    @staticmethod
+    def _json_value(value):
+        """ObjectIds and datetimes inside nested dicts/lists as strings"""
+        if isinstance(value, ObjectId):
+            return str(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, dict):
+            return {key: ItemEventModel._json_value(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [ItemEventModel._json_value(item) for item in value]
+        return value
+
+    @staticmethod
+    def serialize(doc: dict) -> dict:
+        """Convert MongoDB document to JSON-serializable dict"""
+        doc['_id'] = str(doc['_id'])
+        doc['item_id'] = str(doc['item_id'])
+        if doc.get('card_definition_id'):
+            doc['card_definition_id'] = str(doc['card_definition_id'])
+        doc['ts'] = doc['ts'].isoformat()
+        data = doc.get('data', {})
+        if data.get('entry'):
+            data['entry'] = GradingModel.serialize_entry(data['entry'])
+        if isinstance(data.get('date_returned'), datetime):
+            data['date_returned'] = data['date_returned'].strftime(GradingModel.DATE_FORMAT)
+        # e.g. card_definition_id in the 'updated' fields of a definition merge
+        doc['data'] = ItemEventModel._json_value(data)
+        doc['state'] = ItemEventModel._json_value(doc.get('state', {}))
+        return doc
@@ -0,0 +1,246 @@
+"""
+Query profiler for development and CI
+
+Builds on the per-request query list collected by instrumentation and checks
+each request for:
+- repeated query shapes (N+1 patterns, e.g. one aggregate per definition);
+  distinct() calls only repeat when they are on the same field
+- slow commands (SLOW_QUERY_MS)
+- collection scans, found by running `explain` on a sample of reads
+- routes that issue more commands than their query budget
+
+Findings are logged as warnings. With QUERY_PROFILER_STRICT=True a budget
+violation raises QueryBudgetExceeded, which fails the request (and a test
+using the Flask test client).
+
+mongomock and similar stand-ins don't publish command monitoring events;
+call patch_collection_class(mongomock.Collection) to record their calls too.
+"""
+
+import functools
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from bson import ObjectId
+from flask import g, request, current_app
+
+from backend.app.config import Config
+from backend.app import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Commands worth explaining for collection scans
+EXPLAINABLE_COMMANDS = ('find', 'aggregate', 'count', 'distinct')
+
+# Keys pymongo adds to every command that aren't part of the query itself
+_DRIVER_KEYS = ('lsid', 'txnNumber', '$clusterTime', '$db', '$readPreference', 'autocommit', 'startTransaction')
+
+
+class QueryBudgetExceeded(Exception):
+    """A route issued more Mongo commands than its query budget allows"""
+
+
+last_report = None
+
+_patched = threading.local()
+
+
+def query_budget(limit: int):
+    """Decorator overriding the default QUERY_BUDGET for a single view"""
+    def decorator(view):
+        view._query_budget = limit
+        return view
+    return decorator
+
+
+def query_shape(value):
+    """Replace literal values with their type names so equal shapes compare equal"""
+    if isinstance(value, dict):
+        return {key: query_shape(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(v) for v in value]
+        # Lists of scalars (e.g. $in) collapse to a single placeholder
+        if all(not isinstance(v, (dict, list)) for v in shapes):
+            return ['?']
+        return shapes
+    if isinstance(value, ObjectId):
+        return 'ObjectId'
+    return type(value).__name__
+
+
+def distinct_field(query: dict):
+    """The field of a recorded distinct command (from `key`, else the raw command)"""
+    if query.get('command') != 'distinct':
+        return None
+    return query.get('key') or (query.get('spec') or {}).get('key')
+
+
+def shape_key(query: dict) -> str:
+    """
+    What makes two recorded commands "the same query" for N+1 detection
+    distinct() on different fields (e.g. the filter-option facets) is not a
+    repeated query, so its field is part of the shape.
+    """
+    command = query.get('command')
+    field = distinct_field(query)
+    if field:
+        command = f"{command}({field})"
+    return f"{command} {query.get('collection')} {query_shape(query.get('filter'))}"
+
+
+def _has_collscan(plan) -> bool:
+    """Search an explain plan (any nesting) for a COLLSCAN stage"""
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            return True
+        return any(_has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(v) for v in plan)
+    return False
+
+
+def _explain(query: dict) -> bool:
+    """Run explain for a recorded command; True when it scans a collection"""
+    from backend.app.database import DatabaseConnection
+
+    spec = query.get('spec')
+    if not spec or query.get('command') not in EXPLAINABLE_COMMANDS:
+        return False
+    command = {key: val for key, val in spec.items() if key not in _DRIVER_KEYS}
+    db = DatabaseConnection.get_client()[query.get('database') or DatabaseConnection.get_db().name]
+    try:
+        result = db.command('explain', command, verbosity='queryPlanner')
+    except Exception as e:
+        logger.debug("explain failed for %s: %s", query.get('command'), e)
+        return False
+    return _has_collscan(result)
+
+
+def analyze(queries: list, budget: int = None) -> dict:
+    """Build a report of repeated shapes, slow commands, scans and budget use"""
+    shapes = Counter(shape_key(q) for q in queries)
+    repeated = {
+        shape: count for shape, count in shapes.items()
+        if count >= Config.QUERY_PROFILER_REPEAT_THRESHOLD
+    }
+    slow = [
+        q for q in queries
+        if Config.SLOW_QUERY_MS and q.get('duration', 0) * 1000 >= Config.SLOW_QUERY_MS
+    ]
+
+    collscans = []
+    explained = set()
+    for q in queries:
+        key = shape_key(q)
+        if key in explained or random.random() >= Config.QUERY_PROFILER_EXPLAIN_SAMPLE:
+            continue
+        explained.add(key)
+        if _explain(q):
+            collscans.append(key)
+
+    return {
+        'query_count': len(queries),
+        'budget': budget,
+        'over_budget': bool(budget) and len(queries) > budget,
+        'repeated_shapes': repeated,
+        'slow_queries': [
+            {'shape': shape_key(q), 'duration_ms': round(q['duration'] * 1000, 2)} for q in slow
+        ],
+        'collection_scans': collscans,
+    }
+
+
+def _record(command_name, collection, filter_query, duration, key=None):
+    """Record a call made through a patched collection class"""
+    metrics = instrumentation.current_metrics()
+    if metrics is None or metrics.paused:
+        return
+    metrics.add_query({
+        'command': command_name,
+        'collection': collection.name,
+        'database': collection.database.name,
+        'filter': filter_query,
+        'key': key,
+        'duration': duration,
+        'failed': False,
+    })
+
+
+def patch_collection_class(collection_cls):
+    """
+    Record calls on a collection class that doesn't emit command events
+    (e.g. mongomock.Collection) into the current request's query list
+    """
+    methods = {
+        'find': 'find', 'find_one': 'find', 'aggregate': 'aggregate', 'distinct': 'distinct',
+        'count_documents': 'count', 'insert_one': 'insert', 'insert_many': 'insert',
+        'update_one': 'update', 'update_many': 'update', 'delete_one': 'delete',
+        'delete_many': 'delete', 'bulk_write': 'bulkWrite',
+    }
+    for method_name, command_name in methods.items():
+        original = getattr(collection_cls, method_name, None)
+        if original is None or getattr(original, '_profiled', False):
+            continue
+
+        def wrapper(self, *args, _original=original, _command=command_name, **kwargs):
+            # Stand-ins often implement find_one via find; record the outer call only
+            if getattr(_patched, 'active', False):
+                return _original(self, *args, **kwargs)
+            _patched.active = True
+            start = time.perf_counter()
+            try:
+                return _original(self, *args, **kwargs)
+            finally:
+                _patched.active = False
+                filter_query = args[0] if args else kwargs.get('filter', kwargs.get('pipeline'))
+                key = None
+                if _command == 'distinct':
+                    key = args[0] if args else kwargs.get('key')
+                    filter_query = args[1] if len(args) > 1 else kwargs.get('filter')
+                _record(_command, self, filter_query, time.perf_counter() - start, key)
+
+        wrapper._profiled = True
+        functools.update_wrapper(wrapper, original)
+        setattr(collection_cls, method_name, wrapper)
+
+
+def init_app(app):
+    """Check every request's queries once the view has run"""
+
+    @app.after_request
+    def profile_request(response):
+        global last_report
+        metrics = instrumentation.current_metrics()
+        if metrics is None:
+            return response
+
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, '_query_budget', Config.QUERY_BUDGET)
+
+        metrics.paused = True
+        try:
+            report = analyze(metrics.queries, budget)
+        finally:
+            metrics.paused = False
+        report['endpoint'] = request.endpoint
+        report['path'] = request.full_path
+        last_report = report
+        g.query_report = report
+
+        for shape, count in report['repeated_shapes'].items():
+            logger.warning("N+1 suspect on %s: %dx %s", request.path, count, shape)
+        for slow in report['slow_queries']:
+            logger.warning("Slow query on %s (%.1f ms): %s", request.path, slow['duration_ms'], slow['shape'])
+        for shape in report['collection_scans']:
+            logger.warning("Collection scan on %s: %s", request.path, shape)
+        if report['over_budget']:
+            message = f"{request.path} issued {report['query_count']} queries (budget {budget})"
+            if Config.QUERY_PROFILER_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        response.headers['X-Query-Count'] = str(report['query_count'])
+        return response
@@ -0,0 +1,210 @@
+"""
+Composable query builders shared by the routes
+
+Routes describe a read with Query (equality filters, text search,
+projections, sorts, pagination) instead of hand-building filter dicts and
+$regex clauses, so filtering rules live in one place. When a query runs,
+plan() picks the index from indexes.INDEXES that serves it best (equality
+fields, then sort fields, then range fields, in index key order) and passes
+it as a hint. Plans are cached per query shape (collection, filtered fields
+and operators, sort), so the choice is made once per kind of query rather
+than once per request.
+
+Hints are only sent once this process has ensured the indexes exist (see
+indexes.init_app); otherwise the server's planner chooses as before.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from backend.app import indexes
+
+PLAN_CACHE_SIZE = 256
+
+# Text search across definitions (?q=)
+DEFINITION_SEARCH_FIELDS = ['player_name', 'pokemon_name', 'brand', 'series', 'insert_parallel', 'card_number', 'rarity']
+
+# Fields the add-inventory card selector renders
+DEFINITION_SELECTOR_FIELDS = ('card_type', 'year', 'brand', 'series', 'language', 'era',
+                              'player_name', 'pokemon_name', 'imgbb_url')
+
+# Operators that narrow to a range of index keys rather than a single value
+_RANGE_OPERATORS = ('$gt', '$gte', '$lt', '$lte')
+
+_plan_cache = OrderedDict()
+_plan_lock = threading.Lock()
+_plan_stats = {'hits': 0, 'misses': 0}
+
+
+class Query:
+    """A find/count/distinct on one collection, built up step by step"""
+
+    def __init__(self, filter_query: dict = None):
+        self.filter = dict(filter_query or {})
+        self.projection = None
+        self.sort_keys = []
+        self.skip_count = 0
+        self.limit_count = 0
+
+    def where(self, **fields) -> 'Query':
+        """Equality conditions; empty values ('' or None) are skipped"""
+        for field, value in fields.items():
+            if value not in ('', None):
+                self.filter[field] = value
+        return self
+
+    def match(self, conditions: dict) -> 'Query':
+        """Add raw conditions; $or clauses are combined with $and, not replaced"""
+        for key, value in conditions.items():
+            if key == '$or' and '$or' in self.filter:
+                self.filter.setdefault('$and', []).append({'$or': value})
+            else:
+                self.filter[key] = value
+        return self
+
+    def not_archived(self) -> 'Query':
+        self.filter['archived'] = {'$ne': True}
+        return self
+
+    def search(self, fields: list, text: str) -> 'Query':
+        """Case-insensitive substring match of text in any of fields"""
+        if not text:
+            return self
+        conditions = [{field: contains(text)} for field in fields]
+        return self.match(conditions[0] if len(conditions) == 1 else {'$or': conditions})
+
+    def project(self, *fields) -> 'Query':
+        """Only return these fields (plus _id)"""
+        self.projection = {field: 1 for field in fields} if fields else None
+        return self
+
+    def sort(self, *keys) -> 'Query':
+        """Sort keys as (field, direction) pairs"""
+        self.sort_keys = list(keys)
+        return self
+
+    def page(self, page: int, per_page: int) -> 'Query':
+        """1-based page of per_page results"""
+        self.skip_count = max(page - 1, 0) * per_page
+        self.limit_count = per_page
+        return self
+
+    def limit(self, count: int) -> 'Query':
+        self.limit_count = count
+        return self
+
+    def shape(self) -> tuple:
+        """The query with values stripped: what index choice depends on"""
+        def operators(condition):
+            if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+                return tuple(sorted(condition))
+            return ('$eq',)
+
+        fields = tuple(sorted(
+            (field, operators(condition)) for field, condition in self.filter.items() if not field.startswith('$')
+        ))
+        return fields, tuple(self.sort_keys)
+
+    def plan(self, collection_name: str) -> Optional[str]:
+        """Name of the index to hint for this query on collection_name, if any"""
+        key = (collection_name, self.shape())
+        with _plan_lock:
+            if key in _plan_cache:
+                _plan_cache.move_to_end(key)
+                _plan_stats['hits'] += 1
+                return _plan_cache[key]
+        plan = choose_index(collection_name, *key[1])
+        with _plan_lock:
+            _plan_stats['misses'] += 1
+            _plan_cache[key] = plan
+            if len(_plan_cache) > PLAN_CACHE_SIZE:
+                _plan_cache.popitem(last=False)
+        return plan
+
+    def cursor(self, collection):
+        cursor = collection.find(self.filter, self.projection)
+        if self.sort_keys:
+            cursor = cursor.sort(self.sort_keys)
+        if self.skip_count:
+            cursor = cursor.skip(self.skip_count)
+        if self.limit_count:
+            cursor = cursor.limit(self.limit_count)
+        hint = self.plan(collection.name) if indexes.is_ensured() else None
+        if hint:
+            cursor = cursor.hint(hint)
+        return cursor
+
+    def find(self, collection) -> list:
+        return list(self.cursor(collection))
+
+    def find_one(self, collection) -> Optional[dict]:
+        return collection.find_one(self.filter, self.projection)
+
+    def count(self, collection) -> int:
+        hint = self.plan(collection.name) if indexes.is_ensured() else None
+        return collection.count_documents(self.filter, **({'hint': hint} if hint else {}))
+
+    def distinct(self, collection, field: str) -> list:
+        return collection.distinct(field, self.filter)
+
+
+def definitions_query(q: str = '', card_type: str = '', brand: str = '', series: str = '', year: str = '',
+                      language: str = '', era: str = '', name: str = '') -> Query:
+    """
+    Definitions matching the dashboard/API filters; empty arguments don't
+    filter. name matches the player or pokemon name, depending on card_type
+    (both when no type is given).
+    """
+    query = Query().search(DEFINITION_SEARCH_FIELDS, q)
+    query.where(card_type=card_type, brand=brand, series=series, language=language, era=era)
+    if str(year).strip().isdigit():
+        # Four-digit years are stored as numbers; match strings left by older writes too
+        query.where(year={'$in': [int(year), str(year).strip()]})
+    else:
+        query.where(year=year)
+    name_fields = {'sport': ['player_name'], 'pokemon': ['pokemon_name']}
+    return query.search(name_fields.get(card_type, ['player_name', 'pokemon_name']), name)
+
+
+def contains(text: str) -> dict:
+    """Condition for a case-insensitive substring match (text is literal, not a pattern)"""
+    return {'$regex': re.escape(text), '$options': 'i'}
+
+
+def choose_index(collection_name: str, fields: tuple, sort_keys: tuple) -> Optional[str]:
+    """
+    Best index in indexes.INDEXES for a query shape, or None
+    Follows the equality-sort-range rule: an index key is usable while it is
+    filtered by equality, then while it matches the sort, then once for a range.
+    """
+    equality = {field for field, ops in fields if ops in (('$eq',), ('$in',))}
+    ranges = {field for field, ops in fields if any(op in _RANGE_OPERATORS for op in ops)}
+    sort_fields = [field for field, _ in sort_keys]
+
+    best, best_score = None, 0
+    for keys, options in indexes.INDEXES.get(collection_name, []):
+        if not indexes.is_available(collection_name, options['name']):
+            continue
+        score = 0
+        remaining_sort = list(sort_fields)
+        for field, _ in keys:
+            if field in equality:
+                score += 1
+            elif remaining_sort and field == remaining_sort[0]:
+                remaining_sort.pop(0)
+                score += 1
+            elif field in ranges:
+                score += 1
+                break
+            else:
+                break
+        if score > best_score:
+            best, best_score = options['name'], score
+    return best
+
+
+def plan_cache_stats() -> dict:
+    with _plan_lock:
+        return {**_plan_stats, 'size': len(_plan_cache)}
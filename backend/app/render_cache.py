@@ -0,0 +1,99 @@
+"""
+Rendered page and fragment caching
+
+Full pages (dashboard, card detail) are cached under the normalized request
+parameters plus the current collection versions, so any write produces new
+keys; writes also clear the page cache through invalidation events to free
+the memory early. Card tiles/rows are cached as fragments keyed by the
+card's own content, so a tile is re-rendered only when that card (or its
+counts) changed, whatever filter the page was rendered for.
+"""
+
+import functools
+import hashlib
+
+from flask import current_app, make_response, request, session
+from markupsafe import Markup
+
+from backend.app.cache import LocalCache
+from backend.app.config import Config
+from backend.app.versioning import get_versions, CARD_DEFINITIONS, INVENTORY_ITEMS
+
+# Query parameters that affect the dashboard; anything else is ignored
+DASHBOARD_PARAMS = ('q', 'type', 'brand', 'series', 'year', 'language', 'era', 'name')
+
+page_cache = LocalCache(
+    'pages', [CARD_DEFINITIONS, INVENTORY_ITEMS],
+    max_entries=512, max_bytes=Config.PAGE_CACHE_MAX_BYTES
+)
+fragment_cache = LocalCache(
+    'fragments', [],
+    max_entries=20000, ttl=None, max_bytes=Config.FRAGMENT_CACHE_MAX_BYTES
+)
+
+
+def dashboard_key() -> tuple:
+    """Normalized dashboard filters: fixed order, trimmed, empty values dropped"""
+    return tuple(
+        (param, request.args.get(param, '').strip())
+        for param in DASHBOARD_PARAMS
+        if request.args.get(param, '').strip()
+    )
+
+
+def cached_page(*collections, key=None):
+    """
+    Decorator caching a view's HTML under `key(*args, **kwargs)` and the
+    versions of `collections`
+
+    Pages rendered with pending flash messages are neither served from nor
+    stored in the cache, since the messages are part of the markup.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not Config.RENDER_CACHE_ENABLED or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            versions = get_versions(*collections)
+            cache_key = (
+                request.endpoint,
+                key(*args, **kwargs) if key else (),
+                tuple(versions[name] for name in collections),
+            )
+
+            html = page_cache.get(cache_key)
+            if html is not None:
+                response = make_response(html)
+                response.headers['X-Render-Cache'] = 'hit'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'text/html':
+                page_cache.set(cache_key, response.get_data(as_text=True))
+                response.headers['X-Render-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+def _fingerprint(card: dict) -> str:
+    return hashlib.sha1(repr(sorted(card.items())).encode('utf-8')).hexdigest()
+
+
+def cached_fragment(template_name: str, card: dict) -> Markup:
+    """Render a per-card partial, reusing the cached HTML when the card is unchanged"""
+    if not Config.RENDER_CACHE_ENABLED:
+        return Markup(current_app.jinja_env.get_template(template_name).render(card=card))
+
+    key = (template_name, _fingerprint(card))
+    html = fragment_cache.get(key)
+    if html is None:
+        html = Markup(current_app.jinja_env.get_template(template_name).render(card=card))
+        fragment_cache.set(key, html)
+    return html
+
+
+def init_app(app):
+    """Expose cached_fragment to templates"""
+    app.jinja_env.globals['cached_fragment'] = cached_fragment
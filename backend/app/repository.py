@@ -0,0 +1,56 @@
+"""
+Storage interface shared by the database backends
+
+Routes and models talk to collections only through the getters in
+database.py, and only use the operations listed on CollectionRepository
+(the subset of pymongo's Collection API the app needs). A pymongo
+Collection satisfies it as is; sqlite_store.SQLiteCollection implements it
+on an embedded SQLite file for single-node deployments and tests.
+"""
+
+from typing import Any, Iterable, Iterator, Optional, Protocol
+
+
+class CursorRepository(Protocol):
+    """Result of find(): chainable sort/skip/limit, then iterate"""
+
+    def sort(self, key_or_list, direction: Optional[int] = None) -> 'CursorRepository': ...
+
+    def skip(self, count: int) -> 'CursorRepository': ...
+
+    def limit(self, count: int) -> 'CursorRepository': ...
+
+    def __iter__(self) -> Iterator[dict]: ...
+
+
+class CollectionRepository(Protocol):
+    """Operations the app performs on a collection"""
+
+    name: str
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None) -> CursorRepository: ...
+
+    def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None) -> Optional[dict]: ...
+
+    def count_documents(self, filter: dict) -> int: ...
+
+    def distinct(self, key: str, filter: Optional[dict] = None) -> list: ...
+
+    def aggregate(self, pipeline: list) -> Iterable[dict]: ...
+
+    def insert_one(self, document: dict) -> Any: ...
+
+    def insert_many(self, documents: list, ordered: bool = True) -> Any: ...
+
+    def update_one(self, filter: dict, update: dict, upsert: bool = False) -> Any: ...
+
+    def update_many(self, filter: dict, update: dict, upsert: bool = False) -> Any: ...
+
+    def find_one_and_update(self, filter: dict, update: dict, upsert: bool = False,
+                            return_document: bool = False) -> Optional[dict]: ...
+
+    def delete_many(self, filter: dict) -> Any: ...
+
+    def bulk_write(self, requests: list, ordered: bool = True) -> Any: ...
+
+    def create_index(self, keys, **kwargs) -> str: ...
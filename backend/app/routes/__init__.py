@@ -4,10 +4,16 @@ from .card_definitions import card_definitions_bp
 from .inventory_items import inventory_items_bp
 from .dashboard import dashboard_bp
 from .upload import upload_bp
+from .grading import grading_bp
+from .sync import sync_bp
+from .prices import prices_bp
 
 __all__ = [
     'card_definitions_bp',
     'inventory_items_bp',
     'dashboard_bp',
     'upload_bp',
+    'grading_bp',
+    'sync_bp',
+    'prices_bp',
 ]
@@ -1,31 +1,35 @@
 from flask import Blueprint, request, jsonify
 from bson import ObjectId
-from backend.app.database import get_card_definitions_collection
+from datetime import datetime
+from backend.app import duplicates
+from backend.app.archival import find_all_tiers, find_one_any_tier
+from backend.app.database import get_card_definitions_collection, get_card_definitions_archive_collection
 from backend.app.models import CardDefinitionModel
+from backend.app.queries import definitions_query
+from backend.app.http_cache import conditional
+from backend.app.versioning import bump_version, CARD_DEFINITIONS, INVENTORY_ITEMS
 
 card_definitions_bp = Blueprint('card_definitions', __name__)
 
 
 @card_definitions_bp.route('/api/definitions', methods=['GET'])
+@conditional(CARD_DEFINITIONS)
 def get_definitions():
-    """Get all card definitions with optional filtering"""
+    """
+    Get all card definitions with optional filtering
+    include_archived=true also returns definitions moved to the archive tier
+    """
     try:
         collection = get_card_definitions_collection()
 
-        # Build filter
-        filter_query = {}
-
-        # Text search
-        if 'q' in request.args:
-            search_query = request.args.get('q')
-            filter_query.update(CardDefinitionModel.get_search_filter(search_query))
-
-        # Filter by card type
-        if 'type' in request.args:
-            filter_query['card_type'] = request.args.get('type')
+        # Build filter (text search, card type)
+        query = definitions_query(q=request.args.get('q', ''), card_type=request.args.get('type', ''))
 
         # Get documents
-        documents = list(collection.find(filter_query))
+        documents = find_all_tiers(
+            collection, get_card_definitions_archive_collection(), query,
+            include_archived=request.args.get('include_archived') == 'true'
+        )
 
         # Serialize
         results = [CardDefinitionModel.serialize(doc) for doc in documents]
@@ -38,7 +42,10 @@ def get_definitions():
 
 @card_definitions_bp.route('/api/definitions', methods=['POST'])
 def create_definition():
-    """Create a new card definition"""
+    """
+    Create a new card definition
+    Answers 409 with the likely duplicates unless allow_duplicate=true is passed
+    """
     try:
         data = request.get_json()
 
@@ -47,12 +54,22 @@ def create_definition():
         if not is_valid:
             return jsonify({'error': error}), 400
 
+        # Refuse likely duplicates
+        if request.args.get('allow_duplicate') != 'true':
+            matches = duplicates.find_duplicates(data)
+            if matches:
+                return jsonify({
+                    'error': 'Likely duplicate of an existing card definition',
+                    'duplicates': serialize_matches(matches),
+                }), 409
+
         # Create document
         doc = CardDefinitionModel.create_document(data)
 
         # Insert into database
         collection = get_card_definitions_collection()
         result = collection.insert_one(doc)
+        bump_version(CARD_DEFINITIONS)
 
         # Return created document
         doc['_id'] = result.inserted_id
@@ -62,12 +79,68 @@ def create_definition():
         return jsonify({'error': str(e)}), 500
 
 
+@card_definitions_bp.route('/api/definitions/duplicates', methods=['POST'])
+def check_duplicates():
+    """
+    Likely duplicates of a definition, or of each definition in a list,
+    without creating anything
+    """
+    try:
+        data = request.get_json()
+        if isinstance(data, list):
+            return jsonify([serialize_matches(duplicates.find_duplicates(entry)) for entry in data]), 200
+        return jsonify(serialize_matches(duplicates.find_duplicates(data))), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@card_definitions_bp.route('/api/definitions/duplicates', methods=['GET'])
+@conditional(CARD_DEFINITIONS, INVENTORY_ITEMS)
+def get_duplicate_groups():
+    """Groups of existing definitions that are likely duplicates, with the suggested merge target"""
+    try:
+        threshold = request.args.get('threshold', type=float)
+        groups = [
+            {
+                'target': CardDefinitionModel.serialize(group['target']),
+                'duplicates': [CardDefinitionModel.serialize(doc) for doc in group['duplicates']],
+                'items': group['items'],
+            }
+            for group in duplicates.find_duplicate_groups(threshold)
+        ]
+        return jsonify(groups), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@card_definitions_bp.route('/api/definitions/<definition_id>/merge', methods=['POST'])
+def merge_definitions(definition_id):
+    """Move the items of duplicate_ids to this definition and archive them (dry_run only counts)"""
+    try:
+        data = request.get_json()
+        if not data.get('duplicate_ids'):
+            return jsonify({'error': 'Missing required field: duplicate_ids'}), 400
+
+        result = duplicates.merge(definition_id, data['duplicate_ids'], bool(data.get('dry_run')))
+        return jsonify(result), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @card_definitions_bp.route('/api/definitions/<definition_id>', methods=['GET'])
+@conditional(CARD_DEFINITIONS)
 def get_definition(definition_id):
-    """Get a single card definition by ID"""
+    """Get a single card definition by ID (from either tier)"""
     try:
-        collection = get_card_definitions_collection()
-        doc = collection.find_one({'_id': ObjectId(definition_id)})
+        doc = find_one_any_tier(
+            get_card_definitions_collection(), get_card_definitions_archive_collection(),
+            {'_id': ObjectId(definition_id)}
+        )
 
         if not doc:
             return jsonify({'error': 'Card definition not found'}), 404
@@ -91,11 +164,15 @@ def update_definition(definition_id):
                 return jsonify({'error': error}), 400
 
         # Update in database
+        if 'year' in data:
+            data['year'] = CardDefinitionModel.normalize_year(data['year'])
+        data['updated_at'] = datetime.utcnow()
         collection = get_card_definitions_collection()
         result = collection.update_one(
             {'_id': ObjectId(definition_id)},
             {'$set': data}
         )
+        bump_version(CARD_DEFINITIONS)
 
         if result.matched_count == 0:
             return jsonify({'error': 'Card definition not found'}), 404
@@ -106,3 +183,10 @@ def update_definition(definition_id):
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+def serialize_matches(matches: list) -> list:
+    return [
+        {'definition': CardDefinitionModel.serialize(match['definition']), 'score': match['score']}
+        for match in matches
+    ]
@@ -1,11 +1,16 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
+from backend.app import archival, valuation
 from backend.app.database import get_card_definitions_collection, get_inventory_items_collection
 from backend.app.models import CardDefinitionModel
+from backend.app.queries import Query
+from backend.app.http_cache import conditional
+from backend.app.versioning import CARD_DEFINITIONS, INVENTORY_ITEMS, MARKET_PRICES
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 
 @dashboard_bp.route('/api/dashboard', methods=['GET'])
+@conditional(CARD_DEFINITIONS, INVENTORY_ITEMS)
 def get_dashboard():
     """
     Get dashboard data with aggregated inventory counts
@@ -13,11 +18,14 @@ def get_dashboard():
     """
     try:
         # Get all card definitions
-        definitions_collection = get_card_definitions_collection()
-        items_collection = get_inventory_items_collection()
+        definitions_collection = get_card_definitions_collection(reporting=True)
+        items_collection = get_inventory_items_collection(reporting=True)
 
         # Get all definitions
-        definitions = list(definitions_collection.find())
+        definitions = Query().find(definitions_collection)
+        # Sold items moved to the archive tier (counted like the hot items below,
+        # archived or not)
+        archived_sold = archival.sold_counts(include_archived=True, reporting=True)
 
         # For each definition, aggregate inventory counts
         dashboard_data = []
@@ -47,6 +55,7 @@ def get_dashboard():
                 status = item['_id']
                 if status in counts:
                     counts[status] = item['count']
+            counts['sold'] += archived_sold.get(definition_id, 0)
 
             # Add counts to definition
             definition['counts'] = counts
@@ -58,3 +67,18 @@ def get_dashboard():
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@dashboard_bp.route('/api/dashboard/valuation', methods=['GET'])
+@conditional(INVENTORY_ITEMS, MARKET_PRICES)
+def get_valuation():
+    """
+    Market value, cost basis and unrealized P&L of in_stock/grading items at
+    the latest market prices, in total and per status
+    by_definition=true adds the breakdown per definition id.
+    """
+    try:
+        return jsonify(valuation.portfolio_valuation(request.args.get('by_definition') == 'true')), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
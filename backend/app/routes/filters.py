@@ -1,81 +1,86 @@
 from flask import Blueprint, jsonify, request
+from backend.app.cache import LocalCache
+from backend.app.concurrency import run_concurrently
 from backend.app.database import get_card_definitions_collection
+from backend.app.http_cache import conditional
+from backend.app.queries import Query
+from backend.app.versioning import CARD_DEFINITIONS
 
 filters_bp = Blueprint('filters', __name__)
 
+# Facet lists per (type, brand) selection, cleared on any definition write
+filter_options_cache = LocalCache('filter_options', [CARD_DEFINITIONS])
+
 
 @filters_bp.route('/api/filter-options')
+@conditional(CARD_DEFINITIONS)
 def get_filter_options():
     """Get available filter options based on current selections"""
     try:
-        collection = get_card_definitions_collection()
-
         # Get current filter selections
         card_type = request.args.get('type', '')
         brand = request.args.get('brand', '')
 
-        # Build base query (exclude archived)
-        base_query = {'archived': {'$ne': True}}
-
-        # Add filters progressively
-        if card_type:
-            base_query['card_type'] = card_type
-        if brand:
-            base_query['brand'] = brand
-
-        # Get distinct values for each field
-        result = {
-            'types': [],
-            'brands': [],
-            'series': [],
-            'years': [],
-            'players': [],
-            'pokemon': [],
-            'languages': [],
-            'eras': []
-        }
-
-        # Get all card types
-        result['types'] = collection.distinct('card_type', {'archived': {'$ne': True}})
-
-        # Get brands (filtered by type if selected)
-        brand_query = base_query.copy()
-        if 'brand' in brand_query:
-            del brand_query['brand']
-        result['brands'] = sorted(collection.distinct('brand', brand_query))
-
-        # Get series (filtered by type and brand if selected)
-        series_query = base_query.copy()
-        series_list = collection.distinct('series', series_query)
-        result['series'] = sorted([s for s in series_list if s])  # Remove empty strings
-
-        # Get years (filtered by selections)
-        years_list = collection.distinct('year', base_query)
-        result['years'] = sorted(years_list, reverse=True)
-
-        # Get player names if sport cards selected
-        if not card_type or card_type == 'sport':
-            player_query = base_query.copy()
-            player_query['card_type'] = 'sport'
-            player_list = collection.distinct('player_name', player_query)
-            result['players'] = sorted([p for p in player_list if p])
-
-        # Get pokemon names if pokemon cards selected
-        if not card_type or card_type == 'pokemon':
-            pokemon_query = base_query.copy()
-            pokemon_query['card_type'] = 'pokemon'
-            pokemon_list = collection.distinct('pokemon_name', pokemon_query)
-            result['pokemon'] = sorted([p for p in pokemon_list if p])
-
-            # Get languages for pokemon cards
-            language_list = collection.distinct('language', pokemon_query)
-            result['languages'] = sorted([l for l in language_list if l])
-
-            # Get eras for pokemon cards
-            era_list = collection.distinct('era', pokemon_query)
-            result['eras'] = sorted([e for e in era_list if e])
+        result = filter_options_cache.get_or_set(
+            (card_type, brand),
+            lambda: compute_filter_options(card_type, brand)
+        )
 
         return jsonify(result), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+def compute_filter_options(card_type: str, brand: str) -> dict:
+    """Distinct facet values for the given type/brand selection"""
+    collection = get_card_definitions_collection(reporting=True)
+
+    # Non-archived definitions of the selected type and brand
+    base_query = Query().not_archived().where(card_type=card_type, brand=brand)
+
+    # Each facet is an independent distinct() call; collect them and run
+    # them concurrently on the shared pool
+    facets = {}
+
+    # Get all card types
+    facets['types'] = ('card_type', Query().not_archived())
+
+    # Get brands (filtered by type if selected)
+    facets['brands'] = ('brand', Query().not_archived().where(card_type=card_type))
+
+    # Get series (filtered by type and brand if selected)
+    facets['series'] = ('series', base_query)
+
+    # Get years (filtered by selections)
+    facets['years'] = ('year', base_query)
+
+    # Get player names if sport cards selected
+    if not card_type or card_type == 'sport':
+        facets['players'] = ('player_name', Query().not_archived().where(card_type='sport', brand=brand))
+
+    # Get pokemon names, languages and eras if pokemon cards selected
+    if not card_type or card_type == 'pokemon':
+        pokemon_query = Query().not_archived().where(card_type='pokemon', brand=brand)
+        facets['pokemon'] = ('pokemon_name', pokemon_query)
+        facets['languages'] = ('language', pokemon_query)
+        facets['eras'] = ('era', pokemon_query)
+
+    values = run_concurrently(*[
+        (lambda field=field, query=query: query.distinct(collection, field))
+        for field, query in facets.values()
+    ])
+    values = dict(zip(facets.keys(), values))
+
+    result = {
+        'types': values['types'],
+        'brands': sorted(values['brands']),
+        'series': sorted([s for s in values['series'] if s]),  # Remove empty strings
+        'years': sorted({str(year) for year in values['years'] if year}, reverse=True),
+        'players': sorted([p for p in values.get('players', []) if p]),
+        'pokemon': sorted([p for p in values.get('pokemon', []) if p]),
+        'languages': sorted([l for l in values.get('languages', []) if l]),
+        'eras': sorted([e for e in values.get('eras', []) if e]),
+    }
+
+    return result
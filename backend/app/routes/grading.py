@@ -0,0 +1,82 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from backend.app.concurrency import run_concurrently
+from backend.app.config import Config
+from backend.app.database import get_inventory_items_collection
+from backend.app.models import GradingModel
+from backend.app.queries import Query
+
+grading_bp = Blueprint('grading', __name__)
+
+# Fields needed to list a pending submission
+PENDING_FIELDS = ('card_definition_id', 'custom_id', 'serial_number', 'status', 'grading')
+
+
+@grading_bp.route('/api/grading/pending', methods=['GET'])
+def get_pending_grading():
+    """
+    Get items with grading submissions that haven't been returned yet
+    Query params: type (grader), older_than_days (only submissions out at
+    least that long). Includes turnaround statistics per grader.
+    """
+    try:
+        grader = request.args.get('type') or None
+        older_than_days = request.args.get('older_than_days', type=int)
+        if grader and grader not in GradingModel.GRADERS:
+            return jsonify({'error': f"Invalid grading type. Must be one of: {', '.join(GradingModel.GRADERS)}"}), 400
+
+        collection = get_inventory_items_collection(reporting=True)
+        now = datetime.utcnow()
+
+        documents, turnaround = run_concurrently(
+            lambda: Query(GradingModel.pending_filter(grader, older_than_days, now))
+            .project(*PENDING_FIELDS).sort(('_id', 1)).find(collection),
+            lambda: list(collection.aggregate(GradingModel.turnaround_pipeline(grader)))
+        )
+
+        pending = []
+        counts = {}
+        for doc in documents:
+            for entry in doc.get('grading', []):
+                submitted = entry.get('date_submitted')
+                if entry.get('date_returned') or not isinstance(submitted, datetime):
+                    continue
+                if grader and entry.get('type') != grader:
+                    continue
+                days_out = (now - submitted).days
+                if older_than_days is not None and days_out < older_than_days:
+                    continue
+
+                pending.append({
+                    '_id': str(doc['_id']),
+                    'card_definition_id': str(doc['card_definition_id']),
+                    'custom_id': doc.get('custom_id'),
+                    'serial_number': doc.get('serial_number'),
+                    'status': doc.get('status'),
+                    'grading': GradingModel.serialize_entry(entry),
+                    'days_out': days_out,
+                    'overdue': days_out >= Config.GRADING_OVERDUE_DAYS,
+                })
+                type_name = entry.get('type', 'Unknown')
+                counts[type_name] = counts.get(type_name, 0) + 1
+
+        pending.sort(key=lambda row: row['days_out'], reverse=True)
+
+        return jsonify({
+            'pending': pending,
+            'counts': counts,
+            'overdue_days': Config.GRADING_OVERDUE_DAYS,
+            'turnaround': [
+                {
+                    'type': row['_id'],
+                    'count': row['count'],
+                    'avg_days': round(row['avg_days'], 1),
+                    'min_days': round(row['min_days'], 1),
+                    'max_days': round(row['max_days'], 1),
+                }
+                for row in turnaround
+            ],
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,26 +1,38 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, render_template
 from bson import ObjectId
-from backend.app.database import get_inventory_items_collection
-from backend.app.models import InventoryItemModel
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from backend.app import item_events, lookup
+from backend.app.archival import find_all_tiers, find_one_any_tier, page_all_tiers
+from backend.app.database import get_inventory_items_collection, get_inventory_items_archive_collection
+from backend.app.http_cache import conditional
+from backend.app.models import InventoryItemModel, ItemEventModel
+from backend.app.queries import Query
+from backend.app.config import Config
+from backend.app.versioning import bump_version, INVENTORY_ITEMS
 
 inventory_items_bp = Blueprint('inventory_items', __name__)
 
 
 @inventory_items_bp.route('/api/inventory', methods=['GET'])
 def get_inventory_items():
-    """Get inventory items with optional filtering by definition_id"""
+    """
+    Get inventory items with optional filtering by definition_id
+    include_archived=true also returns items moved to the archive tier
+    """
     try:
         collection = get_inventory_items_collection()
 
-        # Build filter
-        filter_query = {}
-
         # Filter by card definition
+        query = Query()
         if 'definition_id' in request.args:
-            filter_query['card_definition_id'] = ObjectId(request.args.get('definition_id'))
+            query.where(card_definition_id=ObjectId(request.args.get('definition_id')))
 
         # Get documents
-        documents = list(collection.find(filter_query))
+        documents = find_all_tiers(
+            collection, get_inventory_items_archive_collection(), query,
+            include_archived=request.args.get('include_archived') == 'true'
+        )
 
         # Serialize
         results = [InventoryItemModel.serialize(doc) for doc in documents]
@@ -45,24 +57,159 @@ def create_inventory_item():
         # Create document
         doc = InventoryItemModel.create_document(data)
 
-        # Insert into database
-        collection = get_inventory_items_collection()
-        result = collection.insert_one(doc)
+        # Insert into database (with its `created` event)
+        item_events.create_item(doc)
+        bump_version(INVENTORY_ITEMS)
 
         # Return created document
-        doc['_id'] = result.inserted_id
         return jsonify(InventoryItemModel.serialize(doc)), 201
 
+    except DuplicateKeyError:
+        return jsonify({'error': 'custom_id is already used by another item'}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@inventory_items_bp.route('/api/inventory/value', methods=['GET'])
+@conditional(INVENTORY_ITEMS)
+def get_inventory_value():
+    """
+    Inventory counts, cost basis and realized revenue as of a date
+    Query param: as_of (YYYY-MM-DD, default today); computed from item events
+    """
+    try:
+        as_of = request.args.get('as_of')
+        try:
+            as_of = datetime.strptime(as_of, '%Y-%m-%d') if as_of else datetime.utcnow()
+        except ValueError:
+            return jsonify({'error': 'as_of must be YYYY-MM-DD'}), 400
+
+        return jsonify(item_events.inventory_value(as_of)), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _lookup_fields():
+    """Fields to match codes against: ?field= (custom_id or serial_number), else both"""
+    field = request.args.get('field')
+    if not field:
+        return lookup.LOOKUP_FIELDS
+    if field not in lookup.LOOKUP_FIELDS:
+        raise ValueError(f"Invalid field. Must be one of: {', '.join(lookup.LOOKUP_FIELDS)}")
+    return (field,)
+
+
+@inventory_items_bp.route('/api/inventory/lookup', methods=['GET'])
+def lookup_item():
+    """
+    Find non-archived items by a scanned code (custom_id, then serial_number)
+    Returns every match with its definition; 404 when nothing matches.
+    """
+    try:
+        try:
+            fields = _lookup_fields()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        code = lookup.normalize_code(request.args.get('code'))
+        if not code:
+            return jsonify({'error': 'Missing required parameter: code'}), 400
+
+        matches = lookup.lookup_code(code, fields)
+        if not matches:
+            return jsonify({'error': f'No item found for {code}', 'code': code}), 404
+        return jsonify({'code': code, 'matches': matches}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@inventory_items_bp.route('/api/inventory/lookup', methods=['POST'])
+def lookup_items():
+    """
+    Batch lookup of scanned codes: {"codes": [...]}
+    Returns the matches per code and the codes nothing matched.
+    """
+    try:
+        try:
+            fields = _lookup_fields()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        codes = (request.get_json() or {}).get('codes')
+        if not isinstance(codes, list) or not codes:
+            return jsonify({'error': 'codes must be a non-empty list'}), 400
+        if len(codes) > Config.LOOKUP_MAX_CODES:
+            return jsonify({'error': f'At most {Config.LOOKUP_MAX_CODES} codes per request'}), 400
+
+        results = lookup.lookup_codes(codes, fields)
+        return jsonify({
+            'results': {code: matches for code, matches in results.items() if matches},
+            'not_found': [code for code, matches in results.items() if not matches],
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@inventory_items_bp.route('/api/inventory/by-status/<status>', methods=['GET'])
+@conditional(INVENTORY_ITEMS)
+def get_inventory_items_by_status(status):
+    """
+    One page of a definition's items in a status (card detail tabs):
+    ?definition_id=...&page=N, include_archived=true to continue into the archive tier
+    Returns the items (card detail fields only) and their rendered rows.
+    """
+    try:
+        if status not in InventoryItemModel.STATUSES:
+            return jsonify({'error': f"Invalid status. Must be one of: {', '.join(InventoryItemModel.STATUSES)}"}), 400
+        if not request.args.get('definition_id'):
+            return jsonify({'error': 'Missing required parameter: definition_id'}), 400
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = Config.CARD_DETAIL_PAGE_SIZE
+
+        query = Query().where(card_definition_id=ObjectId(request.args.get('definition_id'))).not_archived()
+        query.match({'status': InventoryItemModel.status_condition(status)})
+        query.project(*InventoryItemModel.LIST_FIELDS).sort(('_id', 1))
+        documents, total = page_all_tiers(
+            get_inventory_items_collection(), get_inventory_items_archive_collection(), query, page, per_page,
+            include_archived=request.args.get('include_archived') == 'true'
+        )
+
+        html = ''.join(render_template('partials/inventory_item_row.html', item=doc, status=status)
+                       for doc in documents)
+        return jsonify({
+            'status': status,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'items': [InventoryItemModel.serialize(doc) for doc in documents],
+            'html': html,
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@inventory_items_bp.route('/api/inventory/<item_id>/history', methods=['GET'])
+@conditional(INVENTORY_ITEMS)
+def get_inventory_item_history(item_id):
+    """Get the event history of an inventory item, oldest first"""
+    try:
+        events = item_events.item_history(item_id)
+        return jsonify([ItemEventModel.serialize(event) for event in events]), 200
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @inventory_items_bp.route('/api/inventory/<item_id>', methods=['GET'])
 def get_inventory_item(item_id):
-    """Get a single inventory item by ID"""
+    """Get a single inventory item by ID (from either tier)"""
     try:
-        collection = get_inventory_items_collection()
-        doc = collection.find_one({'_id': ObjectId(item_id)})
+        doc = find_one_any_tier(
+            get_inventory_items_collection(), get_inventory_items_archive_collection(),
+            {'_id': ObjectId(item_id)}
+        )
 
         if not doc:
             return jsonify({'error': 'Inventory item not found'}), 404
@@ -94,15 +241,15 @@ def update_inventory_item(item_id):
         # Prepare update data
         update_data = InventoryItemModel.update_document(existing, data)
 
-        # Update in database
-        result = collection.update_one(
-            {'_id': ObjectId(item_id)},
-            {'$set': update_data}
-        )
+        # Update in database (changed fields only) and record events
+        if item_events.update_item(existing, update_data):
+            bump_version(INVENTORY_ITEMS)
 
         # Return updated document
         doc = collection.find_one({'_id': ObjectId(item_id)})
         return jsonify(InventoryItemModel.serialize(doc)), 200
 
+    except DuplicateKeyError:
+        return jsonify({'error': 'custom_id is already used by another item'}), 409
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,63 @@
+import io
+from flask import Blueprint, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+from backend.app import valuation
+from backend.app.config import Config
+from backend.app.http_cache import conditional
+from backend.app.versioning import MARKET_PRICES
+
+prices_bp = Blueprint('prices', __name__)
+
+
+def _import_format(filename: str) -> str:
+    """Ingest format from ?format=, else the file name or Content-Type"""
+    if request.args.get('format'):
+        return request.args['format']
+    if filename.lower().endswith('.csv') or request.mimetype == 'text/csv':
+        return 'csv'
+    return 'ndjson'
+
+
+@prices_bp.route('/api/prices/import', methods=['POST'])
+def import_prices():
+    """
+    Import market prices from CSV or NDJSON, sent as the `file` form field or
+    as the request body
+    Columns: definition_id, grade (default raw), price, date, source
+    """
+    # Price feeds are larger than image uploads
+    request.max_content_length = Config.PRICE_IMPORT_MAX_BYTES
+    if (request.content_length or 0) > Config.PRICE_IMPORT_MAX_BYTES:
+        raise RequestEntityTooLarge()
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            stream, fmt = upload.stream, _import_format(upload.filename or '')
+        else:
+            stream, fmt = request.stream, _import_format('')
+        if fmt not in valuation.FORMATS:
+            return jsonify({'error': f"Invalid format. Must be one of: {', '.join(valuation.FORMATS)}"}), 400
+
+        result = valuation.ingest(io.TextIOWrapper(stream, encoding='utf-8', newline=''), fmt)
+        return jsonify(result), 200
+
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@prices_bp.route('/api/prices/<definition_id>', methods=['GET'])
+@conditional(MARKET_PRICES)
+def get_price_history(definition_id):
+    """Price history of a definition, oldest first (optionally for one grade)"""
+    try:
+        prices = [
+            {'ts': doc['ts'].isoformat(), 'grade': doc['meta']['grade'], 'price': doc['price'],
+             'source': doc.get('source')}
+            for doc in valuation.price_history(definition_id, request.args.get('grade'))
+        ]
+        return jsonify(prices), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
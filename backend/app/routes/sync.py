@@ -0,0 +1,235 @@
+import base64
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify
+from bson import ObjectId
+from backend.app import item_events
+from backend.app.config import Config
+from backend.app.database import (
+    get_card_definitions_collection,
+    get_inventory_items_collection,
+    get_collection_versions_collection,
+)
+from backend.app.models import CardDefinitionModel, InventoryItemModel
+from backend.app.queries import Query
+from backend.app.versioning import bump_version, INVENTORY_ITEMS
+
+sync_bp = Blueprint('sync', __name__)
+
+# Sync name -> (collection getter, serializer)
+SYNCED = {
+    'definitions': (get_card_definitions_collection, CardDefinitionModel.serialize),
+    'items': (get_inventory_items_collection, InventoryItemModel.serialize),
+}
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+MAX_PUSH_BATCH = 200
+
+
+# Fingerprints of recently delivered documents kept in a cursor, per collection
+RECENT_LIMIT = 100
+
+
+def encode_cursor(positions: dict, issued_at: datetime, complete: bool = True, recent: dict = None) -> str:
+    """
+    Opaque cursor: when the sync started, last (updated_at, _id) seen per
+    collection, whether that sync had finished (no more pages), and
+    fingerprints of the documents delivered within SYNC_CLOCK_SKEW of its start
+    """
+    payload = {'at': issued_at.isoformat(), 'pos': positions, 'done': complete, 'recent': recent or {}}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> tuple[dict, datetime, bool, dict]:
+    payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return payload['pos'], datetime.fromisoformat(payload['at']), payload.get('done', True), payload.get('recent', {})
+
+
+def fingerprint(doc: dict) -> str:
+    """Short digest of a document version: (_id, updated_at)"""
+    updated_at = doc['updated_at'].isoformat() if doc.get('updated_at') else ''
+    return hashlib.blake2b(f"{doc['_id']}|{updated_at}".encode('utf-8'), digest_size=6).hexdigest()
+
+
+def overlap_window(position, issued_at: datetime) -> dict:
+    """
+    Filter for documents after position, plus any stamped within
+    SYNC_CLOCK_SKEW before the previous sync was issued
+    updated_at is set before a write commits, so a write stamped before that
+    sync may only have become visible after it. Anything older had committed
+    by then and was read, so the window doesn't depend on the position.
+    """
+    after = after_position(position)
+    if not after or issued_at is None:
+        return after
+    return {'$or': [after, {'updated_at': {'$gte': issued_at - timedelta(seconds=Config.SYNC_CLOCK_SKEW)}}]}
+
+
+def after_position(position) -> dict:
+    """Filter for documents ordered after (updated_at, _id) = position"""
+    if not position:
+        return {}
+    updated_at, last_id = position
+    last_id = ObjectId(last_id)
+    if updated_at is None:
+        # Documents without updated_at sort first; continue among them, then the rest
+        return {'$or': [
+            {'updated_at': None, '_id': {'$gt': last_id}},
+            {'updated_at': {'$ne': None}},
+        ]}
+    updated_at = datetime.fromisoformat(updated_at)
+    return {'$or': [
+        {'updated_at': {'$gt': updated_at}},
+        {'updated_at': updated_at, '_id': {'$gt': last_id}},
+    ]}
+
+
+@sync_bp.route('/api/sync', methods=['GET'])
+def pull_changes():
+    """
+    Get definitions and items changed since a cursor, oldest first
+    Query params: cursor (from the previous response; omit for a full sync), limit.
+    Archived documents come back as tombstones. `reset` tells the client to
+    drop its local copy (first sync, or documents were moved to the archive
+    tier since the cursor was issued). Each new sync also re-reads changes
+    stamped up to SYNC_CLOCK_SKEW seconds before the previous one started, for
+    writes that committed late; versions the cursor says were already
+    delivered are left out.
+    """
+    try:
+        limit = min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT)
+        cursor = request.args.get('cursor')
+        try:
+            positions, issued_at, complete, recent = decode_cursor(cursor) if cursor else ({}, None, True, {})
+        except (ValueError, KeyError, TypeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        archival = get_collection_versions_collection().find_one({'_id': 'Archival'}) or {}
+        reset = issued_at is None or (archival.get('last_run') is not None and archival['last_run'] > issued_at)
+        if reset:
+            positions, recent = {}, {}
+
+        now = datetime.utcnow()
+        # A sync spanning several pages keeps the time of its first page
+        started = issued_at if issued_at is not None and not complete and not reset else now
+        floor = started - timedelta(seconds=Config.SYNC_CLOCK_SKEW)
+        changes, tombstones, has_more = {}, [], False
+        for name, (get_collection, serialize) in SYNCED.items():
+            position = positions.get(name)
+            seen = recent.get(name, [])
+            # A new sync re-reads the overlap window (skipping versions already
+            # delivered); later pages of the same sync continue after the position
+            window = overlap_window(position, issued_at) if complete else after_position(position)
+            skipped = set(seen) if complete else set()
+            read = Query(window).sort(('updated_at', 1), ('_id', 1)).limit(limit + len(skipped) + 1) \
+                .find(get_collection())
+            fingerprints = [fingerprint(doc) for doc in read]
+            documents = [doc for doc, mark in zip(read, fingerprints) if mark not in skipped]
+            truncated = len(documents) > limit
+            if truncated:
+                documents = documents[:limit]
+                has_more = True
+            if documents:
+                last = documents[-1]
+                # Late writes found in the overlap window only move the position
+                # back when the next page has to continue from them
+                if truncated or not (position and position[0] and last.get('updated_at')
+                                     and last['updated_at'] < datetime.fromisoformat(position[0])):
+                    positions[name] = [
+                        last['updated_at'].isoformat() if last.get('updated_at') else None,
+                        str(last['_id'])
+                    ]
+
+            # Versions the next sync will re-read: those in its window that
+            # were delivered now, or earlier and read again
+            kept = [mark for mark in seen if mark in fingerprints] if complete else seen
+            delivered = [fingerprint(doc) for doc in documents
+                         if doc.get('updated_at') and doc['updated_at'] >= floor]
+            recent[name] = (kept + delivered)[-RECENT_LIMIT:]
+
+            changes[name] = []
+            for doc in documents:
+                if doc.get('archived'):
+                    tombstones.append({'collection': name, '_id': str(doc['_id'])})
+                else:
+                    changes[name].append(serialize(doc))
+
+        return jsonify({
+            'changes': changes,
+            'tombstones': tombstones,
+            'cursor': encode_cursor(positions, started, not has_more, recent),
+            'has_more': has_more,
+            'reset': reset,
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def apply_change(change: dict) -> dict:
+    """Apply one queued client edit to an inventory item"""
+    result = {'id': change.get('id')}
+    op = change.get('op')
+    data = change.get('data') or {}
+
+    if op == 'create':
+        is_valid, error = InventoryItemModel.validate(data, is_update=False)
+        if not is_valid:
+            return {**result, 'status': 'error', 'error': error}
+        doc = InventoryItemModel.create_document(data)
+        item_events.create_item(doc)
+        return {**result, 'status': 'applied', 'item': InventoryItemModel.serialize(doc)}
+
+    collection = get_inventory_items_collection()
+    existing = collection.find_one({'_id': ObjectId(change['item_id'])})
+    if not existing:
+        return {**result, 'status': 'not_found'}
+
+    # The client edited the version it last synced; if the server copy has
+    # changed since, don't overwrite it
+    base = change.get('base_updated_at')
+    if base and existing.get('updated_at') and existing['updated_at'].isoformat() > base:
+        return {**result, 'status': 'conflict', 'item': InventoryItemModel.serialize(existing)}
+
+    if op == 'archive':
+        item_events.archive_item(existing['_id'])
+        return {**result, 'status': 'applied'}
+
+    if op != 'update':
+        return {**result, 'status': 'error', 'error': f'Unknown op: {op}'}
+
+    is_valid, error = InventoryItemModel.validate(data, is_update=True)
+    if not is_valid:
+        return {**result, 'status': 'error', 'error': error}
+    item_events.update_item(existing, InventoryItemModel.update_document(existing, data))
+    return {**result, 'status': 'applied', 'item': InventoryItemModel.serialize(collection.find_one({'_id': existing['_id']}))}
+
+
+@sync_bp.route('/api/sync', methods=['POST'])
+def push_changes():
+    """
+    Apply a batch of edits queued by an offline client, in order
+    Body: {"changes": [{"id", "op": "create"|"update"|"archive", "item_id",
+    "data", "base_updated_at"}]}. Returns a result per change.
+    """
+    try:
+        changes = (request.get_json() or {}).get('changes', [])
+        if len(changes) > MAX_PUSH_BATCH:
+            return jsonify({'error': f'At most {MAX_PUSH_BATCH} changes per request'}), 400
+
+        results = []
+        for change in changes:
+            try:
+                results.append(apply_change(change))
+            except Exception as e:
+                results.append({'id': change.get('id'), 'status': 'error', 'error': str(e)})
+
+        if any(result['status'] == 'applied' for result in results):
+            bump_version(INVENTORY_ITEMS)
+
+        return jsonify({'results': results}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
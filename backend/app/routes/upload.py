@@ -1,12 +1,13 @@
 from flask import Blueprint, request, jsonify
-import requests
 import base64
-from backend.app.config import Config
+from backend.app import imgbb
+from backend.app.uploads import admit_upload
 
 upload_bp = Blueprint('upload', __name__)
 
 
 @upload_bp.route('/api/upload-image', methods=['POST'])
+@admit_upload
 def upload_image():
     """
     Proxy endpoint for uploading images to ImgBB
@@ -25,15 +26,8 @@ def upload_image():
         # Read and encode image to base64
         image_data = base64.b64encode(image_file.read()).decode('utf-8')
 
-        # Prepare ImgBB API request
-        imgbb_url = 'https://api.imgbb.com/1/upload'
-        payload = {
-            'key': Config.IMGBB_API_KEY,
-            'image': image_data,
-        }
-
         # Upload to ImgBB
-        response = requests.post(imgbb_url, data=payload)
+        response = imgbb.upload_image(image_data)
 
         if response.status_code != 200:
             return jsonify({'error': 'Failed to upload image to ImgBB'}), 500
@@ -1,95 +1,117 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_from_directory
 from werkzeug.utils import secure_filename
-import requests
 import base64
+from datetime import datetime
 from bson import ObjectId
-from backend.app.database import get_card_definitions_collection, get_inventory_items_collection
-from backend.app.models import CardDefinitionModel, InventoryItemModel
+from pymongo.errors import DuplicateKeyError
+from backend.app.database import (
+    get_card_definitions_collection,
+    get_inventory_items_collection,
+    get_inventory_items_archive_collection,
+)
+from backend.app.models import CardDefinitionModel, InventoryItemModel, GradingModel
 from backend.app.config import Config
+from backend.app import archival, duplicates, imgbb, item_events, valuation
+from backend.app.uploads import admit_upload
+from backend.app.versioning import bump_version, CARD_DEFINITIONS, INVENTORY_ITEMS, MARKET_PRICES
+from backend.app.cache import LocalCache
+from backend.app.render_cache import cached_page, dashboard_key
+from backend.app.concurrency import run_concurrently
+from backend.app.queries import Query, definitions_query, DEFINITION_SELECTOR_FIELDS
 
 web_bp = Blueprint('web', __name__)
 
+# Autocomplete values per field, cleared on writes to either collection
+field_values_cache = LocalCache('field_values', [CARD_DEFINITIONS, INVENTORY_ITEMS])
+
+
+def count_items_by_definition(items_collection, definition_ids: list = None) -> dict:
+    """Map definition id -> {status: count} over non-archived items (of definition_ids only, if given)"""
+    counts = {}
+    for row in items_collection.aggregate(InventoryItemModel.status_counts_pipeline(definition_ids)):
+        counts.setdefault(row['_id']['definition'], {})[row['_id']['status']] = row['count']
+    return counts
+
+
+def load_status_tabs(definition_id: ObjectId, include_archived: bool = False) -> tuple:
+    """
+    ({status: count}, {status: first CARD_DETAIL_PAGE_SIZE items}) of a
+    definition's non-archived items, grouped by the database; with
+    include_archived the archive tier's items follow the hot ones
+    """
+    per_page = Config.CARD_DETAIL_PAGE_SIZE
+    pipeline = InventoryItemModel.status_tabs_pipeline(definition_id, per_page)
+    collections = [get_inventory_items_collection()]
+    if include_archived:
+        collections.append(get_inventory_items_archive_collection())
+
+    counts = {status: 0 for status in InventoryItemModel.STATUSES}
+    items = {status: [] for status in InventoryItemModel.STATUSES}
+    for collection in collections:
+        tabs = next(iter(collection.aggregate(pipeline)), {})
+        for row in tabs.get('counts', []):
+            if row['_id'] in counts:
+                counts[row['_id']] += row['count']
+        for status in InventoryItemModel.STATUSES:
+            items[status].extend(tabs.get(status, [])[:per_page - len(items[status])])
+    return counts, items
+
 
 @web_bp.route('/')
+@cached_page(CARD_DEFINITIONS, INVENTORY_ITEMS, MARKET_PRICES, key=dashboard_key)
 def index():
     """Dashboard page"""
     collection = get_card_definitions_collection()
     items_collection = get_inventory_items_collection()
 
-    # Build filter - exclude archived
-    filter_query = {'archived': {'$ne': True}}
-
-    # Text search
-    search_query = request.args.get('q', '')
-    if search_query:
-        filter_query.update(CardDefinitionModel.get_search_filter(search_query))
-
-    # Filter by card type
-    card_type = request.args.get('type', '')
-    if card_type:
-        filter_query['card_type'] = card_type
-
-    # Filter by brand
-    brand = request.args.get('brand', '')
-    if brand:
-        filter_query['brand'] = brand
-
-    # Filter by series
-    series = request.args.get('series', '')
-    if series:
-        filter_query['series'] = series
-
-    # Filter by year
-    year = request.args.get('year', '')
-    if year:
-        filter_query['year'] = year
-
-    # Filter by language (pokemon-specific)
-    language = request.args.get('language', '')
-    if language:
-        filter_query['language'] = language
-
-    # Filter by era (pokemon-specific)
-    era = request.args.get('era', '')
-    if era:
-        filter_query['era'] = era
-
-    # Filter by player/pokemon name
-    name = request.args.get('name', '')
-    if name:
-        if card_type == 'sport':
-            filter_query['player_name'] = {'$regex': name, '$options': 'i'}
-        elif card_type == 'pokemon':
-            filter_query['pokemon_name'] = {'$regex': name, '$options': 'i'}
-        else:
-            # If no type specified, search both
-            filter_query['$or'] = [
-                {'player_name': {'$regex': name, '$options': 'i'}},
-                {'pokemon_name': {'$regex': name, '$options': 'i'}}
-            ]
-
-    # Get all non-archived definitions
-    definitions = list(collection.find(filter_query))
+    # Filters from the query string (archived definitions excluded)
+    query = definitions_query(
+        q=request.args.get('q', ''),
+        card_type=request.args.get('type', ''),
+        brand=request.args.get('brand', ''),
+        series=request.args.get('series', ''),
+        year=request.args.get('year', ''),
+        language=request.args.get('language', ''),
+        era=request.args.get('era', ''),
+        name=request.args.get('name', ''),
+    )
+    # A filtered view only counts the items of the definitions it shows
+    filtered = bool(query.filter)
+    query.not_archived()
+    # The add inventory modal only renders a few fields of each definition
+    selector_query = Query().not_archived().project(*DEFINITION_SELECTOR_FIELDS)
+
+    if Config.ASYNC_DB:
+        # Definitions, modal list and counts run concurrently on the async client
+        from backend.app.async_db import AsyncDatabaseConnection, load_dashboard
+        definitions, all_definitions, counts_by_definition, archived_sold = AsyncDatabaseConnection.run(
+            load_dashboard(query.filter, selector_query.projection, filtered)
+        )
+    elif filtered:
+        definitions, all_definitions = run_concurrently(
+            lambda: query.find(collection),
+            lambda: selector_query.find(collection),
+        )
+        definition_ids = [definition['_id'] for definition in definitions]
+        counts_by_definition, archived_sold = run_concurrently(
+            lambda: count_items_by_definition(items_collection, definition_ids),
+            lambda: archival.sold_counts(definition_ids=definition_ids),
+        )
+    else:
+        # The queries are independent; run them on the shared pool
+        definitions, all_definitions, counts_by_definition, archived_sold = run_concurrently(
+            # Definitions matching the filters
+            lambda: query.find(collection),
+            # All non-archived definitions for the add inventory modal
+            lambda: selector_query.find(collection),
+            # Non-archived item counts by definition and status
+            lambda: count_items_by_definition(items_collection),
+            # Sold items moved to the archive tier
+            archival.sold_counts,
+        )
 
     # Add inventory counts to each definition
     for definition in definitions:
-        definition_id = definition['_id']
-
-        # Aggregate counts by status (exclude archived items)
-        pipeline = [
-            {'$match': {
-                'card_definition_id': definition_id,
-                'archived': {'$ne': True}
-            }},
-            {'$group': {
-                '_id': '$status',
-                'count': {'$sum': 1}
-            }}
-        ]
-
-        status_counts = list(items_collection.aggregate(pipeline))
-
-        # Build counts object
         counts = {
             'in_stock': 0,
             'shipping': 0,
@@ -97,20 +119,19 @@ def index():
             'sold': 0
         }
 
-        for item in status_counts:
-            status = item['_id']
+        for status, count in counts_by_definition.get(definition['_id'], {}).items():
             if status in counts:
-                counts[status] = item['count']
+                counts[status] = count
+        counts['sold'] += archived_sold.get(definition['_id'], 0)
 
         definition['counts'] = counts
 
-    # Get all non-archived definitions for the add inventory modal
-    all_definitions = list(collection.find({'archived': {'$ne': True}}))
-
-    return render_template('dashboard.html', cards=definitions, all_definitions=all_definitions)
+    return render_template('dashboard.html', cards=definitions, all_definitions=all_definitions,
+                           valuation=valuation.portfolio_valuation())
 
 
 @web_bp.route('/definitions/create', methods=['POST'])
+@admit_upload
 def create_definition():
     """Create a new card definition"""
     try:
@@ -134,18 +155,21 @@ def create_definition():
             data['language'] = request.form.get('language', '')
             data['era'] = request.form.get('era', '')
 
+        # Refuse likely duplicates (before uploading the image)
+        if not request.form.get('allow_duplicate'):
+            matches = duplicates.find_duplicates(data, limit=3)
+            if matches:
+                existing = '; '.join(duplicates.describe(match['definition']) for match in matches)
+                flash(f'Looks like a duplicate of: {existing}. Tick "Create anyway" to add it regardless.', 'error')
+                return redirect(url_for('web.index'))
+
         # Handle image upload
         if 'image' in request.files:
             image = request.files['image']
             if image.filename:
                 # Upload to ImgBB
                 image_data = base64.b64encode(image.read()).decode('utf-8')
-                imgbb_url = 'https://api.imgbb.com/1/upload'
-                payload = {
-                    'key': Config.IMGBB_API_KEY,
-                    'image': image_data,
-                }
-                response = requests.post(imgbb_url, data=payload)
+                response = imgbb.upload_image(image_data)
                 if response.status_code == 200:
                     response_data = response.json()
                     if response_data.get('success'):
@@ -166,6 +190,7 @@ def create_definition():
         doc = CardDefinitionModel.create_document(data)
         collection = get_card_definitions_collection()
         collection.insert_one(doc)
+        bump_version(CARD_DEFINITIONS)
 
         flash('Card definition created successfully!', 'success')
     except Exception as e:
@@ -175,6 +200,7 @@ def create_definition():
 
 
 @web_bp.route('/inventory/create', methods=['POST'])
+@admit_upload
 def create_inventory():
     """Create a new inventory item"""
     try:
@@ -199,16 +225,11 @@ def create_inventory():
                 try:
                     # Upload to ImgBB
                     image_data = base64.b64encode(image.read()).decode('utf-8')
-                    imgbb_url = 'https://api.imgbb.com/1/upload'
 
                     if not Config.IMGBB_API_KEY:
                         flash('ImgBB API key is not configured', 'error')
                     else:
-                        payload = {
-                            'key': Config.IMGBB_API_KEY,
-                            'image': image_data,
-                        }
-                        response = requests.post(imgbb_url, data=payload)
+                        response = imgbb.upload_image(image_data)
 
                         if response.status_code == 200:
                             response_data = response.json()
@@ -241,8 +262,8 @@ def create_inventory():
             return redirect(url_for('web.index'))
 
         doc = InventoryItemModel.create_document(data)
-        collection = get_inventory_items_collection()
-        collection.insert_one(doc)
+        item_events.create_item(doc)
+        bump_version(INVENTORY_ITEMS)
 
         flash('Inventory item added successfully!', 'success')
 
@@ -251,6 +272,8 @@ def create_inventory():
             card_id = request.form.get('card_definition_id')
             return redirect(url_for('web.card_detail', card_id=card_id))
 
+    except DuplicateKeyError:
+        flash('Error: custom ID is already used by another item', 'error')
     except Exception as e:
         flash(f'Error: {str(e)}', 'error')
 
@@ -258,6 +281,7 @@ def create_inventory():
 
 
 @web_bp.route('/inventory/update/<item_id>', methods=['POST'])
+@admit_upload
 def update_inventory(item_id):
     """Update an inventory item"""
     try:
@@ -310,12 +334,7 @@ def update_inventory(item_id):
                 try:
                     # Upload to ImgBB
                     image_data = base64.b64encode(image.read()).decode('utf-8')
-                    imgbb_url = 'https://api.imgbb.com/1/upload'
-                    payload = {
-                        'key': Config.IMGBB_API_KEY,
-                        'image': image_data,
-                    }
-                    response = requests.post(imgbb_url, data=payload)
+                    response = imgbb.upload_image(image_data)
 
                     if response.status_code == 200:
                         response_data = response.json()
@@ -341,41 +360,8 @@ def update_inventory(item_id):
 
         # Handle grading history if status is not sold
         if data['status'] != 'sold':
-            grading = []
-            # Parse grading entries from form data
-            # Form fields come as grading[0][type], grading[0][fee], etc.
-            grading_indices = set()
-            for key in request.form.keys():
-                if key.startswith('grading['):
-                    # Extract index from grading[0][field]
-                    index = key.split('[')[1].split(']')[0]
-                    grading_indices.add(index)
-
-            # Build grading array
-            for index in sorted(grading_indices):
-                grading_entry = {}
-                grading_type = request.form.get(f'grading[{index}][type]', '')
-                fee = request.form.get(f'grading[{index}][fee]', '')
-                date_submitted = request.form.get(f'grading[{index}][date_submitted]', '')
-                date_returned = request.form.get(f'grading[{index}][date_returned]', '')
-                result = request.form.get(f'grading[{index}][result]', '')
-
-                # Only add entry if at least one field is filled
-                if grading_type or fee or date_submitted or date_returned or result:
-                    if grading_type:
-                        grading_entry['type'] = grading_type
-                    if fee:
-                        grading_entry['fee'] = float(fee)
-                    if date_submitted:
-                        grading_entry['date_submitted'] = date_submitted
-                    if date_returned:
-                        grading_entry['date_returned'] = date_returned
-                    if result:
-                        grading_entry['result'] = result
-                    grading.append(grading_entry)
-
             # Set grading array (replace existing)
-            data['grading'] = grading
+            data['grading'] = GradingModel.parse_form(request.form)
 
         # Handle disposition if status is sold
         if data['status'] == 'sold':
@@ -396,7 +382,8 @@ def update_inventory(item_id):
             return redirect(url_for('web.index'))
 
         update_data = InventoryItemModel.update_document(existing, data)
-        collection.update_one({'_id': ObjectId(item_id)}, {'$set': update_data})
+        if item_events.update_item(existing, update_data):
+            bump_version(INVENTORY_ITEMS)
 
         flash('Inventory item updated successfully!', 'success')
 
@@ -405,6 +392,8 @@ def update_inventory(item_id):
         if card_id:
             return redirect(url_for('web.card_detail', card_id=card_id))
 
+    except DuplicateKeyError:
+        flash('Error: custom ID is already used by another item', 'error')
     except Exception as e:
         flash(f'Error: {str(e)}', 'error')
 
@@ -412,8 +401,13 @@ def update_inventory(item_id):
 
 
 @web_bp.route('/card/<card_id>')
+@cached_page(CARD_DEFINITIONS, INVENTORY_ITEMS,
+             key=lambda card_id: (card_id, request.args.get('include_archived') == 'true'))
 def card_detail(card_id):
-    """Card detail page with edit capability"""
+    """
+    Card detail page with edit capability
+    include_archived=true also lists sales moved to the archive tier
+    """
     try:
         # Get card definition
         collection = get_card_definitions_collection()
@@ -423,27 +417,13 @@ def card_detail(card_id):
             flash('Card not found', 'error')
             return redirect(url_for('web.index'))
 
-        # Get all inventory items for this card (non-archived)
-        items_collection = get_inventory_items_collection()
-        all_items = list(items_collection.find({
-            'card_definition_id': ObjectId(card_id),
-            'archived': {'$ne': True}
-        }))
-
-        # Group items by status
-        inventory_by_status = {
-            'in_stock': [],
-            'shipping': [],
-            'grading': [],
-            'sold': []
-        }
-
-        for item in all_items:
-            status = item.get('status', 'in_stock')
-            if status in inventory_by_status:
-                inventory_by_status[status].append(item)
+        # Per-status counts and the first page of each tab (non-archived)
+        include_archived = request.args.get('include_archived') == 'true'
+        status_counts, inventory_by_status = load_status_tabs(ObjectId(card_id), include_archived)
 
-        return render_template('card_detail.html', card=card, inventory_by_status=inventory_by_status)
+        return render_template('card_detail.html', card=card, inventory_by_status=inventory_by_status,
+                               status_counts=status_counts, include_archived=include_archived,
+                               archive_enabled=Config.ARCHIVE_SOLD_AFTER_MONTHS > 0)
 
     except Exception as e:
         flash(f'Error: {str(e)}', 'error')
@@ -451,6 +431,7 @@ def card_detail(card_id):
 
 
 @web_bp.route('/definitions/update/<definition_id>', methods=['POST'])
+@admit_upload
 def update_definition(definition_id):
     """Update an existing card definition"""
     try:
@@ -469,7 +450,7 @@ def update_definition(definition_id):
         if request.form.get('card_type'):
             data['card_type'] = request.form.get('card_type')
         if request.form.get('year'):
-            data['year'] = request.form.get('year')
+            data['year'] = CardDefinitionModel.normalize_year(request.form.get('year'))
         if request.form.get('brand'):
             data['brand'] = request.form.get('brand')
 
@@ -499,12 +480,7 @@ def update_definition(definition_id):
                 try:
                     # Upload to ImgBB
                     image_data = base64.b64encode(image.read()).decode('utf-8')
-                    imgbb_url = 'https://api.imgbb.com/1/upload'
-                    payload = {
-                        'key': Config.IMGBB_API_KEY,
-                        'image': image_data,
-                    }
-                    response = requests.post(imgbb_url, data=payload)
+                    response = imgbb.upload_image(image_data)
 
                     if response.status_code == 200:
                         response_data = response.json()
@@ -521,10 +497,12 @@ def update_definition(definition_id):
 
         # Update in database
         if data:
+            data['updated_at'] = datetime.utcnow()
             collection.update_one(
                 {'_id': ObjectId(definition_id)},
                 {'$set': data}
             )
+            bump_version(CARD_DEFINITIONS)
 
         if not image_uploaded:
             flash('Card definition updated successfully!', 'success')
@@ -543,8 +521,9 @@ def archive_definition(definition_id):
         collection = get_card_definitions_collection()
         result = collection.update_one(
             {'_id': ObjectId(definition_id)},
-            {'$set': {'archived': True}}
+            {'$set': {'archived': True, 'updated_at': datetime.utcnow()}}
         )
+        bump_version(CARD_DEFINITIONS)
 
         if result.matched_count > 0:
             return {'success': True}, 200
@@ -559,13 +538,8 @@ def archive_definition(definition_id):
 def delete_inventory_image(item_id):
     """Delete the image from an inventory item"""
     try:
-        collection = get_inventory_items_collection()
-        result = collection.update_one(
-            {'_id': ObjectId(item_id)},
-            {'$unset': {'item_image_url': ''}}
-        )
-
-        if result.modified_count > 0:
+        if item_events.unset_fields(item_id, 'item_image_url'):
+            bump_version(INVENTORY_ITEMS)
             return {'success': True, 'message': 'Image deleted successfully'}, 200
         else:
             return {'success': False, 'error': 'Item not found or no image to delete'}, 404
@@ -578,13 +552,8 @@ def delete_inventory_image(item_id):
 def archive_inventory(item_id):
     """Archive (soft delete) an inventory item"""
     try:
-        collection = get_inventory_items_collection()
-        result = collection.update_one(
-            {'_id': ObjectId(item_id)},
-            {'$set': {'archived': True}}
-        )
-
-        if result.matched_count > 0:
+        if item_events.archive_item(item_id):
+            bump_version(INVENTORY_ITEMS)
             return {'success': True}, 200
         else:
             return {'success': False, 'error': 'Item not found'}, 404
@@ -623,19 +592,30 @@ def get_field_values(field_name):
 
         collection_name, db_field = allowed_fields[field_name]
 
-        if collection_name == 'card_definitions':
-            collection = get_card_definitions_collection()
-        else:
-            collection = get_inventory_items_collection()
+        def load_values():
+            if collection_name == 'card_definitions':
+                collection = get_card_definitions_collection()
+            else:
+                collection = get_inventory_items_collection()
+
+            # Get distinct values, excluding archived items
+            values = Query().not_archived().distinct(collection, db_field)
 
-        # Get distinct values, excluding archived items
-        values = collection.distinct(db_field, {'archived': {'$ne': True}})
+            # Filter out empty/null values and sort
+            values = [v for v in values if v and str(v).strip()]
+            return sorted(set(values))
 
-        # Filter out empty/null values and sort
-        values = [v for v in values if v and str(v).strip()]
-        values = sorted(set(values))
+        values = field_values_cache.get_or_set(field_name, load_values)
 
         return {'values': values}, 200
 
     except Exception as e:
         return {'error': str(e)}, 500
+
+
+@web_bp.route('/sw.js')
+def service_worker():
+    """Offline service worker, served from the root so its scope covers every page"""
+    response = send_from_directory(current_app.static_folder, 'js/sw.js', mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
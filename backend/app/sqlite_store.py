@@ -0,0 +1,1241 @@
+"""
+Embedded document store on SQLite (JSON1) for single-node deployments
+
+Selected with DATABASE_BACKEND=sqlite. Each collection is a table of
+(id, doc) rows holding the document as JSON; ObjectIds and datetimes are
+stored as {"$oid": ...} / {"$date": ...} so they round-trip and compare in
+order. create_index() builds SQLite expression indexes on json_extract(),
+and filters on indexed top-level fields (and _id) are pushed down into SQL;
+the full MongoDB filter is then applied in Python, so results match what
+the routes get from MongoDB for the operators and pipeline stages they use.
+An indexed field that has held an array (multikey, recorded in _multikey)
+is left to the Python filter, as the expression index only sees scalars.
+
+Connections are per thread and per process (safe across gunicorn forks);
+the database runs in WAL mode so workers read while one writes.
+"""
+
+import copy
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from functools import cmp_to_key
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+)
+
+DUPLICATE_KEY = 11000
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+_PUSHABLE = (str, int, float, ObjectId, datetime)
+_RANGE_OPERATORS = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+
+
+# Encoding
+
+def _normalize_datetime(value: datetime) -> datetime:
+    """Naive UTC with millisecond precision, as MongoDB stores it"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def _encode(value):
+    if isinstance(value, ObjectId):
+        return {'$oid': str(value)}
+    if isinstance(value, datetime):
+        return {'$date': _normalize_datetime(value).strftime(DATE_FORMAT)}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if len(value) == 1:
+            if '$oid' in value:
+                return ObjectId(value['$oid'])
+            if '$date' in value:
+                return datetime.strptime(value['$date'], DATE_FORMAT)
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _dumps(value) -> str:
+    return json.dumps(_encode(value), separators=(',', ':'))
+
+
+def _sql_value(value):
+    """Parameter comparable with json_extract() of the stored value"""
+    if isinstance(value, (ObjectId, datetime)):
+        return _dumps(value)
+    return value
+
+
+def _row_id(value) -> str:
+    """Primary key text for an _id; ObjectIds sort in creation order"""
+    if isinstance(value, ObjectId):
+        return 'o:' + str(value)
+    if isinstance(value, str):
+        return 's:' + value
+    return 'j:' + _dumps(value)
+
+
+def _json_path(field: str) -> str:
+    return '$' + ''.join('."' + part.replace('"', '""') + '"' for part in field.split('.'))
+
+
+def _partial_filter_sql(expression: dict) -> str:
+    """
+    WHERE clause of a partial index (values are inlined: SQLite doesn't bind
+    parameters in CREATE INDEX). Supports $exists and comparisons with string
+    or number literals.
+    """
+    clauses = []
+    for field, condition in expression.items():
+        path = _json_path(field)
+        column = f"json_extract(doc, '{path}')"
+        operators = condition if isinstance(condition, dict) and condition and \
+            all(key.startswith('$') for key in condition) else {'$eq': condition}
+        for op, arg in operators.items():
+            sql_op = '=' if op == '$eq' else _RANGE_OPERATORS.get(op)
+            if op == '$exists' and arg:
+                clauses.append(f'{column} IS NOT NULL')
+            elif sql_op and isinstance(arg, str):
+                literal = "'" + arg.replace("'", "''") + "'"
+                clauses.append(f"json_type(doc, '{path}') = 'text' AND {column} {sql_op} {literal}")
+            elif sql_op and isinstance(arg, (int, float)) and not isinstance(arg, bool):
+                clauses.append(f"json_type(doc, '{path}') IN ('integer', 'real') AND {column} {sql_op} {arg!r}")
+            else:
+                raise NotImplementedError(f'Unsupported partialFilterExpression condition on {field}: {op}')
+    return ' AND '.join(clauses) or '1'
+
+
+# Field access
+
+_MISSING = object()
+
+
+def _get_path(doc, field: str):
+    """Value at a dotted path (no array traversal), or _MISSING"""
+    current = doc
+    for part in field.split('.'):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+            current = current[int(part)]
+        else:
+            return _MISSING
+    return current
+
+
+def _values(doc, field: str) -> list:
+    """
+    Candidate values for a filter on a dotted path, traversing arrays the
+    way MongoDB does: arrays contribute both themselves and their elements
+    """
+    current = [doc]
+    for part in field.split('.'):
+        found = []
+        for value in current:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    found.append(value[int(part)])
+                for element in value:
+                    if isinstance(element, dict) and part in element:
+                        found.append(element[part])
+        current = found
+    result = []
+    for value in current:
+        result.append(value)
+        if isinstance(value, list):
+            result.extend(value)
+    return result
+
+
+def _set_path(doc: dict, field: str, value):
+    parts = field.split('.')
+    current = doc
+    for part in parts[:-1]:
+        if isinstance(current, list) and part.isdigit():
+            current = current[int(part)]
+            continue
+        if not isinstance(current.get(part), (dict, list)):
+            current[part] = {}
+        current = current[part]
+    if isinstance(current, list) and parts[-1].isdigit():
+        index = int(parts[-1])
+        current.extend([None] * (index + 1 - len(current)))
+        current[index] = value
+    else:
+        current[parts[-1]] = value
+
+
+def _unset_path(doc: dict, field: str):
+    parts = field.split('.')
+    parent = _get_path(doc, '.'.join(parts[:-1])) if len(parts) > 1 else doc
+    if isinstance(parent, dict):
+        parent.pop(parts[-1], None)
+    elif isinstance(parent, list) and parts[-1].isdigit() and int(parts[-1]) < len(parent):
+        parent[int(parts[-1])] = None
+
+
+# Comparison (BSON type order)
+
+def _type_rank(value) -> int:
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _compare(a, b) -> int:
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 1:
+        return 0
+    if rank_a in (4, 5):
+        a, b = _dumps(a), _dumps(b)
+    return (a > b) - (a < b)
+
+
+def _comparable(a, b) -> bool:
+    return _type_rank(a) == _type_rank(b) and a is not _MISSING
+
+
+def _equal(a, b) -> bool:
+    if isinstance(b, re.Pattern):
+        return isinstance(a, str) and b.search(a) is not None
+    return _type_rank(a) == _type_rank(b) and _compare(a, b) == 0
+
+
+# Query matching
+
+_TYPE_ALIASES = {
+    'double': (float,), 1: (float,), 'string': (str,), 2: (str,), 'object': (dict,), 3: (dict,),
+    'array': (list,), 4: (list,), 'objectId': (ObjectId,), 7: (ObjectId,), 'bool': (bool,), 8: (bool,),
+    'date': (datetime,), 9: (datetime,), 'null': (type(None),), 10: (type(None),),
+    'int': (int,), 16: (int,), 'long': (int,), 18: (int,), 'number': (int, float),
+}
+
+
+def _regex(pattern, options: str = '') -> re.Pattern:
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    if hasattr(pattern, 'try_compile'):  # bson.regex.Regex
+        return pattern.try_compile()
+    flags = 0
+    for option, flag in (('i', re.IGNORECASE), ('m', re.MULTILINE), ('s', re.DOTALL), ('x', re.VERBOSE)):
+        if option in (options or ''):
+            flags |= flag
+    return re.compile(pattern, flags)
+
+
+def _match_operator(candidates: list, present: bool, op: str, arg, condition: dict) -> bool:
+    if op == '$eq':
+        return _match_equality(candidates, present, arg)
+    if op == '$ne':
+        return not _match_equality(candidates, present, arg)
+    if op in ('$gt', '$gte', '$lt', '$lte'):
+        wanted = {'$gt': (1,), '$gte': (0, 1), '$lt': (-1,), '$lte': (-1, 0)}[op]
+        return any(_comparable(value, arg) and _compare(value, arg) in wanted for value in candidates)
+    if op == '$in':
+        return any(_match_equality(candidates, present, value) for value in arg)
+    if op == '$nin':
+        return not any(_match_equality(candidates, present, value) for value in arg)
+    if op == '$exists':
+        return present == bool(arg)
+    if op == '$regex':
+        pattern = _regex(arg, condition.get('$options', ''))
+        return any(isinstance(value, str) and pattern.search(value) for value in candidates)
+    if op == '$options':
+        return True
+    if op == '$type':
+        types = tuple(t for name in (arg if isinstance(arg, list) else [arg]) for t in _TYPE_ALIASES.get(name, ()))
+        return any(
+            isinstance(value, types) and not (isinstance(value, bool) and bool not in types)
+            for value in candidates
+        )
+    if op == '$size':
+        return any(isinstance(value, list) and len(value) == arg for value in candidates)
+    if op == '$all':
+        return all(_match_equality(candidates, present, value) for value in arg)
+    if op == '$elemMatch':
+        operator_only = all(key.startswith('$') for key in arg)
+        for value in candidates:
+            if not isinstance(value, list):
+                continue
+            for element in value:
+                if operator_only:
+                    if _match_condition([element], True, arg):
+                        return True
+                elif isinstance(element, dict) and matches(element, arg):
+                    return True
+        return False
+    if op == '$not':
+        if isinstance(arg, dict):
+            return not _match_condition(candidates, present, arg)
+        return not _match_operator(candidates, present, '$regex', arg, {})
+    if op == '$mod':
+        divisor, remainder = arg
+        return any(
+            isinstance(value, (int, float)) and not isinstance(value, bool) and value % divisor == remainder
+            for value in candidates
+        )
+    raise OperationFailure(f"Unsupported query operator: {op}")
+
+
+def _match_equality(candidates: list, present: bool, value) -> bool:
+    if value is None:
+        return not present or any(candidate is None for candidate in candidates)
+    if isinstance(value, re.Pattern) or hasattr(value, 'try_compile'):
+        pattern = _regex(value)
+        return any(isinstance(candidate, str) and pattern.search(candidate) for candidate in candidates)
+    return any(_equal(candidate, value) for candidate in candidates)
+
+
+def _match_condition(candidates: list, present: bool, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+        return all(_match_operator(candidates, present, op, arg, condition) for op, arg in condition.items())
+    return _match_equality(candidates, present, condition)
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """Whether doc satisfies a MongoDB query filter"""
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$nor':
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$expr':
+            if not _truthy(_evaluate(condition, doc)):
+                return False
+        elif key.startswith('$'):
+            raise OperationFailure(f"Unsupported query operator: {key}")
+        else:
+            candidates = _values(doc, key)
+            present = bool(candidates) or _get_path(doc, key) is not _MISSING
+            if not _match_condition(candidates, present, condition):
+                return False
+    return True
+
+
+# Projection
+
+def _project(doc: dict, projection) -> dict:
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get('_id', 1)
+    fields = {key: value for key, value in projection.items() if key != '_id'}
+    # Exclusions only ({'_id': 0} alone excludes too)
+    if all(not value for value in fields.values()) and (fields or not include_id):
+        result = copy.deepcopy(doc)
+        for field in fields:
+            _unset_path(result, field)
+        if not include_id:
+            result.pop('_id', None)
+        return result
+
+    result = {}
+    if include_id and '_id' in doc:
+        result['_id'] = doc['_id']
+    for field in fields:
+        value = _get_path(doc, field)
+        if value is not _MISSING:
+            _set_path(result, field, copy.deepcopy(value))
+    return result
+
+
+# Updates
+
+def _apply_update(doc: dict, update: dict, inserting: bool = False) -> dict:
+    if not any(key.startswith('$') for key in update):
+        replacement = copy.deepcopy(update)
+        replacement['_id'] = doc.get('_id', replacement.get('_id'))
+        return replacement
+
+    doc = copy.deepcopy(doc)
+    for op, fields in update.items():
+        for field, value in fields.items():
+            current = _get_path(doc, field)
+            if op == '$set' or (op == '$setOnInsert' and inserting):
+                _set_path(doc, field, copy.deepcopy(value))
+            elif op == '$setOnInsert':
+                continue
+            elif op == '$unset':
+                _unset_path(doc, field)
+            elif op == '$inc':
+                _set_path(doc, field, (0 if current is _MISSING else current) + value)
+            elif op in ('$min', '$max'):
+                order = 0 if current is _MISSING else _compare(value, current)
+                if current is _MISSING or (order < 0 if op == '$min' else order > 0):
+                    _set_path(doc, field, value)
+            elif op == '$currentDate':
+                _set_path(doc, field, _normalize_datetime(datetime.utcnow()))
+            elif op in ('$push', '$addToSet'):
+                array = [] if current is _MISSING else current
+                if not isinstance(array, list):
+                    raise OperationFailure(f"Cannot apply {op} to non-array field {field}")
+                items = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                for item in items:
+                    if op == '$push' or not any(_equal(existing, item) for existing in array):
+                        array.append(copy.deepcopy(item))
+                _set_path(doc, field, array)
+            elif op == '$pull':
+                if isinstance(current, list):
+                    if isinstance(value, dict):
+                        kept = [item for item in current if not (
+                            matches(item, value) if isinstance(item, dict) and not all(k.startswith('$') for k in value)
+                            else _match_condition([item], True, value)
+                        )]
+                    else:
+                        kept = [item for item in current if not _equal(item, value)]
+                    _set_path(doc, field, kept)
+            elif op == '$rename':
+                if current is not _MISSING:
+                    _unset_path(doc, field)
+                    _set_path(doc, value, current)
+            else:
+                raise OperationFailure(f"Unsupported update operator: {op}")
+    return doc
+
+
+def _upsert_seed(query: dict) -> dict:
+    """Fields an upsert copies from equality conditions in the filter"""
+    doc = {}
+    for key, condition in (query or {}).items():
+        if key.startswith('$'):
+            continue
+        if isinstance(condition, dict) and any(op.startswith('$') for op in condition):
+            if '$eq' in condition:
+                _set_path(doc, key, condition['$eq'])
+            continue
+        _set_path(doc, key, copy.deepcopy(condition))
+    return doc
+
+
+# Aggregation expressions
+
+def _truthy(value) -> bool:
+    return value not in (None, False, 0, _MISSING)
+
+
+def _evaluate(expr, doc):
+    if isinstance(expr, str):
+        if expr.startswith('$$ROOT'):
+            return doc if expr == '$$ROOT' else _field_value(doc, expr[7:])
+        if expr.startswith('$'):
+            return _field_value(doc, expr[1:])
+        return expr
+    if isinstance(expr, list):
+        return [_evaluate(item, doc) for item in expr]
+    if isinstance(expr, dict):
+        if len(expr) == 1:
+            op, arg = next(iter(expr.items()))
+            if op.startswith('$'):
+                return _evaluate_operator(op, arg, doc)
+        return {key: _evaluate(value, doc) for key, value in expr.items()}
+    return expr
+
+
+def _field_value(doc, field: str):
+    """Value of a field path in an expression; arrays map over their elements"""
+    current = doc
+    for part in field.split('.'):
+        if isinstance(current, list):
+            current = [item.get(part) for item in current if isinstance(item, dict) and part in item]
+        elif isinstance(current, dict):
+            current = current.get(part)
+        else:
+            return None
+    return current
+
+
+def _arithmetic(op, values):
+    if any(value is None for value in values):
+        return None
+    a, b = values
+    if op == '$subtract':
+        if isinstance(a, datetime) and isinstance(b, datetime):
+            return int((a - b).total_seconds() * 1000)
+        return a - b
+    if op == '$divide':
+        return a / b
+    if op == '$mod':
+        return a % b
+    raise OperationFailure(op)
+
+
+def _evaluate_operator(op, arg, doc):
+    if op == '$literal':
+        return arg
+    args = arg if isinstance(arg, list) else [arg]
+    if op == '$cond':
+        if isinstance(arg, dict):
+            arg = [arg['if'], arg['then'], arg['else']]
+        return _evaluate(arg[1] if _truthy(_evaluate(arg[0], doc)) else arg[2], doc)
+    if op == '$ifNull':
+        for item in args:
+            value = _evaluate(item, doc)
+            if value is not None:
+                return value
+        return None
+    values = [_evaluate(item, doc) for item in args]
+    if op in ('$subtract', '$divide', '$mod'):
+        return _arithmetic(op, values)
+    if op == '$add':
+        if any(value is None for value in values):
+            return None
+        return sum(values)
+    if op == '$multiply':
+        if any(value is None for value in values):
+            return None
+        result = 1
+        for value in values:
+            result *= value
+        return result
+    if op in ('$sum', '$avg', '$min', '$max'):
+        numbers = values[0] if len(values) == 1 and isinstance(values[0], list) else values
+        return _accumulate_values(op, numbers)
+    if op in ('$eq', '$ne', '$gt', '$gte', '$lt', '$lte'):
+        result = _compare(values[0], values[1])
+        return {'$eq': result == 0, '$ne': result != 0, '$gt': result > 0, '$gte': result >= 0,
+                '$lt': result < 0, '$lte': result <= 0}[op]
+    if op == '$cmp':
+        return _compare(values[0], values[1])
+    if op == '$and':
+        return all(_truthy(value) for value in values)
+    if op == '$or':
+        return any(_truthy(value) for value in values)
+    if op == '$not':
+        return not _truthy(values[0])
+    if op == '$in':
+        return any(_equal(values[0], item) for item in (values[1] or []))
+    if op == '$size':
+        return len(values[0] or [])
+    if op == '$concat':
+        return None if any(value is None for value in values) else ''.join(values)
+    if op == '$toLower':
+        return (values[0] or '').lower()
+    if op == '$toUpper':
+        return (values[0] or '').upper()
+    if op == '$toString':
+        value = values[0]
+        return None if value is None else (value.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+                                           if isinstance(value, datetime) else str(value))
+    if op == '$round':
+        return None if values[0] is None else round(values[0], values[1] if len(values) > 1 else 0)
+    if op == '$arrayElemAt':
+        array, index = values
+        return array[index] if array and -len(array) <= index < len(array) else None
+    if op == '$first':
+        return values[0][0] if values[0] else None
+    if op == '$last':
+        return values[0][-1] if values[0] else None
+    raise OperationFailure(f"Unsupported aggregation operator: {op}")
+
+
+def _accumulate_values(op, values):
+    numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+    if op == '$sum':
+        return sum(numbers)
+    if op == '$avg':
+        return sum(numbers) / len(numbers) if numbers else None
+    present = [value for value in values if value is not None]
+    if not present:
+        return None
+    ordered = sorted(present, key=cmp_to_key(_compare))
+    return ordered[0] if op == '$min' else ordered[-1]
+
+
+def _group(docs, spec: dict) -> list:
+    key_expr = spec['_id']
+    groups = {}
+    order = []
+    for doc in docs:
+        key = _evaluate(key_expr, doc)
+        group_key = _dumps(key)
+        if group_key not in groups:
+            groups[group_key] = (key, [])
+            order.append(group_key)
+        groups[group_key][1].append(doc)
+
+    results = []
+    for group_key in order:
+        key, members = groups[group_key]
+        row = {'_id': key}
+        for field, accumulator in spec.items():
+            if field == '_id':
+                continue
+            (op, expr), = accumulator.items()
+            if op == '$count':
+                row[field] = len(members)
+                continue
+            values = [_evaluate(expr, member) for member in members]
+            if op in ('$sum', '$avg', '$min', '$max'):
+                row[field] = _accumulate_values(op, values)
+            elif op == '$first':
+                row[field] = values[0] if values else None
+            elif op == '$last':
+                row[field] = values[-1] if values else None
+            elif op == '$push':
+                row[field] = values
+            elif op == '$addToSet':
+                unique = {}
+                for value in values:
+                    unique.setdefault(_dumps(value), value)
+                row[field] = list(unique.values())
+            else:
+                raise OperationFailure(f"Unsupported accumulator: {op}")
+        results.append(row)
+    return results
+
+
+def _sort_key(value, direction: int):
+    """An array sorts by its smallest element ascending and its largest descending"""
+    if value is _MISSING:
+        return None
+    if isinstance(value, list):
+        if not value:
+            return None
+        return sorted(value, key=cmp_to_key(_compare))[0 if direction >= 0 else -1]
+    return value
+
+
+def _sort_docs(docs: list, spec) -> list:
+    items = list(spec.items()) if isinstance(spec, dict) else list(spec)
+
+    def compare(a, b):
+        for field, direction in items:
+            result = _compare(_sort_key(_get_path(a, field), direction), _sort_key(_get_path(b, field), direction))
+            if result:
+                return result if direction >= 0 else -result
+        return 0
+
+    return sorted(docs, key=cmp_to_key(compare))
+
+
+def _project_stage(doc: dict, spec: dict) -> dict:
+    plain = {key: value for key, value in spec.items() if value in (0, 1, True, False)}
+    computed = {key: value for key, value in spec.items() if key not in plain}
+    if plain and not computed and all(not value for value in plain.values()):
+        return _project(doc, plain)
+    result = _project(doc, {**{key: 1 for key, value in plain.items() if value}, '_id': plain.get('_id', 1)})
+    for field, expr in computed.items():
+        _set_path(result, field, _evaluate(expr, doc))
+    return result
+
+
+def run_pipeline(collection, docs, pipeline: list) -> list:
+    """Run aggregation stages over an iterable of documents"""
+    docs = list(docs)
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == '$match':
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == '$group':
+            docs = _group(docs, spec)
+        elif name == '$sort':
+            docs = _sort_docs(docs, spec)
+        elif name == '$limit':
+            docs = docs[:spec]
+        elif name == '$skip':
+            docs = docs[spec:]
+        elif name == '$count':
+            docs = [{spec: len(docs)}] if docs else []
+        elif name == '$unwind':
+            if isinstance(spec, str):
+                spec = {'path': spec}
+            field = spec['path'][1:]
+            keep_empty = spec.get('preserveNullAndEmptyArrays', False)
+            index_field = spec.get('includeArrayIndex')
+            unwound = []
+            for doc in docs:
+                value = _get_path(doc, field)
+                if isinstance(value, list) and value:
+                    for index, element in enumerate(value):
+                        copy_doc = copy.deepcopy(doc)
+                        _set_path(copy_doc, field, element)
+                        if index_field:
+                            copy_doc[index_field] = index
+                        unwound.append(copy_doc)
+                elif keep_empty:
+                    copy_doc = copy.deepcopy(doc)
+                    if isinstance(value, list):
+                        _unset_path(copy_doc, field)
+                    unwound.append(copy_doc)
+                elif value is not _MISSING and value is not None and not isinstance(value, list):
+                    unwound.append(doc)
+            docs = unwound
+        elif name == '$project':
+            docs = [_project_stage(doc, spec) for doc in docs]
+        elif name in ('$addFields', '$set'):
+            updated = []
+            for doc in docs:
+                copy_doc = copy.deepcopy(doc)
+                for field, expr in spec.items():
+                    _set_path(copy_doc, field, _evaluate(expr, doc))
+                updated.append(copy_doc)
+            docs = updated
+        elif name == '$unset':
+            docs = [_project(doc, {field: 0 for field in ([spec] if isinstance(spec, str) else spec)}) for doc in docs]
+        elif name == '$replaceRoot':
+            docs = [_evaluate(spec['newRoot'], doc) for doc in docs]
+        elif name == '$facet':
+            docs = [{field: run_pipeline(collection, docs, sub) for field, sub in spec.items()}]
+        elif name == '$lookup':
+            foreign = collection.database[spec['from']]
+            joined = []
+            for doc in docs:
+                copy_doc = copy.deepcopy(doc)
+                local = _get_path(doc, spec['localField'])
+                local_values = local if isinstance(local, list) else [None if local is _MISSING else local]
+                copy_doc[spec['as']] = list(foreign.find({spec['foreignField']: {'$in': local_values}}))
+                joined.append(copy_doc)
+            docs = joined
+        else:
+            raise OperationFailure(f"Unsupported aggregation stage: {name}")
+    return docs
+
+
+# Storage
+
+class SQLiteClient:
+    """Holds per-thread SQLite connections to one database file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._databases = {}
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_database(self, name: str = None) -> 'SQLiteDatabase':
+        name = name or os.path.splitext(os.path.basename(self.path))[0] or 'main'
+        if name not in self._databases:
+            self._databases[name] = SQLiteDatabase(self, name)
+        return self._databases[name]
+
+    def __getitem__(self, name: str) -> 'SQLiteDatabase':
+        return self.get_database(name)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+
+class SQLiteDatabase:
+    """Collections stored as tables of one SQLite file"""
+
+    def __init__(self, client: SQLiteClient, name: str):
+        self.client = client
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> 'SQLiteCollection':
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = SQLiteCollection(self, name)
+            return self._collections[name]
+
+    def get_collection(self, name: str) -> 'SQLiteCollection':
+        return self[name]
+
+    def with_options(self, **kwargs) -> 'SQLiteDatabase':
+        return self
+
+    def list_collection_names(self) -> list:
+        rows = self.client.connection().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND name NOT IN ('_indexes', '_multikey')"
+        )
+        return [row[0] for row in rows]
+
+    def watch(self, *args, **kwargs):
+        raise NotImplementedError("Change streams are not available on the SQLite backend")
+
+    def command(self, *args, **kwargs):
+        raise NotImplementedError("Database commands are not available on the SQLite backend")
+
+
+class SQLiteCursor:
+    """Lazy find() result supporting sort/skip/limit chaining"""
+
+    def __init__(self, collection: 'SQLiteCollection', filter_query: dict, projection=None):
+        self._collection = collection
+        self._filter = filter_query or {}
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = None) -> 'SQLiteCursor':
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction if direction is not None else 1)]
+        elif isinstance(key_or_list, dict):
+            self._sort = list(key_or_list.items())
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> 'SQLiteCursor':
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> 'SQLiteCursor':
+        self._limit = count
+        return self
+
+    def hint(self, index) -> 'SQLiteCursor':
+        return self
+
+    def batch_size(self, size: int) -> 'SQLiteCursor':
+        return self
+
+    def __iter__(self):
+        docs = self._collection._select(self._filter, self._sort, self._skip, self._limit)
+        return iter([_project(doc, self._projection) for doc in docs])
+
+    def to_list(self, length=None) -> list:
+        docs = list(self)
+        return docs if length is None else docs[:length]
+
+    def close(self):
+        pass
+
+
+class SQLiteCollection:
+    """MongoDB-style collection stored in one SQLite table"""
+
+    def __init__(self, database: SQLiteDatabase, name: str):
+        if not re.fullmatch(r'[A-Za-z0-9_.]+', name):
+            raise ValueError(f"Invalid collection name: {name}")
+        self.database = database
+        self.name = name
+        self._table = '"' + name + '"'
+        self._indexed_fields = None
+        conn = self._conn()
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {self._table} (id TEXT PRIMARY KEY, doc TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS _indexes (collection TEXT, name TEXT, spec TEXT, '
+                     'PRIMARY KEY (collection, name))')
+        conn.execute('CREATE TABLE IF NOT EXISTS _multikey (collection TEXT, field TEXT, '
+                     'PRIMARY KEY (collection, field))')
+
+    def _conn(self) -> sqlite3.Connection:
+        return self.database.client.connection()
+
+    def with_options(self, **kwargs) -> 'SQLiteCollection':
+        return self
+
+    # Query planning
+
+    def _indexed(self) -> set:
+        if self._indexed_fields is None:
+            rows = self._conn().execute('SELECT spec FROM _indexes WHERE collection = ?', (self.name,))
+            fields = set()
+            for (spec,) in rows:
+                fields.update(field for field, _ in json.loads(spec)['key'])
+            self._indexed_fields = fields
+        return self._indexed_fields
+
+    def _multikey(self) -> set:
+        # Not cached: another worker may have stored an array since
+        rows = self._conn().execute('SELECT field FROM _multikey WHERE collection = ?', (self.name,))
+        return {field for (field,) in rows}
+
+    def _mark_multikey(self, conn, doc: dict):
+        for field in self._indexed():
+            if isinstance(doc.get(field), list):
+                conn.execute('INSERT OR IGNORE INTO _multikey (collection, field) VALUES (?, ?)', (self.name, field))
+
+    def _pushdown(self, query: dict) -> tuple[str, list, bool]:
+        """
+        SQL WHERE clause for the conditions on _id and on indexed top-level
+        fields, so SQLite can use the primary key / expression indexes.
+        Returns (clause, params, exact): when exact is False the clause only
+        narrows the scan and the caller must still apply the whole filter.
+        Multikey fields are never pushed down.
+        """
+        clauses, params = [], []
+        exact = True
+        indexed = self._indexed() - self._multikey()
+        for field, condition in (query or {}).items():
+            if field != '_id' and (field.startswith('$') or '.' in field or field not in indexed):
+                exact = False
+                continue
+            if field == '_id':
+                column, convert = 'id', _row_id
+            else:
+                column, convert = f"json_extract(doc, '{_json_path(field)}')", _sql_value
+
+            operators = condition if isinstance(condition, dict) and condition and \
+                all(key.startswith('$') for key in condition) else {'$eq': condition}
+            for op, arg in operators.items():
+                values = arg if op == '$in' and isinstance(arg, list) else [arg]
+                if not all(isinstance(value, _PUSHABLE) and not isinstance(value, bool) for value in values):
+                    exact = False
+                    continue
+                # Numbers also equal JSON booleans in SQLite; recheck those
+                if any(isinstance(value, (int, float)) for value in values):
+                    exact = False
+
+                if op in ('$eq', '$in'):
+                    clauses.append(f"{column} IN ({', '.join('?' * len(values))})" if values else '0')
+                    params.extend(convert(value) for value in values)
+                elif op in _RANGE_OPERATORS:
+                    clauses.append(f'{column} {_RANGE_OPERATORS[op]} ?')
+                    params.append(convert(arg))
+                    # Restrict to the same type so SQLite's cross-type ordering
+                    # can't add rows MongoDB would not match
+                    if isinstance(arg, ObjectId) and field == '_id':
+                        clauses.append("substr(id, 1, 2) = 'o:'")
+                    elif isinstance(arg, (ObjectId, datetime)) and field != '_id':
+                        clauses.append(f"{column} LIKE ?")
+                        params.append('{"$oid":%' if isinstance(arg, ObjectId) else '{"$date":%')
+                    else:
+                        exact = False
+                else:
+                    exact = False
+        return (' AND '.join(clauses) or '1'), params, exact
+
+    def _select(self, query: dict, sort=None, skip: int = 0, limit: int = 0) -> list:
+        where, params, exact = self._pushdown(query)
+        sql = f'SELECT doc FROM {self._table} WHERE {where}'
+        # With the whole filter in SQL, sorting by _id and paging can be too
+        id_sort = sort is None or (len(sort) == 1 and sort[0][0] == '_id')
+        if exact and id_sort:
+            if sort:
+                sql += ' ORDER BY id ' + ('ASC' if sort[0][1] >= 0 else 'DESC')
+            if limit or skip:
+                sql += ' LIMIT ? OFFSET ?'
+                params = params + [limit or -1, skip]
+            return [_decode(json.loads(row[0])) for row in self._conn().execute(sql, params)]
+
+        docs = [_decode(json.loads(row[0])) for row in self._conn().execute(sql, params)]
+        docs = [doc for doc in docs if matches(doc, query)]
+        if sort:
+            docs = _sort_docs(docs, sort)
+        if skip:
+            docs = docs[skip:]
+        if limit:
+            docs = docs[:limit]
+        return docs
+
+    # Reads
+
+    def find(self, filter: dict = None, projection=None, sort=None, skip: int = 0, limit: int = 0,
+             **kwargs) -> SQLiteCursor:
+        cursor = SQLiteCursor(self, filter, projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    def find_one(self, filter=None, projection=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        docs = list(self.find(filter, projection, **kwargs).limit(1))
+        return docs[0] if docs else None
+
+    def count_documents(self, filter: dict, **kwargs) -> int:
+        where, params, exact = self._pushdown(filter)
+        if exact:
+            return self._conn().execute(f'SELECT COUNT(*) FROM {self._table} WHERE {where}', params).fetchone()[0]
+        return len(self._select(filter))
+
+    def estimated_document_count(self) -> int:
+        return self._conn().execute(f'SELECT COUNT(*) FROM {self._table}').fetchone()[0]
+
+    def distinct(self, key: str, filter: dict = None) -> list:
+        values = {}
+        for doc in self._select(filter or {}):
+            for value in _values(doc, key):
+                if not isinstance(value, list):
+                    values.setdefault(_dumps(value), value)
+        return list(values.values())
+
+    def aggregate(self, pipeline: list, **kwargs) -> SQLiteCursor:
+        # A leading $match narrows the scan through the same pushdown as find()
+        query = pipeline[0]['$match'] if pipeline and '$match' in pipeline[0] else {}
+        docs = self._select(query)
+        return iter(run_pipeline(self, docs, pipeline[1:] if query else pipeline))
+
+    # Writes
+
+    def _insert(self, conn, doc: dict):
+        if '_id' not in doc:
+            doc['_id'] = ObjectId()
+        try:
+            conn.execute(f'INSERT INTO {self._table} (id, doc) VALUES (?, ?)', (_row_id(doc['_id']), _dumps(doc)))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} ({e})", DUPLICATE_KEY)
+        self._mark_multikey(conn, doc)
+
+    def _write(self, fn):
+        """Run fn(conn) in an immediate transaction (one writer across workers)"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        self._write(lambda conn: self._insert(conn, document))
+        return InsertOneResult(document['_id'], True)
+
+    def insert_many(self, documents, ordered: bool = True, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+
+        def insert(conn):
+            errors, inserted = [], []
+            for index, doc in enumerate(documents):
+                try:
+                    self._insert(conn, doc)
+                    inserted.append(doc['_id'])
+                except DuplicateKeyError as e:
+                    errors.append({'index': index, 'code': DUPLICATE_KEY, 'errmsg': str(e)})
+                    if ordered:
+                        break
+            return errors, inserted
+
+        errors, inserted = self._write(insert)
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': len(inserted), 'writeConcernErrors': [],
+                                  'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []})
+        return InsertManyResult(inserted, True)
+
+    def _update(self, conn, query: dict, update: dict, upsert: bool, multi: bool,
+                return_document: bool = None, sort=None):
+        where, params, _ = self._pushdown(query)
+        rows = [(row_id, _decode(json.loads(doc))) for row_id, doc in
+                conn.execute(f'SELECT id, doc FROM {self._table} WHERE {where}', params)]
+        targets = [(row_id, doc) for row_id, doc in rows if matches(doc, query)]
+        if sort:
+            order = {id(doc): row_id for row_id, doc in targets}
+            targets = [(order[id(doc)], doc) for doc in _sort_docs([doc for _, doc in targets], sort)]
+        if not multi:
+            targets = targets[:1]
+
+        matched = modified = 0
+        before = after = None
+        for row_id, doc in targets:
+            updated = _apply_update(doc, update)
+            matched += 1
+            if _dumps(updated) != _dumps(doc):
+                modified += 1
+                try:
+                    conn.execute(f'UPDATE {self._table} SET doc = ? WHERE id = ?', (_dumps(updated), row_id))
+                except sqlite3.IntegrityError as e:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} ({e})",
+                                            DUPLICATE_KEY)
+                self._mark_multikey(conn, updated)
+            before, after = doc, updated
+
+        upserted_id = None
+        if not targets and upsert:
+            doc = _apply_update(_upsert_seed(query), update, inserting=True)
+            self._insert(conn, doc)
+            upserted_id = doc['_id']
+            after = doc
+
+        result = {'n': matched or (1 if upserted_id is not None else 0), 'nModified': modified,
+                  'ok': 1.0, 'updatedExisting': bool(matched)}
+        if upserted_id is not None:
+            result['upserted'] = upserted_id
+        return result, before, after
+
+    def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        result, _, _ = self._write(lambda conn: self._update(conn, filter, update, upsert, multi=False))
+        return UpdateResult(result, True)
+
+    def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        result, _, _ = self._write(lambda conn: self._update(conn, filter, update, upsert, multi=True))
+        return UpdateResult(result, True)
+
+    def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self.update_one(filter, replacement, upsert)
+
+    def find_one_and_update(self, filter: dict, update: dict, projection=None, sort=None, upsert: bool = False,
+                            return_document: bool = ReturnDocument.BEFORE, **kwargs):
+        sort = [(sort, 1)] if isinstance(sort, str) else sort
+        _, before, after = self._write(
+            lambda conn: self._update(conn, filter, update, upsert, multi=False, sort=sort)
+        )
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return _project(doc, projection) if doc is not None else None
+
+    def _delete(self, query: dict, multi: bool) -> DeleteResult:
+        def delete(conn):
+            where, params, exact = self._pushdown(query)
+            if exact and multi:
+                return conn.execute(f'DELETE FROM {self._table} WHERE {where}', params).rowcount
+            rows = conn.execute(f'SELECT id, doc FROM {self._table} WHERE {where}', params)
+            ids = [row_id for row_id, doc in rows if matches(_decode(json.loads(doc)), query)]
+            if not multi:
+                ids = ids[:1]
+            for row_id in ids:
+                conn.execute(f'DELETE FROM {self._table} WHERE id = ?', (row_id,))
+            return len(ids)
+
+        return DeleteResult({'n': self._write(delete), 'ok': 1.0}, True)
+
+    def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        return self._delete(filter, multi=False)
+
+    def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        return self._delete(filter, multi=True)
+
+    def bulk_write(self, requests: list, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        """Apply pymongo InsertOne/UpdateOne/UpdateMany/ReplaceOne/DeleteOne/DeleteMany in one transaction"""
+        totals = {'nInserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'nUpserted': 0,
+                  'upserted': [], 'writeErrors': [], 'writeConcernErrors': []}
+
+        def apply(conn):
+            for index, request in enumerate(requests):
+                kind = type(request).__name__
+                try:
+                    if kind == 'InsertOne':
+                        self._insert(conn, request._doc)
+                        totals['nInserted'] += 1
+                    elif kind in ('UpdateOne', 'UpdateMany', 'ReplaceOne'):
+                        result, _, _ = self._update(conn, request._filter, request._doc, bool(request._upsert),
+                                                    multi=kind == 'UpdateMany')
+                        if 'upserted' in result:
+                            totals['nUpserted'] += 1
+                            totals['upserted'].append({'index': index, '_id': result['upserted']})
+                        else:
+                            totals['nMatched'] += result['n']
+                            totals['nModified'] += result['nModified']
+                    elif kind in ('DeleteOne', 'DeleteMany'):
+                        where, params, _ = self._pushdown(request._filter)
+                        rows = conn.execute(f'SELECT id, doc FROM {self._table} WHERE {where}', params)
+                        ids = [row_id for row_id, doc in rows
+                               if matches(_decode(json.loads(doc)), request._filter)]
+                        for row_id in ids[:1] if kind == 'DeleteOne' else ids:
+                            conn.execute(f'DELETE FROM {self._table} WHERE id = ?', (row_id,))
+                            totals['nRemoved'] += 1
+                    else:
+                        raise OperationFailure(f"Unsupported bulk operation: {kind}")
+                except DuplicateKeyError as e:
+                    totals['writeErrors'].append({'index': index, 'code': DUPLICATE_KEY, 'errmsg': str(e)})
+                    if ordered:
+                        break
+
+        self._write(apply)
+        if totals['writeErrors']:
+            raise BulkWriteError(totals)
+        return BulkWriteResult(totals, True)
+
+    # Indexes
+
+    def create_index(self, keys, name: str = None, unique: bool = False, sparse: bool = False, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        keys = list(keys)
+        name = name or '_'.join(f'{field}_{direction}' for field, direction in keys)
+        index_name = f'{self.name}__{name}'.replace('.', '_')
+        expressions = ', '.join(
+            ('id' if field == '_id' else f"json_extract(doc, '{_json_path(field)}')")
+            + (' DESC' if direction == -1 else '')
+            for field, direction in keys
+        )
+        where = ''
+        if kwargs.get('partialFilterExpression'):
+            where = ' WHERE ' + _partial_filter_sql(kwargs['partialFilterExpression'])
+        elif sparse:
+            where = ' WHERE ' + ' AND '.join(
+                f"json_extract(doc, '{_json_path(field)}') IS NOT NULL" for field, _ in keys
+            )
+
+        def create(conn):
+            try:
+                conn.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{index_name}" '
+                             f'ON {self._table} ({expressions}){where}')
+            except sqlite3.IntegrityError as e:
+                raise DuplicateKeyError(f"E11000 duplicate key error creating index {name}: {e}", DUPLICATE_KEY)
+            conn.execute('INSERT OR REPLACE INTO _indexes (collection, name, spec) VALUES (?, ?, ?)',
+                         (self.name, name, json.dumps({'key': keys, 'unique': unique, 'sparse': sparse})))
+            for field, _ in keys:
+                if field != '_id':
+                    conn.execute(f"INSERT OR IGNORE INTO _multikey (collection, field) SELECT ?, ? WHERE EXISTS "
+                                 f"(SELECT 1 FROM {self._table} WHERE json_type(doc, ?) = 'array')",
+                                 (self.name, field, _json_path(field)))
+
+        self._write(create)
+        self._indexed_fields = None
+        return name
+
+    def index_information(self) -> dict:
+        info = {'_id_': {'key': [('_id', 1)]}}
+        for name, spec in self._conn().execute('SELECT name, spec FROM _indexes WHERE collection = ?', (self.name,)):
+            spec = json.loads(spec)
+            info[name] = {'key': [tuple(key) for key in spec['key']], 'unique': spec['unique']}
+        return info
+
+    def list_indexes(self):
+        return iter([{'name': name, **spec} for name, spec in self.index_information().items()])
+
+    def drop_index(self, name: str):
+        def drop(conn):
+            conn.execute(f'DROP INDEX IF EXISTS "{self.name}__{name}"'.replace('.', '_'))
+            conn.execute('DELETE FROM _indexes WHERE collection = ? AND name = ?', (self.name, name))
+        self._write(drop)
+        self._indexed_fields = None
+
+    def drop(self):
+        def drop(conn):
+            conn.execute(f'DROP TABLE IF EXISTS {self._table}')
+            conn.execute('DELETE FROM _indexes WHERE collection = ?', (self.name,))
+            conn.execute('DELETE FROM _multikey WHERE collection = ?', (self.name,))
+            conn.execute(f'CREATE TABLE {self._table} (id TEXT PRIMARY KEY, doc TEXT NOT NULL)')
+        self._write(drop)
+        self._indexed_fields = None
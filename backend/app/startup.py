@@ -0,0 +1,199 @@
+"""
+Startup profiling and warm-up
+
+create_app records how long importing the package and each step of app
+construction took in `profile`. It is printed when STARTUP_PROFILE is on
+and included in the /ready response.
+
+With WARMUP_ENABLED, each worker then warms itself up in a background
+thread, so the first real request doesn't pay for it:
+- opens the database connection (TLS handshake, pool) and ensures indexes
+- compiles every Jinja template, writing bytecode to JINJA_CACHE_DIR so
+  the next cold start loads it instead of compiling
+- primes the filter-option cache and renders the dashboard once (render cache)
+- builds the duplicate-definition index
+- opens the connection to ImgBB
+
+/ready answers 503 until warm-up has finished (an ImgBB failure is only
+reported) and restarts it after a failed run; /health stays a shallow
+liveness check.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from backend.app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """Durations of named startup phases, in order"""
+
+    def __init__(self):
+        self.imports = None
+        self.phases = []
+        self._last = None
+
+    def begin(self):
+        """Start timing app construction (the import time is kept)"""
+        self.phases = []
+        self._last = time.perf_counter()
+
+    def mark(self, name: str):
+        """Record the time since the previous mark (or begin) as phase name"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def report(self) -> dict:
+        phases = ([('imports', self.imports)] if self.imports is not None else []) + self.phases
+        return {
+            'total_ms': round(sum(seconds for _, seconds in phases) * 1000, 1),
+            'phases': [{'name': name, 'ms': round(seconds * 1000, 1)} for name, seconds in phases],
+        }
+
+    def log(self):
+        report = self.report()
+        lines = ', '.join(f"{phase['name']}={phase['ms']}ms" for phase in report['phases'])
+        print(f"Startup took {report['total_ms']}ms (pid {os.getpid()}): {lines}")
+
+
+profile = StartupProfile()
+
+
+class Warmup:
+    """Per-process warm-up state behind /ready"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.state = 'pending'
+        self.steps = {}
+        self.errors = {}
+
+    def start(self, app):
+        """Run the warm-up steps in a background thread (once per process, unless restarted after a failure)"""
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+            if running or (self.state == 'ready' and self._pid == os.getpid()):
+                return
+            self.state, self.steps, self.errors = 'warming', {}, {}
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(app,), name='warmup', daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        failed = False
+        for name, step, required in WARMUP_STEPS:
+            started = time.perf_counter()
+            try:
+                step(app)
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+                self.errors[name] = str(e)
+                failed = failed or required
+            self.steps[name] = round((time.perf_counter() - started) * 1000, 1)
+        self.state = 'failed' if failed else 'ready'
+        logger.info("Warm-up %s in %sms (pid %s)", self.state, round(sum(self.steps.values()), 1), os.getpid())
+
+    @property
+    def ready(self) -> bool:
+        return self.state == 'ready' and self._pid == os.getpid()
+
+    @property
+    def needs_restart(self) -> bool:
+        """Failed, or never started in this process (e.g. inherited across a fork)"""
+        return self.state == 'failed' or self._pid != os.getpid()
+
+    def status(self) -> dict:
+        return {'state': self.state, 'steps_ms': dict(self.steps), 'errors': dict(self.errors)}
+
+
+warmup = Warmup()
+
+
+def _warm_database(app):
+    from backend.app import indexes
+    from backend.app.database import DatabaseConnection
+
+    if Config.DATABASE_BACKEND == 'sqlite':
+        DatabaseConnection.get_db().list_collection_names()
+    else:
+        # Opens a pooled connection (server selection + TLS handshake)
+        DatabaseConnection.get_client().admin.command('ping')
+    if Config.AUTO_CREATE_INDEXES:
+        indexes.ensure_once()
+
+
+def _warm_templates(app):
+    env = app.jinja_env
+    for name in env.list_templates(extensions=['html']):
+        env.get_template(name)
+
+
+def _warm_caches(app):
+    from backend.app.routes.filters import filter_options_cache, compute_filter_options
+
+    filter_options_cache.get_or_set(('', ''), lambda: compute_filter_options('', ''))
+    # Renders the dashboard once, filling the page/fragment caches
+    response = app.test_client().get('/')
+    if response.status_code != 200:
+        raise RuntimeError(f"Dashboard returned {response.status_code}")
+
+
+def _warm_duplicates(app):
+    from backend.app import duplicates
+    duplicates.index.refresh()
+
+
+def _warm_imgbb(app):
+    from backend.app import imgbb
+    imgbb.warm_up()
+
+
+# (name, step(app), whether a failure keeps /ready unhealthy)
+WARMUP_STEPS = [
+    ('database', _warm_database, True),
+    ('templates', _warm_templates, True),
+    ('caches', _warm_caches, True),
+    ('duplicates', _warm_duplicates, False),
+    ('imgbb', _warm_imgbb, False),
+]
+
+
+def init_app(app):
+    """Configure the template bytecode cache, register /ready and start warm-up"""
+    if Config.JINJA_CACHE_DIR:
+        from jinja2 import FileSystemBytecodeCache
+        os.makedirs(Config.JINJA_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(Config.JINJA_CACHE_DIR)
+
+    @app.route('/ready')
+    def ready():
+        if not Config.WARMUP_ENABLED:
+            return {'status': 'ready', 'warmup': 'disabled', 'startup': profile.report()}, 200
+        if warmup.ready:
+            return {'status': 'ready', 'warmup': warmup.status(), 'startup': profile.report()}, 200
+        if warmup.needs_restart:
+            warmup.start(app)
+        return {'status': 'warming', 'warmup': warmup.status()}, 503, {'Retry-After': '1'}
+
+    if Config.WARMUP_ENABLED and not Config.WARMUP_AFTER_FORK:
+        warmup.start(app)
+
+
+def compile_templates(app) -> int:
+    """Write bytecode for every template to JINJA_CACHE_DIR (run at build time)"""
+    _warm_templates(app)
+    return len(app.jinja_env.list_templates(extensions=['html']))
+
+
+if __name__ == '__main__':
+    from backend.app import create_app
+    Config.WARMUP_ENABLED = False
+    count = compile_templates(create_app())
+    print(f"Compiled {count} templates into {Config.JINJA_CACHE_DIR or '(no JINJA_CACHE_DIR set)'}")
@@ -45,8 +45,7 @@ async function loadInventoryItems(cardId) {
     itemsDiv.innerHTML = '<p class="text-sm text-gray-500">Loading...</p>';
 
     try {
-        const response = await fetch(`/api/inventory?definition_id=${cardId}`);
-        const items = await response.json();
+        const items = await OfflineStore.loadItemsForDefinition(cardId);
 
         if (items.length === 0) {
             itemsDiv.innerHTML = '<p class="text-sm text-gray-500">No items yet</p>';
@@ -89,8 +88,7 @@ async function loadInventoryItems(cardId) {
 // Edit Inventory Item
 async function editInventoryItem(itemId) {
     try {
-        const response = await fetch(`/api/inventory/${itemId}`);
-        const item = await response.json();
+        const item = await OfflineStore.loadItem(itemId);
 
         // Populate basic fields
         document.getElementById('edit_item_id').value = item._id;
@@ -0,0 +1,314 @@
+// Offline-first local cache
+//
+// Keeps a copy of card definitions and inventory items in IndexedDB, kept
+// current with delta syncs against /api/sync, so item lookups render from
+// local data without a round trip. Edits made while offline are queued in an
+// outbox and pushed in batches once the connection comes back.
+
+const OFFLINE_SYNC_INTERVAL_MS = 60000;
+
+const OfflineStore = (function () {
+    const DB_NAME = 'card-inventory';
+    const DB_VERSION = 1;
+    const PUSH_BATCH_SIZE = 50;
+
+    let dbPromise = null;
+    let syncing = null;
+
+    function openDb() {
+        if (!('indexedDB' in window)) {
+            return Promise.reject(new Error('IndexedDB not supported'));
+        }
+        if (!dbPromise) {
+            dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(DB_NAME, DB_VERSION);
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    db.createObjectStore('definitions', { keyPath: '_id' });
+                    const items = db.createObjectStore('items', { keyPath: '_id' });
+                    items.createIndex('card_definition_id', 'card_definition_id');
+                    db.createObjectStore('meta');
+                    db.createObjectStore('outbox', { keyPath: 'id', autoIncrement: true });
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return dbPromise;
+    }
+
+    // Run fn(stores...) in one transaction; resolves with fn's result once committed
+    async function withStores(names, mode, fn) {
+        const db = await openDb();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(names, mode);
+            let result;
+            Promise.resolve(fn(...names.map(name => tx.objectStore(name))))
+                .then(value => { result = value; })
+                .catch(reject);
+            tx.oncomplete = () => resolve(result);
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+    }
+
+    function requestResult(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    async function getItem(itemId) {
+        return withStores(['items'], 'readonly', items => requestResult(items.get(itemId)));
+    }
+
+    async function getItemsForDefinition(definitionId) {
+        return withStores(['items'], 'readonly',
+            items => requestResult(items.index('card_definition_id').getAll(definitionId)));
+    }
+
+    async function putItem(item) {
+        return withStores(['items'], 'readwrite', items => requestResult(items.put(item)));
+    }
+
+    // Apply one page of /api/sync changes to the local stores
+    async function applyChanges(page) {
+        return withStores(['definitions', 'items', 'meta'], 'readwrite', (definitions, items, meta) => {
+            if (page.reset) {
+                definitions.clear();
+                items.clear();
+            }
+            (page.changes.definitions || []).forEach(doc => definitions.put(doc));
+            (page.changes.items || []).forEach(doc => items.put(doc));
+            page.tombstones.forEach(tombstone => {
+                (tombstone.collection === 'definitions' ? definitions : items).delete(tombstone._id);
+            });
+            meta.put(page.cursor, 'cursor');
+        });
+    }
+
+    async function pull() {
+        let cursor = await withStores(['meta'], 'readonly', meta => requestResult(meta.get('cursor')));
+        let page;
+        do {
+            const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+            const response = await fetch(`/api/sync${params}`, { cache: 'no-store' });
+            if (!response.ok) {
+                throw new Error(`Sync failed with status ${response.status}`);
+            }
+            page = await response.json();
+            // Only the first page of a sync may ask for a reset
+            if (cursor && page.reset) {
+                cursor = null;
+            }
+            await applyChanges(page);
+            cursor = page.cursor;
+        } while (page.has_more);
+    }
+
+    // Push queued edits, oldest first, in batches
+    async function push() {
+        const queued = await withStores(['outbox'], 'readonly', outbox => requestResult(outbox.getAll()));
+        const failures = [];
+        for (let start = 0; start < queued.length; start += PUSH_BATCH_SIZE) {
+            const batch = queued.slice(start, start + PUSH_BATCH_SIZE);
+            const response = await fetch('/api/sync', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ changes: batch })
+            });
+            if (!response.ok) {
+                throw new Error(`Push failed with status ${response.status}`);
+            }
+            const { results } = await response.json();
+            await withStores(['outbox', 'items'], 'readwrite', (outbox, items) => {
+                results.forEach(result => {
+                    outbox.delete(result.id);
+                    // Conflicts keep the server's copy
+                    if (result.item) {
+                        items.put(result.item);
+                    }
+                    if (result.status !== 'applied') {
+                        failures.push(result);
+                    }
+                });
+            });
+        }
+        if (failures.length) {
+            console.warn('Some offline edits were not applied:', failures);
+            notify(`${failures.length} offline edit(s) could not be applied (changed elsewhere or invalid)`, 'error');
+        }
+        return queued.length - failures.length;
+    }
+
+    // Push queued edits, then pull changes; concurrent calls share one run
+    function sync() {
+        if (!navigator.onLine) {
+            return Promise.resolve();
+        }
+        if (!syncing) {
+            syncing = (async () => {
+                const pushed = await push();
+                await pull();
+                if (pushed) {
+                    notify(`${pushed} offline edit(s) synced`, 'success');
+                }
+            })()
+                .catch(error => console.error('Offline sync failed:', error))
+                .finally(() => { syncing = null; });
+        }
+        return syncing;
+    }
+
+    // Queue an edit for an item and apply it to the local copy right away
+    async function queueUpdate(itemId, data) {
+        const item = await getItem(itemId);
+        await withStores(['outbox'], 'readwrite', outbox => outbox.add({
+            op: 'update',
+            item_id: itemId,
+            data: data,
+            base_updated_at: item ? item.updated_at : null
+        }));
+        if (item) {
+            await putItem(Object.assign({}, item, data));
+        }
+    }
+
+    // Let a sync already in flight land first, so edits just made online show up
+    function waitForSync() {
+        return syncing && navigator.onLine ? syncing : Promise.resolve();
+    }
+
+    // Item from the local cache, else from the server (cached for next time)
+    async function loadItem(itemId) {
+        await waitForSync();
+        try {
+            const item = await getItem(itemId);
+            if (item) {
+                return item;
+            }
+        } catch (error) {
+            console.warn('Local cache unavailable:', error);
+        }
+        const response = await fetch(`/api/inventory/${itemId}`);
+        const item = await response.json();
+        if (response.ok) {
+            putItem(item).catch(() => {});
+        }
+        return item;
+    }
+
+    // Items of a definition from the local cache, else from the server
+    async function loadItemsForDefinition(definitionId) {
+        await waitForSync();
+        try {
+            const items = await getItemsForDefinition(definitionId);
+            if (items.length) {
+                return items;
+            }
+        } catch (error) {
+            console.warn('Local cache unavailable:', error);
+        }
+        const response = await fetch(`/api/inventory?definition_id=${definitionId}`);
+        return response.json();
+    }
+
+    function notify(message, type) {
+        if (typeof showToast === 'function') {
+            showToast(message, type);
+        }
+    }
+
+    return { sync, queueUpdate, loadItem, loadItemsForDefinition };
+})();
+
+// Same fields the /inventory/update form handler reads, as an API payload
+function editFormToItemData(form) {
+    const formData = new FormData(form);
+    const data = { status: formData.get('status') };
+
+    ['custom_id', 'serial_number', 'condition', 'personal_grade', 'defects', 'notes'].forEach(field => {
+        if (formData.has(field)) {
+            data[field] = formData.get(field);
+        }
+    });
+    ['is_graded', 'is_in_taiwan'].forEach(field => {
+        if (formData.has(field)) {
+            data[field] = formData.get(field) === 'true';
+        }
+    });
+
+    const acquisition = {};
+    ['date', 'price', 'shipping', 'tax', 'total_cost', 'acquiredFrom', 'paid_by'].forEach(field => {
+        const value = formData.get(`acquisition_${field}`);
+        if (value) {
+            acquisition[field] = value;
+        }
+    });
+    if (Object.keys(acquisition).length) {
+        data.acquisition = acquisition;
+    }
+
+    if (data.status !== 'sold') {
+        const entries = {};
+        for (const [key, value] of formData.entries()) {
+            const match = key.match(/^grading\[(\d+)\]\[(\w+)\]$/);
+            if (match) {
+                entries[match[1]] = entries[match[1]] || {};
+                entries[match[1]][match[2]] = value;
+            }
+        }
+        data.grading = Object.keys(entries)
+            .sort((a, b) => a - b)
+            .map(index => entries[index])
+            .filter(entry => Object.values(entry).some(value => value));
+    } else {
+        const disposition = {};
+        ['date', 'revenue', 'processing_fee', 'shipping_fee', 'sales_tax_collected', 'income_receiver'].forEach(field => {
+            const value = formData.get(`disposition_${field}`);
+            if (value) {
+                disposition[field] = value;
+            }
+        });
+        if (Object.keys(disposition).length) {
+            data.disposition = disposition;
+        }
+    }
+
+    return data;
+}
+
+// While offline, queue item edits instead of posting the form
+document.addEventListener('submit', async function (e) {
+    const form = e.target;
+    if (navigator.onLine || !['editInventoryForm', 'markAsSoldForm'].includes(form.id)) {
+        return;
+    }
+    e.preventDefault();
+    e.stopImmediatePropagation();
+
+    const itemId = form.action.split('/').pop();
+    try {
+        await OfflineStore.queueUpdate(itemId, editFormToItemData(form));
+        hideModal(form.closest('[id$="Modal"]').id);
+        if (typeof showToast === 'function') {
+            showToast('Saved offline. Changes will sync when you are back online.', 'success');
+        } else {
+            alert('Saved offline. Changes will sync when you are back online.');
+        }
+    } catch (error) {
+        console.error('Failed to queue offline edit:', error);
+        alert('Could not save the edit offline');
+    }
+}, true);
+
+if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register('/sw.js').catch(error => console.warn('Service worker registration failed:', error));
+}
+
+window.addEventListener('online', () => OfflineStore.sync());
+document.addEventListener('DOMContentLoaded', () => {
+    OfflineStore.sync();
+    setInterval(() => OfflineStore.sync(), OFFLINE_SYNC_INTERVAL_MS);
+});
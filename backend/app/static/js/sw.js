@@ -0,0 +1,94 @@
+// Service worker: serve pages and assets when the network is slow or gone
+//
+// Pages are network-first with a short timeout, falling back to the last
+// copy seen; static assets (local and CDN) are served from the cache and
+// refreshed in the background. API requests and writes always go to the
+// network: offline data comes from IndexedDB, kept current by /api/sync, and
+// offline edits are queued by offline.js.
+
+// v2 drops the API responses cached by v1
+const CACHE_NAME = 'card-inventory-v2';
+const NETWORK_TIMEOUT_MS = 3000;
+const PRECACHE_URLS = ['/', '/static/js/dashboard.js', '/static/js/offline.js'];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then(cache => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => key !== CACHE_NAME).map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+function networkFirst(request) {
+    return new Promise(resolve => {
+        let settled = false;
+        const fallback = () => caches.match(request).then(cached => {
+            if (cached && !settled) {
+                settled = true;
+                resolve(cached);
+            }
+            return cached;
+        });
+        const timer = setTimeout(fallback, NETWORK_TIMEOUT_MS);
+
+        fetch(request)
+            .then(response => {
+                clearTimeout(timer);
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(CACHE_NAME).then(cache => cache.put(request, copy));
+                }
+                if (!settled) {
+                    settled = true;
+                    resolve(response);
+                }
+            })
+            .catch(() => {
+                clearTimeout(timer);
+                fallback().then(cached => {
+                    if (!settled) {
+                        settled = true;
+                        resolve(cached || Response.error());
+                    }
+                });
+            });
+    });
+}
+
+function staleWhileRevalidate(request) {
+    return caches.open(CACHE_NAME).then(cache => cache.match(request).then(cached => {
+        const refresh = fetch(request).then(response => {
+            if (response.ok || response.type === 'opaque') {
+                cache.put(request, response.clone());
+            }
+            return response;
+        });
+        return cached || refresh;
+    }));
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.origin === self.location.origin &&
+            (url.pathname.startsWith('/api/') || url.pathname === '/sw.js' || url.pathname === '/metrics')) {
+        return;
+    }
+
+    if (url.origin !== self.location.origin || url.pathname.startsWith('/static/')) {
+        event.respondWith(staleWhileRevalidate(request));
+    } else {
+        event.respondWith(networkFirst(request));
+    }
+});
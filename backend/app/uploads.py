@@ -0,0 +1,166 @@
+"""
+Admission control for image uploads
+
+Each upload holds a gunicorn worker thread for as long as ImgBB takes, and
+its body sits in memory while it is base64-encoded. To keep a burst of photo
+uploads from tying up every worker:
+- request bodies over MAX_UPLOAD_BYTES are refused with 413 before they are read
+- at most UPLOAD_MAX_CONCURRENT uploads run at once per process
+- up to UPLOAD_MAX_WAITING more wait, each for at most UPLOAD_QUEUE_TIMEOUT
+  seconds; beyond that a request gets 429, and a timed-out one gets 503,
+  both with Retry-After
+
+Upload views are wrapped with @admit_upload, which takes a slot before the
+request body is read: werkzeug parses (and buffers) the whole multipart body
+on the first access to request.files, so the decision is made from the
+headers alone. A multipart body of at least UPLOAD_ADMIT_MIN_BYTES (or of
+unknown length) counts as an upload; a form posted with its file input left
+empty is smaller than that and isn't limited. imgbb.upload_image takes a slot
+too, which is a no-op when the calling view already holds it.
+"""
+
+import functools
+import threading
+from contextlib import contextmanager
+
+from flask import jsonify, make_response, request
+from markupsafe import escape
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from backend.app import instrumentation
+from backend.app.config import Config
+
+
+class UploadRejected(Exception):
+    """No upload slot is free; status is 429 (queue full) or 503 (waited too long)"""
+
+    def __init__(self, status: int, message: str, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class UploadAdmission:
+    """Per-process semaphore with a bounded, timed wait queue"""
+
+    def __init__(self, limit: int, max_waiting: int, timeout: float):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.active = 0
+        self.waiting = 0
+
+    def _acquire(self):
+        if self._semaphore.acquire(blocking=False):
+            return
+        with self._lock:
+            if self.waiting >= self.max_waiting:
+                _reject('queue_full')
+                raise UploadRejected(429, 'Too many uploads in progress, please retry shortly',
+                                     Config.UPLOAD_RETRY_AFTER)
+            self.waiting += 1
+        try:
+            acquired = self._semaphore.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            _reject('timeout')
+            raise UploadRejected(503, 'Upload capacity is saturated, please retry shortly',
+                                 Config.UPLOAD_RETRY_AFTER)
+
+    @contextmanager
+    def slot(self):
+        """Hold an upload slot for the duration of the block (reentrant per thread)"""
+        if getattr(self._local, 'held', False):
+            yield
+            return
+        self._acquire()
+        self._local.held = True
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._local.held = False
+            self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'limit': self.limit, 'active': self.active, 'waiting': self.waiting,
+                    'max_waiting': self.max_waiting}
+
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_admission() -> UploadAdmission:
+    global _admission
+    if _admission is None:
+        with _admission_lock:
+            if _admission is None:
+                _admission = UploadAdmission(
+                    Config.UPLOAD_MAX_CONCURRENT, Config.UPLOAD_MAX_WAITING, Config.UPLOAD_QUEUE_TIMEOUT
+                )
+    return _admission
+
+
+def _reject(reason: str):
+    instrumentation.registry.inc('upload_rejections_total', {'reason': reason})
+
+
+def carries_upload() -> bool:
+    """Whether the request body looks like a file upload, judged from its headers only"""
+    if request.mimetype != 'multipart/form-data':
+        return False
+    length = request.content_length
+    return length is None or length >= Config.UPLOAD_ADMIT_MIN_BYTES
+
+
+def admit_upload(view):
+    """Run the view in an upload slot when the request carries a file"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Refused here rather than when the view reads request.files, where
+        # its own error handling would turn the 413 into a 500
+        limit = request.max_content_length
+        if limit is not None and (request.content_length or 0) > limit:
+            raise RequestEntityTooLarge()
+        if not carries_upload():
+            return view(*args, **kwargs)
+        with get_admission().slot():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def _error_response(status: int, message: str, retry_after: int = None):
+    if request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+        response = make_response(jsonify({'error': message}), status)
+    else:
+        response = make_response(
+            f'<p>{escape(message)}</p><p><a href="{escape(request.referrer or "/")}">Go back</a></p>', status
+        )
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_app(app):
+    """Limit request body size and turn rejections into 413/429/503 responses"""
+    app.config['MAX_CONTENT_LENGTH'] = Config.MAX_UPLOAD_BYTES
+
+    @app.errorhandler(UploadRejected)
+    def upload_rejected(e):
+        return _error_response(e.status, str(e), e.retry_after)
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def request_too_large(e):
+        _reject('too_large')
+        limit = request.max_content_length or Config.MAX_UPLOAD_BYTES
+        return _error_response(413, f'Upload too large (max {limit // (1024 * 1024)} MB)')
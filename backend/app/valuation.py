@@ -0,0 +1,313 @@
+"""
+Market prices and portfolio valuation
+
+Market prices are stored per definition and grade ('raw', 'PSA 10',
+'BGS 9.5', ...) in MarketPrices, a time-series collection (see
+indexes.TIME_SERIES): {'ts', 'meta': {'definition_id', 'grade'}, 'price',
+'source'}. They are loaded in bulk from CSV or NDJSON with the columns
+definition_id, grade, price, date (YYYY-MM-DD or ISO timestamp) and source,
+via `python -m backend.app.valuation ingest FILE` or POST /api/prices/import.
+
+Valuation prices every in_stock/grading item at the latest price of its
+definition and grade (the latest returned grading result, else raw). The
+latest prices and the held items are each loaded once per version of their
+collection into NumPy arrays; the join itself is a searchsorted over
+integer keys, so revaluing after new prices arrive doesn't touch the items
+again. Items without a price for their grade are counted as unpriced and
+left out of the totals; unrealized P&L only covers items with a known cost.
+"""
+
+import argparse
+import csv
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from backend.app.cache import LocalCache
+from backend.app.config import Config
+from backend.app.database import (
+    get_card_definitions_collection,
+    get_inventory_items_collection,
+    get_market_prices_collection,
+)
+from backend.app.models import ItemEventModel
+from backend.app.queries import Query
+from backend.app.versioning import bump_version, get_versions, INVENTORY_ITEMS, MARKET_PRICES
+
+RAW = 'raw'
+
+# Statuses valued as holdings
+HELD_STATUSES = ['in_stock', 'grading']
+
+FORMATS = ('csv', 'ndjson')
+
+# Keeps the latest price table and held-item arrays per collection version
+_tables = LocalCache('valuation', [INVENTORY_ITEMS, MARKET_PRICES], max_entries=4, ttl=None)
+
+
+def normalize_grade(value) -> str:
+    """'psa  10' -> 'PSA 10'; empty -> 'raw'"""
+    text = ' '.join(str(value or '').split())
+    return RAW if not text or text.lower() == RAW else text.upper()
+
+
+def grade_of(item: dict) -> str:
+    """Grade an item is priced at: its latest grading result, else raw"""
+    for entry in reversed(item.get('grading') or []):
+        if entry.get('result'):
+            return normalize_grade(f"{entry.get('type', '')} {entry['result']}")
+    return RAW
+
+
+def _parse_ts(value) -> datetime:
+    if not value:
+        return datetime.utcnow()
+    ts = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    # Stored as naive UTC
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def price_document(row: dict) -> dict:
+    """MarketPrices document from an ingest row; raises ValueError on bad values"""
+    try:
+        definition_id = ObjectId(str(row.get('definition_id') or '').strip())
+    except InvalidId:
+        raise ValueError(f"Invalid definition_id: {row.get('definition_id')!r}")
+    price = float(row['price']) if row.get('price') not in (None, '') else None
+    if price is None or not price >= 0:  # also rejects NaN
+        raise ValueError(f"Invalid price: {row.get('price')!r}")
+    doc = {
+        'ts': _parse_ts(row.get('date') or row.get('ts')),
+        'meta': {'definition_id': definition_id, 'grade': normalize_grade(row.get('grade'))},
+        'price': price,
+    }
+    if row.get('source'):
+        doc['source'] = str(row['source'])
+    return doc
+
+
+def read_rows(stream, fmt: str):
+    """(line number, row dict) from a text stream of CSV (with a header) or NDJSON"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}. Must be one of: {', '.join(FORMATS)}")
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, {'_error': 'Invalid JSON'}
+
+
+def ingest(stream, fmt: str, batch_size: int = None, max_errors: int = 100) -> dict:
+    """
+    Insert the prices in stream, batch_size rows at a time
+    Rows with bad values or unknown definitions are skipped and reported
+    (the first max_errors of them, with their line numbers).
+    """
+    batch_size = batch_size or Config.PRICE_INGEST_BATCH_SIZE
+    collection = get_market_prices_collection()
+    definitions = get_card_definitions_collection()
+    result = {'inserted': 0, 'error_count': 0, 'errors': []}
+
+    def error(line_number, message):
+        result['error_count'] += 1
+        if len(result['errors']) < max_errors:
+            result['errors'].append({'line': line_number, 'error': message})
+
+    def flush(batch):
+        ids = list({doc['meta']['definition_id'] for _, doc in batch})
+        known = {doc['_id'] for doc in definitions.find({'_id': {'$in': ids}}, {'_id': 1})}
+        docs = []
+        for line_number, doc in batch:
+            if doc['meta']['definition_id'] in known:
+                docs.append(doc)
+            else:
+                error(line_number, f"Unknown definition_id: {doc['meta']['definition_id']}")
+        if docs:
+            collection.insert_many(docs, ordered=False)
+            result['inserted'] += len(docs)
+
+    batch = []
+    for line_number, row in read_rows(stream, fmt):
+        try:
+            if '_error' in row:
+                raise ValueError(row['_error'])
+            batch.append((line_number, price_document(row)))
+        except (KeyError, TypeError, ValueError) as e:
+            error(line_number, str(e))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if result['inserted']:
+        bump_version(MARKET_PRICES)
+    return result
+
+
+def price_history(definition_id, grade: str = None) -> list:
+    """Prices of one definition (optionally one grade), oldest first"""
+    query = Query({'meta.definition_id': ObjectId(definition_id)}).sort(('ts', 1))
+    if grade:
+        query.where(**{'meta.grade': normalize_grade(grade)})
+    return query.find(get_market_prices_collection())
+
+
+class PriceTable:
+    """Latest price per (definition, grade), as sorted integer keys and prices"""
+
+    def __init__(self, rows: list):
+        self.definitions = {}
+        self.grades = {}
+        for row in rows:
+            self.definitions.setdefault(row['_id']['definition_id'], len(self.definitions))
+            self.grades.setdefault(row['_id']['grade'], len(self.grades))
+        keys = np.fromiter(
+            (self.key(self.definitions[row['_id']['definition_id']], self.grades[row['_id']['grade']])
+             for row in rows),
+            dtype=np.int64, count=len(rows)
+        )
+        prices = np.fromiter((row['price'] for row in rows), dtype=np.float64, count=len(rows))
+        order = np.argsort(keys)
+        self.keys, self.prices = keys[order], prices[order]
+        self.as_of = max((row['ts'] for row in rows), default=None)
+
+    def key(self, definition_codes, grade_codes):
+        return definition_codes * max(len(self.grades), 1) + grade_codes
+
+    @staticmethod
+    def load() -> 'PriceTable':
+        pipeline = [
+            {'$sort': {'meta.definition_id': 1, 'meta.grade': 1, 'ts': -1}},
+            {'$group': {
+                '_id': {'definition_id': '$meta.definition_id', 'grade': '$meta.grade'},
+                'price': {'$first': '$price'},
+                'ts': {'$first': '$ts'},
+            }},
+        ]
+        return PriceTable(list(get_market_prices_collection().aggregate(pipeline)))
+
+
+class ItemTable:
+    """Held items as parallel arrays: definition and grade codes, cost, status"""
+
+    def __init__(self, items: list):
+        definitions, grades = {}, {}
+        definition_codes, grade_codes, costs, status_codes = [], [], [], []
+        for item in items:
+            definition_codes.append(definitions.setdefault(item['card_definition_id'], len(definitions)))
+            grade_codes.append(grades.setdefault(grade_of(item), len(grades)))
+            cost = ItemEventModel.cost_of(item)
+            costs.append(np.nan if cost is None else cost)
+            status_codes.append(HELD_STATUSES.index(item['status']))
+        self.definition_codes = np.array(definition_codes, dtype=np.int64)
+        self.grade_codes = np.array(grade_codes, dtype=np.int64)
+        self.costs = np.array(costs, dtype=np.float64)
+        self.status_codes = np.array(status_codes, dtype=np.int64)
+        self.definition_ids = list(definitions)
+        self.grade_names = list(grades)
+
+    @staticmethod
+    def load() -> 'ItemTable':
+        query = (Query({'status': {'$in': HELD_STATUSES}}).not_archived()
+                 .project('card_definition_id', 'status', 'grading', 'acquisition'))
+        return ItemTable(query.find(get_inventory_items_collection(reporting=True)))
+
+
+def item_values(items: ItemTable, prices: PriceTable) -> np.ndarray:
+    """Market value of each item (NaN where there is no price for its definition and grade)"""
+    if not len(items.definition_codes) or not len(prices.keys):
+        return np.full(len(items.definition_codes), np.nan)
+    # Item-local codes -> price table codes (-1 when the table has no such definition/grade)
+    definition_map = np.array([prices.definitions.get(d, -1) for d in items.definition_ids], dtype=np.int64)
+    grade_map = np.array([prices.grades.get(g, -1) for g in items.grade_names], dtype=np.int64)
+    definition_codes = definition_map[items.definition_codes]
+    grade_codes = grade_map[items.grade_codes]
+
+    keys = prices.key(definition_codes, grade_codes)
+    positions = np.minimum(np.searchsorted(prices.keys, keys), len(prices.keys) - 1)
+    found = (definition_codes >= 0) & (grade_codes >= 0) & (prices.keys[positions] == keys)
+    return np.where(found, prices.prices[positions], np.nan)
+
+
+def _summary(values: np.ndarray, costs: np.ndarray) -> dict:
+    priced = ~np.isnan(values)
+    costed = priced & ~np.isnan(costs)
+    cost_basis = float(costs[costed].sum())
+    return {
+        'items': int(len(values)),
+        'priced_items': int(priced.sum()),
+        'unpriced_items': int((~priced).sum()),
+        'market_value': round(float(values[priced].sum()), 2),
+        'cost_basis': round(cost_basis, 2),
+        'unrealized_pnl': round(float(values[costed].sum()) - cost_basis, 2),
+    }
+
+
+def portfolio_valuation(by_definition: bool = False) -> dict:
+    """
+    Market value, cost basis and unrealized P&L of the held items, in total
+    and per status (and per definition id when by_definition)
+    """
+    versions = get_versions(INVENTORY_ITEMS, MARKET_PRICES)
+    items = _tables.get_or_set(('items', versions[INVENTORY_ITEMS]), ItemTable.load)
+    prices = _tables.get_or_set(('prices', versions[MARKET_PRICES]), PriceTable.load)
+
+    values = item_values(items, prices)
+    result = _summary(values, items.costs)
+    result['prices_as_of'] = prices.as_of.isoformat() if prices.as_of else None
+    result['by_status'] = {
+        status: _summary(values[items.status_codes == code], items.costs[items.status_codes == code])
+        for code, status in enumerate(HELD_STATUSES)
+    }
+    if by_definition:
+        priced = ~np.isnan(values)
+        costed = priced & ~np.isnan(items.costs)
+        size = len(items.definition_ids)
+        market = np.bincount(items.definition_codes, weights=np.where(priced, values, 0), minlength=size)
+        pnl = np.bincount(items.definition_codes, weights=np.where(costed, values - items.costs, 0), minlength=size)
+        held = np.bincount(items.definition_codes, minlength=size)
+        result['by_definition'] = {
+            str(definition_id): {
+                'items': int(held[code]),
+                'market_value': round(float(market[code]), 2),
+                'unrealized_pnl': round(float(pnl[code]), 2),
+            }
+            for code, definition_id in enumerate(items.definition_ids)
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import market prices and value the inventory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest', help='Import prices from a CSV or NDJSON file')
+    ingest_parser.add_argument('path')
+    ingest_parser.add_argument('--format', choices=FORMATS, default=None,
+                               help='Default: from the file extension (.csv, else NDJSON)')
+    ingest_parser.add_argument('--batch-size', type=int, default=None)
+    commands.add_parser('value', help='Print the current portfolio valuation')
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'ndjson')
+        with open(args.path, newline='', encoding='utf-8') as f:
+            result = ingest(f, fmt, args.batch_size)
+        print(f"Inserted {result['inserted']} prices, skipped {result['error_count']} rows")
+        for entry in result['errors']:
+            print(f"  line {entry['line']}: {entry['error']}")
+    else:
+        print(json.dumps(portfolio_valuation(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
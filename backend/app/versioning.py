@@ -0,0 +1,41 @@
+"""
+Collection version counters
+
+Every write route bumps the version of the collections it touched. Readers
+derive cache validators (ETags, render cache keys) from the current
+versions, so anything computed from an older version is known to be stale.
+The counters live in MongoDB so all worker processes agree on them.
+"""
+
+from pymongo import ReturnDocument
+from backend.app.database import get_collection_versions_collection
+from backend.app import invalidation
+
+CARD_DEFINITIONS = 'CardDefinitions'
+INVENTORY_ITEMS = 'InventoryItems'
+MARKET_PRICES = 'MarketPrices'
+
+
+def bump_version(*collections: str) -> dict:
+    """Increment the version of each collection; returns the new versions"""
+    versions_collection = get_collection_versions_collection()
+    versions = {}
+    for name in collections:
+        doc = versions_collection.find_one_and_update(
+            {'_id': name},
+            {'$inc': {'version': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        versions[name] = doc['version']
+        # Other workers learn about the write through the change watcher
+        invalidation.publish(name)
+    return versions
+
+
+def get_versions(*collections: str) -> dict:
+    """Current version of each collection (0 if never written)"""
+    versions = {name: 0 for name in collections}
+    for doc in get_collection_versions_collection().find({'_id': {'$in': list(collections)}}):
+        versions[doc['_id']] = doc.get('version', 0)
+    return versions
@@ -0,0 +1 @@
+"""Synthetic data generator and route benchmark harness"""
@@ -0,0 +1,94 @@
+"""
+Concurrent-user throughput benchmark against a running server
+
+Compare serving modes by starting each one and pointing this at it:
+
+    gunicorn main:app --workers 2 --bind :8000
+    ASYNC_DB=True uvicorn asgi:app --workers 2 --port 8001
+
+    python -m benchmarks.concurrency --base-url http://localhost:8000 --users 1,4,16,32
+    python -m benchmarks.concurrency --base-url http://localhost:8001 --users 1,4,16,32
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import requests
+
+from benchmarks.run_benchmarks import percentile
+
+DEFAULT_PATHS = ['/', '/api/dashboard', '/api/filter-options']
+
+
+def run_users(base_url: str, paths: list, users: int, duration: float) -> dict:
+    """Run `users` concurrent clients cycling through `paths` for `duration` seconds"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user(offset):
+        session = requests.Session()
+        i = offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=60)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    return {
+        'users': users,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure throughput at increasing concurrent users')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--users', default='1,4,16,32', help='Comma-separated concurrent user counts')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per user count')
+    parser.add_argument('--paths', default=','.join(DEFAULT_PATHS))
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    paths = [p for p in args.paths.split(',') if p]
+    results = []
+    for users in [int(u) for u in args.users.split(',') if u]:
+        result = run_users(args.base_url.rstrip('/'), paths, users, args.duration)
+        results.append(result)
+        print(
+            f"{users:>4} users  {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+            f"p95 {result['p95_ms']:>8.2f} ms  errors {result['errors']}"
+        )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Synthetic data generator
+
+Creates card definitions and inventory items shaped like the documents the
+web forms produce (string years/prices/dates, grading arrays, disposition on
+sold items). Output is reproducible for a given seed.
+
+Usage:
+    python -m benchmarks.data_generator --definitions 1000 --items 5000 \
+        --uri mongodb://localhost:27017/card_inventory_bench --drop
+"""
+
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+from pymongo import MongoClient
+
+# (brand, weight, series choices)
+SPORT_BRANDS = [
+    ('Topps', 35, ['Chrome', 'Series 1', 'Series 2', 'Heritage', 'Finest', 'Stadium Club', 'Update']),
+    ('Panini', 30, ['Prizm', 'Select', 'Optic', 'Mosaic', 'National Treasures', 'Contenders']),
+    ('Upper Deck', 15, ['Young Guns', 'SP Authentic', 'Exquisite', 'The Cup']),
+    ('Bowman', 12, ['Bowman Chrome', 'Bowman Draft', "Bowman's Best"]),
+    ('Donruss', 8, ['Rated Rookies', 'Elite', 'Optic']),
+]
+PLAYERS = [
+    'Mike Trout', 'Shohei Ohtani', 'LeBron James', 'Stephen Curry', 'Victor Wembanyama',
+    'Patrick Mahomes', 'Connor McDavid', 'Aaron Judge', 'Luka Doncic', 'Julio Rodriguez',
+    'Ken Griffey Jr.', 'Michael Jordan', 'Kobe Bryant', 'Tom Brady', 'Wayne Gretzky',
+    'Juan Soto', 'Anthony Edwards', 'Joe Burrow', 'Caitlin Clark', 'Elly De La Cruz',
+]
+PARALLELS = ['', '', '', 'Refractor', 'Silver', 'Gold /50', 'Orange /25', 'Red /5', 'Auto', 'Patch Auto']
+
+POKEMON_ERAS = [
+    ('WOTC', 1999, 2003, ['Base Set', 'Jungle', 'Fossil', 'Team Rocket', 'Neo Genesis']),
+    ('EX', 2003, 2007, ['Ruby & Sapphire', 'FireRed & LeafGreen', 'Deoxys']),
+    ('DP', 2007, 2011, ['Diamond & Pearl', 'Platinum', 'HeartGold SoulSilver']),
+    ('BW', 2011, 2014, ['Black & White', 'Plasma Storm', 'Boundaries Crossed']),
+    ('XY', 2014, 2017, ['XY', 'Evolutions', 'Primal Clash']),
+    ('SM', 2017, 2020, ['Sun & Moon', 'Hidden Fates', 'Cosmic Eclipse']),
+    ('SWSH', 2020, 2023, ['Sword & Shield', 'Evolving Skies', 'Brilliant Stars', 'Lost Origin']),
+    ('SV', 2023, 2026, ['Scarlet & Violet', 'Obsidian Flames', '151', 'Paldean Fates']),
+]
+POKEMON = [
+    'Charizard', 'Pikachu', 'Mewtwo', 'Umbreon', 'Rayquaza', 'Gengar', 'Lugia', 'Mew',
+    'Eevee', 'Blastoise', 'Venusaur', 'Gyarados', 'Dragonite', 'Snorlax', 'Greninja',
+]
+RARITIES = ['Common', 'Uncommon', 'Rare', 'Holo Rare', 'Ultra Rare', 'Secret Rare', 'Illustration Rare']
+LANGUAGES = [('English', 60), ('Japanese', 30), ('Chinese', 7), ('Korean', 3)]
+
+GRADERS = [('PSA', 60), ('BGS', 20), ('SGC', 12), ('CGC', 8)]
+GRADES = ['10', '9.5', '9', '8.5', '8', '7']
+SOURCES = ['eBay', 'Card Show', 'Facebook Marketplace', 'Local Card Shop', 'Whatnot', 'Trade']
+PAYERS = ['Howie', 'Partner']
+STATUS_WEIGHTS = [('in_stock', 50), ('shipping', 5), ('grading', 15), ('sold', 30)]
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*[(c[0], c[1]) for c in choices])
+    return rng.choices(values, weights=weights)[0]
+
+
+def _recent_year(rng, start=1986, end=2025):
+    """Years skewed toward the recent end of the range"""
+    span = end - start
+    return str(end - int(span * rng.random() ** 2.5))
+
+
+def generate_definition(rng) -> dict:
+    if rng.random() < 0.65:
+        brand = _weighted(rng, [(b, w) for b, w, _ in SPORT_BRANDS])
+        series = rng.choice(next(s for b, _, s in SPORT_BRANDS if b == brand))
+        doc = {
+            'card_type': 'sport',
+            'year': _recent_year(rng),
+            'brand': brand,
+            'series': series,
+            'player_name': rng.choice(PLAYERS),
+            'insert_parallel': rng.choice(PARALLELS),
+        }
+    else:
+        era, first, last, sets = rng.choice(POKEMON_ERAS)
+        doc = {
+            'card_type': 'pokemon',
+            'year': str(rng.randint(first, last)),
+            'brand': 'Pokemon',
+            'series': rng.choice(sets),
+            'pokemon_name': rng.choice(POKEMON),
+            'language': _weighted(rng, LANGUAGES),
+            'era': era,
+            'rarity': rng.choice(RARITIES),
+            'insert_parallel': rng.choice(['', '', 'Reverse Holo', 'Full Art', 'Alt Art']),
+        }
+    doc.update({
+        'card_number': str(rng.randint(1, 350)),
+        'imgbb_url': f'https://i.ibb.co/synthetic/{rng.getrandbits(48):012x}.jpg',
+        'note': '',
+        'archived': rng.random() < 0.03,
+    })
+    return doc
+
+
+def _money(value: float) -> str:
+    return f'{value:.2f}'
+
+
+def generate_item(rng, definition_id, today: date = None) -> dict:
+    today = today or date(2026, 1, 1)
+    status = _weighted(rng, STATUS_WEIGHTS)
+    acquired = today - timedelta(days=rng.randint(1, 5 * 365))
+    price = round(rng.lognormvariate(3.2, 1.1), 2)
+    shipping = round(rng.choice([0, 0, 1.0, 4.5, 5.0]), 2)
+    tax = round(price * rng.choice([0, 0.0825]), 2)
+
+    doc = {
+        'card_definition_id': definition_id,
+        'status': status,
+        'archived': rng.random() < 0.02,
+        'created_at': datetime.combine(acquired, datetime.min.time()),
+        'updated_at': datetime.combine(acquired, datetime.min.time()),
+        'custom_id': f'A2Z-{rng.getrandbits(32):08X}',
+        'serial_number': f'{rng.randint(1, 99)}/99' if rng.random() < 0.2 else '',
+        'condition': '',
+        'defects': '',
+        'personal_grade': rng.choice(['', '9', '9.5', '10']),
+        'is_graded': False,
+        'is_in_taiwan': rng.random() < 0.1,
+        'notes': '',
+        'acquisition': {
+            'date': acquired.isoformat(),
+            'price': _money(price),
+            'shipping': _money(shipping),
+            'tax': _money(tax),
+            'total_cost': _money(price + shipping + tax),
+            'acquiredFrom': rng.choice(SOURCES),
+            'paid_by': rng.choice(PAYERS),
+        },
+        'grading': [],
+    }
+
+    # Grading history: items in grading have an open submission, and some
+    # in-stock/sold items went through grading earlier
+    if status == 'grading' or (status in ('in_stock', 'sold') and rng.random() < 0.3):
+        submitted = acquired + timedelta(days=rng.randint(3, 60))
+        entry = {
+            'type': _weighted(rng, GRADERS),
+            'fee': float(rng.choice([18, 25, 50, 75, 150])),
+            'date_submitted': submitted.isoformat(),
+        }
+        if status != 'grading':
+            entry['date_returned'] = (submitted + timedelta(days=rng.randint(20, 120))).isoformat()
+            entry['result'] = rng.choice(GRADES)
+            doc['is_graded'] = True
+            doc['condition'] = f"{entry['type']} {entry['result']}"
+        doc['grading'].append(entry)
+
+    if status == 'sold':
+        revenue = round(price * rng.uniform(0.7, 2.5), 2)
+        doc['disposition'] = {
+            'date': (acquired + timedelta(days=rng.randint(10, 400))).isoformat(),
+            'revenue': _money(revenue),
+            'processing_fee': _money(revenue * 0.13),
+            'shipping_fee': _money(rng.choice([1.0, 4.5, 5.0])),
+            'sales_tax_collected': _money(0),
+            'income_receiver': rng.choice(PAYERS),
+        }
+    return doc
+
+
+def populate(db, definitions: int, items: int, seed: int = 42, drop: bool = False, batch_size: int = 1000):
+    """Insert synthetic definitions and items; returns the definition ids"""
+    rng = random.Random(seed)
+    if drop:
+        db['CardDefinitions'].drop()
+        db['InventoryItems'].drop()
+
+    definition_ids = []
+    batch = []
+    for _ in range(definitions):
+        batch.append(generate_definition(rng))
+        if len(batch) >= batch_size:
+            definition_ids.extend(db['CardDefinitions'].insert_many(batch).inserted_ids)
+            batch = []
+    if batch:
+        definition_ids.extend(db['CardDefinitions'].insert_many(batch).inserted_ids)
+
+    # A few definitions hold many copies (bulk base cards); most hold a handful
+    hot_ids = definition_ids[:max(1, len(definition_ids) // 50)]
+    batch = []
+    for _ in range(items):
+        definition_id = rng.choice(hot_ids if rng.random() < 0.2 else definition_ids)
+        batch.append(generate_item(rng, definition_id))
+        if len(batch) >= batch_size:
+            db['InventoryItems'].insert_many(batch)
+            batch = []
+    if batch:
+        db['InventoryItems'].insert_many(batch)
+
+    return definition_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Populate a database with synthetic inventory data')
+    parser.add_argument('--uri', default='mongodb://localhost:27017/card_inventory_bench')
+    parser.add_argument('--definitions', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--drop', action='store_true', help='Drop existing collections first')
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    populate(client.get_database(), args.definitions, args.items, seed=args.seed, drop=args.drop)
+    print(f'Inserted {args.definitions} definitions and {args.items} items into {client.get_database().name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Route benchmark harness
+
+Populates a scratch database at increasing scales and drives the main
+routes through the Flask test client, reporting p50/p95/p99 latency and
+Mongo commands per request (from the Server-Timing header).
+
+Usage:
+    python -m benchmarks.run_benchmarks --uri mongodb://localhost:27017/card_inventory_bench \
+        --scales 100,1000,5000 --items-per-definition 5 --requests 50 [--json results.json]
+
+The target database is dropped and repopulated for every scale.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+
+_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _routes(definition_id) -> list:
+    return [
+        ('index', '/'),
+        ('card_detail', f'/card/{definition_id}'),
+        ('api_dashboard', '/api/dashboard'),
+        ('api_filter_options', '/api/filter-options'),
+        ('api_inventory', f'/api/inventory?definition_id={definition_id}'),
+    ]
+
+
+def bench_route(client, path: str, requests: int, warmup: int = 2) -> dict:
+    for _ in range(warmup):
+        client.get(path)
+
+    latencies = []
+    queries = []
+    status = None
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        status = response.status_code
+        match = _QUERIES_RE.search(response.headers.get('Server-Timing', ''))
+        if match:
+            queries.append(int(match.group(1)))
+
+    return {
+        'status': status,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'queries_per_request': round(sum(queries) / len(queries), 1) if queries else None,
+    }
+
+
+def run(uri: str, scales: list, items_per_definition: int, requests: int, seed: int = 42) -> list:
+    os.environ['MONGODB_URI'] = uri
+    os.environ.setdefault('IMGBB_API_KEY', 'benchmark')
+
+    from backend.app import create_app, indexes
+    from backend.app.config import Config
+    from backend.app.database import DatabaseConnection
+    from backend.app.versioning import bump_version, CARD_DEFINITIONS, INVENTORY_ITEMS
+    from benchmarks.data_generator import populate
+
+    Config.MONGODB_URI = uri
+    app = create_app()
+    client = app.test_client()
+    db = DatabaseConnection.get_db()
+
+    results = []
+    for scale in scales:
+        definition_ids = populate(db, scale, scale * items_per_definition, seed=seed, drop=True)
+        # populate writes behind the app's back: rebuild the dropped indexes
+        # (queries hint them) and invalidate pages and filters cached for the
+        # previous scale
+        indexes.ensure_indexes(db)
+        bump_version(CARD_DEFINITIONS, INVENTORY_ITEMS)
+        # The first definitions carry the most inventory (see populate)
+        busiest = definition_ids[0]
+        for name, path in _routes(busiest):
+            result = bench_route(client, path, requests)
+            result.update({'scale': scale, 'route': name})
+            results.append(result)
+            print(
+                f"{scale:>7} defs  {name:<20} p50 {result['p50_ms']:>8.2f} ms  "
+                f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+                f"queries {result['queries_per_request']}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the main routes at increasing data scales')
+    parser.add_argument('--uri', default='mongodb://localhost:27017/card_inventory_bench')
+    parser.add_argument('--scales', default='100,1000,5000', help='Comma-separated definition counts')
+    parser.add_argument('--items-per-definition', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per route')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(',') if s]
+    results = run(args.uri, scales, args.items_per_definition, args.requests, seed=args.seed)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,12 @@ set -o errexit
 pip install --upgrade pip
 pip install -r requirements.txt
 
+# Purged Tailwind bundle, then fingerprinted and pre-compressed static assets
+npm install --no-audit --no-fund
+npm run build:css
+python -m backend.app.assets
+
+# Template bytecode for JINJA_CACHE_DIR, so workers skip compiling on cold start
+python -m backend.app.startup
+
 echo "Build completed successfully!"
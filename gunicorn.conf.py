@@ -0,0 +1,26 @@
+"""Gunicorn settings (picked up automatically by `gunicorn main:app`)"""
+
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+preload_app = os.getenv("GUNICORN_PRELOAD", "False") == "True"
+
+if preload_app:
+    # No warm-up threads in the master before forking; each worker starts its own
+    os.environ.setdefault("WARMUP_AFTER_FORK", "True")
+
+
+def post_fork(server, worker):
+    """
+    Drop any MongoClient inherited from the master (workers reconnect lazily)
+    and, with preload, start this worker's warm-up
+    """
+    from backend.app.database import DatabaseConnection
+    DatabaseConnection.close()
+
+    if server.cfg.preload_app:
+        from backend.app.config import Config
+        from backend.app.startup import warmup
+        if Config.WARMUP_ENABLED:
+            warmup.start(server.app.wsgi())
@@ -0,0 +1,13 @@
+/** @type {import('tailwindcss').Config} */
+// Classes are collected from the templates and from markup built in the
+// scripts; anything not found there is purged from static/css/app.css
+module.exports = {
+  content: [
+    './backend/app/templates/**/*.html',
+    './backend/app/static/js/**/*.js',
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
@@ -0,0 +1,36 @@
+"""
+Test fixtures: the app on the embedded SQLite backend, so the suite runs
+without a MongoDB server
+"""
+
+import os
+import tempfile
+
+import pytest
+
+os.environ['DATABASE_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='card_inventory_tests_'), 'test.sqlite3')
+os.environ['CACHE_WATCHER_ENABLED'] = 'False'
+os.environ.setdefault('IMGBB_API_KEY', 'test')
+
+from backend.app import create_app  # noqa: E402
+from backend.app.database import DatabaseConnection  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    """The test database, emptied before each test"""
+    db = DatabaseConnection.get_db()
+    for name in db.list_collection_names():
+        db[name].delete_many({})
+    return db
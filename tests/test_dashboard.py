@@ -0,0 +1,32 @@
+from backend.app.models import InventoryItemModel
+
+
+def test_filtered_dashboard_only_counts_the_shown_definitions(client, db, monkeypatch):
+    shown, hidden = db['CardDefinitions'].insert_many([
+        {'card_type': 'sport', 'brand': 'Topps', 'player_name': 'Shown'},
+        {'card_type': 'sport', 'brand': 'Panini', 'player_name': 'Hidden'},
+    ]).inserted_ids
+    db['InventoryItems'].insert_many([
+        {'card_definition_id': shown, 'status': 'in_stock'},
+        {'card_definition_id': shown, 'status': 'grading'},
+        {'card_definition_id': hidden, 'status': 'in_stock'},
+    ])
+    db['InventoryItemsArchive'].insert_many([
+        {'card_definition_id': shown, 'status': 'sold'},
+        {'card_definition_id': hidden, 'status': 'sold'},
+    ])
+    pipelines = []
+    status_counts_pipeline = InventoryItemModel.status_counts_pipeline
+    monkeypatch.setattr(InventoryItemModel, 'status_counts_pipeline', staticmethod(
+        lambda definition_ids=None: pipelines.append(definition_ids) or status_counts_pipeline(definition_ids)
+    ))
+
+    page = client.get('/?brand=Topps').get_data(as_text=True)
+
+    assert pipelines == [[shown]]
+    assert 'In Stock: <strong class="text-gray-900">1</strong>' in page
+    assert 'Grading: <strong class="text-gray-900">1</strong>' in page
+    assert 'Sold: <strong class="text-gray-900">1</strong>' in page
+
+    client.get('/')
+    assert pipelines[1:] == [None]
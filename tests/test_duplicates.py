@@ -0,0 +1,23 @@
+from bson import ObjectId
+
+from backend.app import duplicates
+
+
+def test_merge_with_a_malformed_id_is_not_found(client, db):
+    target_id = db['CardDefinitions'].insert_one({'name': 'Target'}).inserted_id
+
+    response = client.post('/api/definitions/notanid/merge', json={'duplicate_ids': [str(ObjectId())]})
+    assert response.status_code == 404
+
+    response = client.post(f'/api/definitions/{target_id}/merge', json={'duplicate_ids': ['notanid']})
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Definitions not found: notanid'}
+
+
+def test_item_counts_include_the_archive_tier(db):
+    hot_id, archived_id = ObjectId(), ObjectId()
+    db['InventoryItems'].insert_many([{'card_definition_id': hot_id}, {'card_definition_id': hot_id}])
+    db['InventoryItemsArchive'].insert_many([{'card_definition_id': archived_id} for _ in range(3)]
+                                            + [{'card_definition_id': hot_id}])
+
+    assert duplicates.item_counts([hot_id, archived_id]) == {hot_id: 3, archived_id: 3}
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from backend.app import migrations
+
+
+def migration(version):
+    return next(migration for migration in migrations.MIGRATIONS if migration.version == version)
+
+
+def test_grading_entries_from_the_form_become_typed(client, db):
+    items = db['InventoryItems']
+    legacy_id = items.insert_one({'card_definition_id': ObjectId(), 'status': 'grading', 'grading': [
+        {'type': 'PSA', 'fee': '25', 'date_submitted': '2026-01-05', 'date_returned': '', 'result': ''},
+        {'type': '', 'fee': '', 'date_submitted': '', 'date_returned': '', 'result': ''},
+    ]}).inserted_id
+    assert client.get('/api/grading/pending').get_json()['pending'] == []
+
+    totals = migrations.run_migration(migration(5), batch_size=10)
+
+    assert totals == {'scanned': 1, 'modified': 1}
+    assert items.find_one({'_id': legacy_id})['grading'] == [
+        {'type': 'PSA', 'fee': 25.0, 'date_submitted': datetime(2026, 1, 5)}
+    ]
+    pending = client.get('/api/grading/pending').get_json()['pending']
+    assert [row['_id'] for row in pending] == [str(legacy_id)]
+
+
+def test_unparseable_grading_dates_are_left_alone(db):
+    items = db['InventoryItems']
+    entry = {'type': 'BGS', 'date_submitted': 'last spring'}
+    item_id = items.insert_one({'status': 'grading', 'grading': [entry]}).inserted_id
+
+    migrations.run_migration(migration(5), batch_size=10)
+
+    assert items.find_one({'_id': item_id})['grading'] == [entry]
+
+
+def test_migrated_items_are_stamped_logged_and_synced(client, db):
+    items = db['InventoryItems']
+    before = datetime(2025, 6, 1)
+    item_id = items.insert_one({
+        'card_definition_id': ObjectId(), 'status': 'in_stock', 'updated_at': before,
+        'acquisition': {'price': '12.50', 'total_cost': '12.50'},
+    }).inserted_id
+    cursor = client.get('/api/sync').get_json()['cursor']
+
+    migrations.run_migration(migration(2), batch_size=10)
+
+    item = items.find_one({'_id': item_id})
+    assert item['acquisition'] == {'price': 12.5, 'total_cost': 12.5}
+    assert item['updated_at'] > before
+    events = list(db['ItemEvents'].find({'item_id': item_id}))
+    assert [(event['type'], event['data']) for event in events] == [
+        ('updated', {'fields': {'acquisition': {'price': 12.5, 'total_cost': 12.5}}, 'migration': 2})
+    ]
+    assert events[0]['state']['cost'] == 12.5
+    synced = client.get('/api/sync', query_string={'cursor': cursor}).get_json()['changes']
+    assert [doc['_id'] for doc in synced['items']] == [str(item_id)]
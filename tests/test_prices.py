@@ -0,0 +1,36 @@
+import json
+
+from bson import ObjectId
+
+from backend.app.config import Config
+
+
+def import_ndjson(client, rows):
+    body = '\n'.join(json.dumps(row) for row in rows)
+    return client.post('/api/prices/import?format=ndjson', data=body, content_type='application/x-ndjson')
+
+
+def test_timestamps_with_an_offset_are_stored_in_utc(client, db):
+    definition_id = db['CardDefinitions'].insert_one({'name': 'Test card'}).inserted_id
+    response = import_ndjson(client, [
+        {'definition_id': str(definition_id), 'price': 10, 'date': '2024-01-01T10:00:00+05:00'},
+        {'definition_id': str(definition_id), 'price': 11, 'date': '2024-01-02T10:00:00Z'},
+        {'definition_id': str(definition_id), 'price': 12, 'date': '2024-01-03'},
+    ])
+    assert response.status_code == 200 and response.get_json()['inserted'] == 3
+
+    history = client.get(f'/api/prices/{definition_id}').get_json()
+    assert [row['ts'] for row in history] == [
+        '2024-01-01T05:00:00', '2024-01-02T10:00:00', '2024-01-03T00:00:00'
+    ]
+
+
+def test_imports_have_their_own_body_limit(app, client, db, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 64)
+    rows = [{'definition_id': str(ObjectId()), 'price': 1, 'date': '2024-01-01'}] * 10
+    response = import_ndjson(client, rows)
+    assert response.status_code == 200 and response.get_json()['error_count'] == 10
+
+    monkeypatch.setattr(Config, 'PRICE_IMPORT_MAX_BYTES', 64)
+    response = import_ndjson(client, rows)
+    assert response.status_code == 413
@@ -0,0 +1,190 @@
+"""
+The SQLite backend against mongomock: each test runs the same operations
+on a SQLiteCollection and a mongomock collection holding the same documents
+and compares the results. Collections are created with and without indexes,
+so filters both pushed down into SQL and applied in Python are covered.
+"""
+
+from datetime import datetime
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from backend.app.sqlite_store import SQLiteClient
+
+T1, T2, T3 = datetime(2025, 1, 1), datetime(2025, 6, 1), datetime(2026, 1, 1)
+IDS = [ObjectId() for _ in range(10)]
+DOCUMENTS = [
+    {'_id': IDS[0], 'status': 'in_stock', 'value': 5, 'tags': ['psa', 'vintage'], 'updated_at': T1,
+     'grading': [{'type': 'PSA', 'fee': 25.0, 'date_submitted': T1, 'date_returned': T2, 'result': '9'}]},
+    {'_id': IDS[1], 'status': 'grading', 'value': 12.5, 'tags': ['bgs'], 'updated_at': T2,
+     'grading': [{'type': 'BGS', 'fee': 40.0, 'date_submitted': T2}]},
+    {'_id': IDS[2], 'status': 'sold', 'value': '12', 'tags': [], 'updated_at': T3,
+     'grading': [{'type': 'PSA', 'fee': 20.0, 'date_submitted': T1},
+                 {'type': 'PSA', 'fee': 30.0, 'date_submitted': T2, 'date_returned': T3, 'result': '10'}]},
+    {'_id': IDS[3], 'status': 'in_stock', 'value': T2, 'tags': ['vintage'], 'updated_at': T1},
+    {'_id': IDS[4], 'status': 'in_stock', 'value': None, 'updated_at': T2},
+    {'_id': IDS[5], 'status': 'sold', 'tags': ['psa'], 'updated_at': T3},
+    {'_id': IDS[6], 'status': 'in_stock', 'value': True, 'tags': ['psa', 'bgs']},
+    {'_id': IDS[7], 'value': [3, 30], 'tags': ['raw'], 'updated_at': None},
+    {'_id': IDS[8], 'status': 'grading', 'value': 0, 'tags': ['psa'], 'updated_at': T2,
+     'grading': [{'type': 'CGC', 'fee': 15.0, 'date_submitted': T3}]},
+    {'_id': IDS[9], 'status': 'in_stock', 'value': 'abc', 'updated_at': T3,
+     'acquisition': {'price': 10.0, 'total_cost': 12.0}},
+]
+INDEXES = ['status', 'value', 'updated_at', 'tags']
+
+
+@pytest.fixture(params=['unindexed', 'indexed'])
+def collections(request, tmp_path):
+    """(SQLiteCollection, mongomock collection) holding DOCUMENTS"""
+    sqlite = SQLiteClient(str(tmp_path / 'store.sqlite3')).get_database()['Items']
+    mock = mongomock.MongoClient().db['Items']
+    for collection in (sqlite, mock):
+        if request.param == 'indexed':
+            for field in INDEXES:
+                collection.create_index(field)
+        collection.insert_many([dict(doc) for doc in DOCUMENTS])
+    return sqlite, mock
+
+
+def same(collections, operation):
+    """operation(collection) on both stores; asserts equal results and returns them"""
+    sqlite, mock = collections
+    result = operation(sqlite)
+    assert result == operation(mock)
+    return result
+
+
+def ids(collections, filter_query):
+    return same(collections, lambda collection: [doc['_id'] for doc in collection.find(filter_query).sort('_id', 1)])
+
+
+@pytest.mark.parametrize('filter_query', [
+    {'grading': {'$elemMatch': {'type': 'PSA', 'date_returned': {'$ne': None}}}},
+    {'grading': {'$elemMatch': {'date_submitted': {'$gte': T2}, 'date_returned': None}}},
+    {'grading.type': 'PSA', 'grading.result': '10'},
+    {'tags': {'$in': ['bgs', 'raw']}},
+    {'tags': {'$ne': 'psa'}},
+    {'tags': {'$nin': ['psa', 'vintage']}},
+    {'tags': 'vintage'},
+    {'tags': {'$all': ['psa', 'bgs']}},
+    {'tags': {'$size': 0}},
+    {'value': {'$in': [5, '12', None]}},
+    {'value': {'$ne': None}},
+    {'value': 30},
+    {'status': {'$in': ['grading', 'sold']}, 'updated_at': {'$gte': T2}},
+    {'$or': [{'status': 'sold'}, {'tags': 'bgs'}]},
+    {'updated_at': None},
+    {'updated_at': {'$exists': False}},
+    {'acquisition.total_cost': {'$gt': 11}},
+    {'value': {'$type': 'string'}},
+])
+def test_filters(collections, filter_query):
+    ids(collections, filter_query)
+
+
+@pytest.mark.parametrize('filter_query', [
+    {'value': {'$gt': 4}},
+    {'value': {'$lte': 12.5}},
+    {'value': {'$gte': 0, '$lt': 10}},
+    {'value': {'$gt': '1'}},
+    {'value': {'$lt': 'b'}},
+    {'value': {'$gte': T1}},
+    {'value': {'$gt': 10}},
+    {'updated_at': {'$gt': T1}},
+    {'updated_at': {'$lt': T3}},
+    {'_id': {'$gt': IDS[4]}},
+    {'_id': {'$lte': IDS[2]}},
+])
+def test_range_queries_only_match_their_own_type(collections, filter_query):
+    ids(collections, filter_query)
+
+
+def test_sort_across_types(collections):
+    same(collections, lambda collection: [doc['_id'] for doc in collection.find().sort([('value', 1), ('_id', 1)])])
+    same(collections, lambda collection: [doc['_id'] for doc in collection.find().sort([('updated_at', -1),
+                                                                                        ('_id', 1)])])
+    same(collections, lambda collection: [doc['_id'] for doc in collection.find().sort('_id', -1).skip(2).limit(3)])
+
+
+def test_counts_distinct_and_projection(collections):
+    same(collections, lambda collection: collection.count_documents({'tags': 'psa'}))
+    same(collections, lambda collection: sorted(collection.distinct('tags')))
+    same(collections, lambda collection: collection.find_one({'_id': IDS[9]}, {'acquisition.price': 1, '_id': 0}))
+
+
+def test_push_each_and_other_updates(collections):
+    def update(collection):
+        collection.update_one({'_id': IDS[1]}, {'$push': {'grading': {'$each': [
+            {'type': 'SGC', 'fee': 18.0, 'date_submitted': T3}, {'type': 'PSA', 'fee': 22.0},
+        ]}}})
+        collection.update_one({'_id': IDS[4]}, {'$push': {'tags': {'$each': ['new', 'other']}}})
+        collection.update_many({'status': 'in_stock'}, {'$inc': {'views': 1}, '$set': {'acquisition.seen': True}})
+        collection.update_one({'_id': IDS[0]}, {'$addToSet': {'tags': 'psa'}, '$unset': {'value': ''}})
+        collection.update_one({'_id': IDS[6]}, {'$pull': {'tags': 'psa'}})
+        return [collection.find_one({'_id': _id}) for _id in IDS]
+
+    same(collections, update)
+
+
+def test_find_one_and_update_with_sort(collections):
+    def claim(collection):
+        return [
+            collection.find_one_and_update({'status': 'in_stock'}, {'$set': {'status': 'claimed'}},
+                                           sort=[('updated_at', 1), ('_id', 1)])
+            for _ in range(2)
+        ] + [
+            collection.find_one_and_update({'status': 'in_stock'}, {'$set': {'status': 'claimed'}},
+                                           sort=[('updated_at', -1)], return_document=ReturnDocument.AFTER),
+            collection.find_one_and_update({'status': 'missing'}, {'$set': {'status': 'x'}}),
+        ]
+
+    same(collections, claim)
+
+
+def test_upsert_seeds_the_new_document_from_equality_conditions(collections):
+    def upsert(collection):
+        result = collection.update_one(
+            {'status': 'new', 'acquisition.source': 'show', 'value': {'$gt': 3}, 'tags': {'$in': ['x']}},
+            {'$set': {'views': 1}, '$setOnInsert': {'created_at': T3}}, upsert=True
+        )
+        doc = collection.find_one({'_id': result.upserted_id}, {'_id': 0})
+        again = collection.update_one({'status': 'new'}, {'$set': {'views': 2}}, upsert=True)
+        return doc, again.upserted_id, again.modified_count
+
+    same(collections, upsert)
+
+
+def test_group_and_facet(collections):
+    pipeline = [
+        {'$match': {'status': {'$ne': None}}},
+        {'$facet': {
+            'by_status': [
+                {'$group': {'_id': '$status', 'count': {'$sum': 1}, 'latest': {'$max': '$updated_at'}}},
+                {'$sort': {'_id': 1}},
+            ],
+            'fees': [
+                {'$unwind': '$grading'},
+                {'$group': {'_id': '$grading.type', 'total': {'$sum': '$grading.fee'},
+                            'average': {'$avg': '$grading.fee'}, 'items': {'$addToSet': '$_id'}}},
+                {'$sort': {'total': -1}},
+            ],
+            'first': [
+                {'$sort': {'updated_at': 1, '_id': 1}},
+                {'$group': {'_id': '$status', 'first': {'$first': '$_id'}, 'ids': {'$push': '$_id'}}},
+                {'$sort': {'_id': 1}},
+            ],
+            'total': [{'$count': 'count'}],
+        }},
+    ]
+
+    def aggregate(collection):
+        result = list(collection.aggregate(pipeline))
+        for row in result[0]['fees']:
+            row['items'] = sorted(row['items'])
+        return result
+
+    same(collections, aggregate)
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+
+def sync(client, cursor=None, limit=None):
+    """Run one sync to completion; returns (documents by _id, tombstone ids, final cursor)"""
+    documents, tombstones = {}, []
+    while True:
+        params = {key: value for key, value in (('cursor', cursor), ('limit', limit)) if value}
+        page = client.get('/api/sync', query_string=params).get_json()
+        for name, changes in page['changes'].items():
+            for doc in changes:
+                assert doc['_id'] not in documents, f"{doc['_id']} delivered twice in one sync"
+                documents[doc['_id']] = doc
+        tombstones.extend(tombstone['_id'] for tombstone in page['tombstones'])
+        cursor = page['cursor']
+        if not page['has_more']:
+            return documents, tombstones, cursor
+
+
+def insert_items(db, count, updated_at):
+    definition_id = ObjectId()
+    db['InventoryItems'].insert_many([
+        {'card_definition_id': definition_id, 'status': 'in_stock', 'updated_at': updated_at}
+        for _ in range(count)
+    ])
+
+
+def test_unchanged_documents_are_not_resent(client, db):
+    # More documents share one updated_at than a cursor keeps fingerprints of
+    insert_items(db, 300, datetime.utcnow() - timedelta(minutes=10))
+
+    documents, _, cursor = sync(client)
+    assert len(documents) == 300
+
+    for _ in range(3):
+        documents, tombstones, cursor = sync(client, cursor)
+        assert documents == {} and tombstones == []
+
+
+def test_paged_sync_delivers_each_document_once(client, db):
+    insert_items(db, 7, datetime.utcnow() - timedelta(minutes=10))
+    insert_items(db, 5, datetime.utcnow())
+
+    documents, _, cursor = sync(client, limit=2)
+    assert len(documents) == 12
+
+    documents, _, _ = sync(client, cursor, limit=2)
+    assert documents == {}
+
+
+def test_late_commit_is_delivered_once(client, db):
+    insert_items(db, 3, datetime.utcnow() - timedelta(minutes=10))
+    _, _, cursor = sync(client)
+
+    # Stamped before the previous sync started, committed after it
+    late_id = db['InventoryItems'].insert_one({
+        'card_definition_id': ObjectId(), 'status': 'in_stock',
+        'updated_at': datetime.utcnow() - timedelta(seconds=5),
+    }).inserted_id
+
+    documents, _, cursor = sync(client, cursor)
+    assert list(documents) == [str(late_id)]
+
+    documents, _, _ = sync(client, cursor)
+    assert documents == {}